@@ -98,17 +98,17 @@ class MovieAdmin(ExportMixin, admin.ModelAdmin):
     ordering = ["-created_at", "title"]
     readonly_fields = ["poster"]
     filter_horizontal = ["contests"]
+    list_select_related = ["order__owner", "director_profile__user"]
 
     def submited_by(self, movie):
         return movie.order.owner
 
     def director(self, movie):
-        return movie.crewmember_set.get(role__name="Director").profile.user
+        return movie.director_profile and movie.director_profile.user
 
     def director_name(self, movie):
-        return movie.crewmember_set.get(
-            role__name="Director"
-        ).profile.user.get_full_name()
+        director = self.director(movie)
+        return director and director.get_full_name()
 
     def is_paid(self, movie):
         return movie.order.payment_id is not None
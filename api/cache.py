@@ -0,0 +1,130 @@
+"""Response cache of the public read endpoints.
+
+Responses are cached under the absolute url (query parameters sorted), the
+authentication class of the request and the versions of the invalidation tags
+of the endpoint. `invalidate` bumps the version of a tag so that every response
+carrying it is missed from then on and ages out of the cache on its own, the
+model signals in `api.signals` call it whenever the underlying rows change.
+"""
+
+from functools import wraps
+from hashlib import sha1
+from logging import getLogger
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+logger = getLogger(__name__)
+
+KEY_PREFIX = "response-cache"
+
+# qualified names of the cached handlers, for the hit/miss stats
+_handlers = set()
+
+
+def _tag_key(tag):
+    return f"{KEY_PREFIX}:tag:{tag}"
+
+
+def _counter_key(name, outcome):
+    return f"{KEY_PREFIX}:{outcome}:{name}"
+
+
+def invalidate(*tags):
+    """marks the cached responses of the tags as stale"""
+    if tags:
+        cache.set_many({_tag_key(tag): uuid4().hex for tag in tags}, None)
+
+
+def get_tag_versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        # a version evicted from the cache must not bring back old responses
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def get_response_key(request, tags):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    authenticator = request.successful_authenticator
+    parts = [
+        request.build_absolute_uri(request.path),
+        query,
+        type(authenticator).__name__ if authenticator else "",
+        *get_tag_versions(tags),
+    ]
+    return f"{KEY_PREFIX}:{sha1(chr(0).join(parts).encode()).hexdigest()}"
+
+
+def _count(name, outcome):
+    key = _counter_key(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_stats():
+    """handler name => (hits, misses)"""
+    keys = {
+        name: (_counter_key(name, "hits"), _counter_key(name, "misses"))
+        for name in sorted(_handlers)
+    }
+    counters = cache.get_many([key for pair in keys.values() for key in pair])
+    return {
+        name: (counters.get(hits, 0), counters.get(misses, 0))
+        for name, (hits, misses) in keys.items()
+    }
+
+
+def reset_stats():
+    cache.delete_many(
+        [
+            _counter_key(name, outcome)
+            for name in _handlers
+            for outcome in ("hits", "misses")
+        ]
+    )
+
+
+def cache_response(*tags, anonymous_only=False):
+    """Caches the successful responses of a view handler for
+    RESPONSE_CACHE_TIMEOUT seconds.
+
+    `tags` are formatted with the url kwargs of the request e.g. "mpgenre:{pk}".
+    Handlers whose response depends on the requestor are cached for anonymous
+    requests only with `anonymous_only`.
+    """
+
+    def decorator(fn):
+        name = fn.__qualname__
+        _handlers.add(name)
+
+        @wraps(fn)
+        def decorated(view, request, *args, **kwargs):
+            timeout = settings.RESPONSE_CACHE_TIMEOUT
+            if not timeout or (anonymous_only and request.user.is_authenticated):
+                return fn(view, request, *args, **kwargs)
+
+            key = get_response_key(request, [tag.format(**kwargs) for tag in tags])
+            data = cache.get(key)
+            if data is not None:
+                _count(name, "hits")
+                return Response(data)
+
+            _count(name, "misses")
+            response = fn(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout)
+            return response
+
+        return decorated
+
+    return decorator
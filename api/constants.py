@@ -31,11 +31,25 @@ class CONTEST_STATE:
     FINISHED = "F"
 
 
+class EMAIL_STATE:
+    QUEUED = "Q"
+    SENT = "S"
+    FAILED = "F"
+
+
+class LEADERBOARD:
+    AUDIENCE = "A"
+    FILMMAKER = "F"
+
+
 REGULAR_MONTHLY_CONTEST_NAME = "Regular Monthly Contest"
 RECOMMENDATION = "Recommendation"
+DIRECTOR_ROLE = "Director"
 
 DEFAULT_AVATARS = {
     GENDER.MALE: "/default_avatar_m.png",
     GENDER.FEMALE: "/default_avatar_f.png",
     GENDER.OTHERS: "/default_avatar_o.png",
 }
+# shown while an uploaded profile image is processed, see api.images
+PROCESSING_AVATAR = "/processing_avatar.png"
@@ -53,16 +53,20 @@ class TemplateVariables:
         return "notification"
 
 
-def email_trigger(user, template_id, fail_silently=False, **kwargs):
+def email_trigger(user, template_id, idempotency_key=None, **kwargs):
+    """queues the templated email to the user, it is sent by the `sendemails`
+    command outside of the request"""
+    # imported here as the models send emails themselves
+    from api.models import OutboxEmail
+
     if "user" not in kwargs:
         kwargs["user"] = user
     args_needed = template_register[template_id]
     template_variables = TemplateVariables(**kwargs)
     template_data = {arg: getattr(template_variables, arg) for arg in args_needed}
-    email = build_email(
-        to=[user.email], template_id=template_id, template_data=template_data
+    return OutboxEmail.objects.enqueue(
+        user.email, template_id, template_data, key=idempotency_key
     )
-    return email.send(fail_silently=fail_silently)
 
 
 def build_email(to, subject=None, body=None, template_id=None, template_data=None):
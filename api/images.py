@@ -0,0 +1,295 @@
+"""Image pipeline of the uploaded profile images and movie posters.
+
+The upload is decoded once, JPEGs at the smallest scale which still covers the
+largest variant, and resized with LANCZOS, profile images are cropped to a
+square first. Every smaller variant is then derived from the previous one
+instead of the full image. Each variant is written as JPEG and WebP next to
+each other.
+
+The variants are named after the hash of the uploaded content, see
+`api.storage`, so that their urls change with the image and can be cached
+forever, and the same image is rendered once.
+
+The rendering runs in a pool of IMAGE_WORKERS threads after the request is
+committed, the profile shows PROCESSING_AVATAR until it is done and the movie
+its original poster. With 0 workers it runs in the committing thread instead.
+The jobs are not persisted: the pending profile uploads are kept as
+`ProfileImageUpload` rows for `processprofileimages` to pick up the ones lost
+with their worker, the posters are left to `backfillposters`.
+"""
+
+import os
+from hashlib import sha256
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from logging import getLogger
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from api.constants import PROCESSING_AVATAR
+from api.models import Movie, Profile, ProfileImageUpload
+from api.storage import hash_content
+
+logger = getLogger(__name__)
+
+# (PIL format, extension, save options) of the variants written
+FORMATS = [
+    ("JPEG", "jpg", {"quality": 85, "optimize": True, "progressive": True}),
+    ("WEBP", "webp", {"quality": 80, "method": 4}),
+]
+
+_executor = None
+
+
+def get_profile_sizes():
+    """sides of the square variants of a profile image, largest first"""
+    return [settings.PROFILE_IMAGE_SIZE] + sorted(settings.THUMB_DIMENS, reverse=True)
+
+
+def get_variant_path(image_name, size, ext):
+    # the largest variant keeps the name, the thumbnails are prefixed by their
+    # size as before
+    stem = os.path.splitext(image_name)[0]
+    if size != settings.PROFILE_IMAGE_SIZE:
+        stem = f"{size}_{stem}"
+    return os.path.join(settings.MEDIA_PROFILE, f"{stem}.{ext}")
+
+
+def get_storage_path(url):
+    """name of the file in the default storage the url points to, None for
+    the external urls"""
+    prefix = default_storage.url("")
+    if url and url.startswith(prefix):
+        return url[len(prefix) :]
+
+
+def get_poster_variant_path(digest, width, ext):
+    return os.path.join(settings.MEDIA_POSTERS, "variants", f"{digest}-{width}.{ext}")
+
+
+def get_poster_srcset(variants):
+    """extension => `srcset` of the poster variants, None if there are none"""
+    if not variants:
+        return None
+    return {
+        ext: ", ".join(
+            f"{default_storage.url(get_poster_variant_path(variants['hash'], width, ext))} {width}w"
+            for width in variants["widths"]
+        )
+        for _, ext, _ in FORMATS
+    }
+
+
+def _is_rotated(img):
+    # by a quarter turn once exif_transpose applies the exif orientation
+    return img.getexif().get(0x0112) in (5, 6, 7, 8)
+
+
+def _to_rgb(img):
+    if img.mode in ("RGBA", "LA", "P"):
+        # transparent pixels turn white instead of black
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def render_square_variants(fp, sizes):
+    """yields (size, image) for the sizes, largest first, each image derived
+    from the previous one, the same image object is resized in place"""
+    largest = sizes[0]
+    with Image.open(fp) as img:
+        # JPEGs only: decode at the smallest scale covering the largest size
+        img.draft("RGB", (largest, largest))
+        img = _to_rgb(ImageOps.exif_transpose(img))
+        side = min(img.size)
+        left, top = (img.width - side) / 2, (img.height - side) / 2
+        img = img.resize(
+            (largest, largest),
+            Image.LANCZOS,
+            box=(left, top, left + side, top + side),
+            reducing_gap=2.0,
+        )
+    yield largest, img
+    for size in sizes[1:]:
+        img.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+        yield size, img
+
+
+def render_width_variants(fp, widths):
+    """yields (width, image) for the widths, largest first, keeping the aspect
+    ratio, the widths above the width of the image are skipped, the same image
+    object is resized in place"""
+    with Image.open(fp) as img:
+        width, height = img.size[::-1] if _is_rotated(img) else img.size
+        widths = [w for w in sorted(widths, reverse=True) if w <= width] or [width]
+        largest = widths[0]
+        # JPEGs only: decode at the smallest scale covering the largest width
+        draft_size = (largest, max(1, height * largest // width))
+        img.draft("RGB", draft_size[::-1] if _is_rotated(img) else draft_size)
+        img = _to_rgb(ImageOps.exif_transpose(img))
+        img = img.resize(
+            (largest, max(1, round(img.height * largest / img.width))),
+            Image.LANCZOS,
+            reducing_gap=2.0,
+        )
+    yield largest, img
+    for width in widths[1:]:
+        img.thumbnail((width, img.height), Image.LANCZOS, reducing_gap=2.0)
+        yield width, img
+
+
+def _save_variant(img, path, image_format, options):
+    if default_storage.exists(path):
+        # the same content renders the same file
+        return
+    buffer = BytesIO()
+    img.save(buffer, image_format, **options)
+    default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def write_profile_variants(fp, image_name):
+    """renders and saves the variants of the profile image unless they are all
+    stored already, returns the path of the largest JPEG"""
+    paths = get_profile_image_paths(image_name, legacy=False)
+    if not all(default_storage.exists(path) for path in paths):
+        for size, img in render_square_variants(fp, get_profile_sizes()):
+            for image_format, ext, options in FORMATS:
+                path = get_variant_path(image_name, size, ext)
+                _save_variant(img, path, image_format, options)
+    return get_variant_path(image_name, settings.PROFILE_IMAGE_SIZE, "jpg")
+
+
+def write_poster_variants(fp):
+    """renders and saves the variants of the poster, returns the content hash
+    and the widths written for `Movie.poster_variants`"""
+    content = fp.read()
+    digest = sha256(content).hexdigest()[:16]
+    widths = []
+    for width, img in render_width_variants(BytesIO(content), settings.POSTER_WIDTHS):
+        for image_format, ext, options in FORMATS:
+            path = get_poster_variant_path(digest, width, ext)
+            _save_variant(img, path, image_format, options)
+        widths.append(width)
+    return {"hash": digest, "widths": widths}
+
+
+def render_poster_file(path):
+    """poster variants of the stored file, None if it cannot be rendered, to be
+    run in the worker processes of the backfill"""
+    try:
+        with default_storage.open(path) as fp:
+            return write_poster_variants(fp)
+    except Exception:
+        logger.exception(f"rendering {path} failed")
+
+
+def get_profile_image_paths(image_name, legacy=True):
+    """paths of the files of a profile image: the variants and, with `legacy`,
+    the thumbnails of the images uploaded before the pipeline"""
+    paths = [
+        get_variant_path(image_name, size, ext)
+        for size in get_profile_sizes()
+        for _, ext, _ in FORMATS
+    ]
+    if legacy:
+        paths.append(os.path.join(settings.MEDIA_PROFILE, image_name))
+        paths += [
+            os.path.join(settings.MEDIA_PROFILE, f"{size}_{image_name}")
+            for size in settings.THUMB_DIMENS
+        ]
+    return paths
+
+
+def get_poster_paths(poster, variants):
+    """paths of the stored files of a movie poster and its variants"""
+    paths = [path for path in [get_storage_path(poster)] if path]
+    if variants:
+        paths += [
+            get_poster_variant_path(variants["hash"], width, ext)
+            for width in variants["widths"]
+            for _, ext, _ in FORMATS
+        ]
+    return paths
+
+
+def process_profile_image(profile_id, upload_path):
+    """renders the uploaded image into the profile image variants and points
+    the profile to them, unless another image was uploaded in the meantime,
+    the previous image is left to `gcmedia` as other profiles may share it"""
+    try:
+        with default_storage.open(upload_path) as fp:
+            image_name = hash_content(fp)
+            fp.seek(0)
+            image_url = default_storage.url(write_profile_variants(fp, image_name))
+    except Exception:
+        logger.exception(f"processing {upload_path} failed")
+        image_url = None
+
+    with transaction.atomic():
+        pending = (
+            ProfileImageUpload.objects.select_for_update()
+            .filter(profile_id=profile_id, path=upload_path)
+            .first()
+        )
+        profile = Profile.objects.get(id=profile_id)
+        if pending is None or profile.image != PROCESSING_AVATAR:
+            logger.info(f"profile {profile_id} image changed while processing")
+        else:
+            # the previous image is kept if the upload could not be processed
+            profile.image = image_url or pending.previous_image
+            profile.save()
+            logger.debug(f"profile {profile_id} image processed: {image_url}")
+        if pending is not None:
+            pending.delete()
+    default_storage.delete(upload_path)
+
+
+def process_movie_poster(movie_id):
+    """renders the variants of the poster of the movie, unless the poster was
+    replaced in the meantime"""
+    movie = Movie.objects.get(id=movie_id)
+    poster = movie.poster
+    path = get_storage_path(poster)
+    if not path:
+        return
+    variants = render_poster_file(path)
+    movie.refresh_from_db(fields=["poster"])
+    if not variants or movie.poster != poster:
+        return
+    movie.poster_variants = variants
+    movie.save()
+    logger.debug(f"movie {movie_id} poster processed: {variants}")
+
+
+def _run(fn, *args):
+    try:
+        fn(*args)
+    except Exception:
+        logger.exception(f"{fn.__name__} failed")
+    finally:
+        # the pool threads open their own connections
+        connection.close()
+
+
+def schedule(fn, *args):
+    """runs `fn(*args)` in the image workers once the current transaction is
+    committed"""
+
+    def submit():
+        global _executor
+        if not settings.IMAGE_WORKERS:
+            fn(*args)
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.IMAGE_WORKERS, thread_name_prefix="images"
+            )
+        _executor.submit(_run, fn, *args)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,84 @@
+# Generates the resized copies of the existing movie posters
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import images
+from api.models import Movie
+from api.models.movie import invalidate_movie_pages
+from api.management.utils import timed
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Generates the poster variants of the movies which do not have them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="show the number of posters to process without processing them",
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="regenerate the existing variants too"
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="number of processes rendering the posters",
+        )
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.exclude(poster__isnull=True).exclude(poster="")
+        if not options["all"]:
+            movies = movies.filter(poster_variants__isnull=True)
+        # external posters are left as they are
+        pending = [
+            (movie_id, poster, images.get_storage_path(poster))
+            for movie_id, poster in movies.order_by("id").values_list("id", "poster")
+        ]
+        pending = [job for job in pending if job[2]]
+        self.stdout.write(f"{len(pending)} poster(s) to process")
+        if options["dry_run"] or not pending:
+            return
+
+        processed = failed = 0
+        batch_size = options["batch_size"]
+        # the forked workers must not share the connections of the parent
+        connections.close_all()
+        with timed(self.stdout, "render"), ProcessPoolExecutor(
+            options["workers"]
+        ) as pool:
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start : start + batch_size]
+                results = pool.map(images.render_poster_file, [job[2] for job in batch])
+                variants = {
+                    (movie_id, poster): result
+                    for (movie_id, poster, _), result in zip(batch, results)
+                }
+                saved = self._save(variants)
+                processed += saved
+                failed += len(batch) - saved
+        self.stdout.write(f"{processed} poster(s) processed, {failed} failed")
+
+    def _save(self, variants):
+        movies = Movie.objects.filter(id__in=[movie_id for movie_id, _ in variants])
+        updated = []
+        for movie in movies.only("id", "poster"):
+            result = variants.get((movie.id, movie.poster))
+            # failed, or the poster was replaced while rendering
+            if result is None:
+                continue
+            movie.poster_variants = result
+            updated.append(movie)
+        Movie.objects.bulk_update(updated, ["poster_variants"])
+        for movie in updated:
+            invalidate_movie_pages(movie.id)
+        return len(updated)
@@ -0,0 +1,28 @@
+# Shows the hit/miss counters of the response cache of the public read endpoints
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Shows the hit/miss counters of the response cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="reset the counters after showing"
+        )
+
+    def handle(self, *args, **options):
+        if settings.CACHE_BACKEND in settings.PROCESS_CACHE_BACKENDS:
+            self.stderr.write(
+                "the cache is not shared, only the counters of this process "
+                "are shown, set CACHE_BACKEND"
+            )
+        for name, (hits, misses) in get_stats().items():
+            total = hits + misses
+            ratio = f"{hits / total:.0%}" if total else "-"
+            self.stdout.write(f"{name}: {hits} hit(s), {misses} miss(es), {ratio}")
+        if options["reset"]:
+            reset_stats()
+            self.stdout.write("counters reset")
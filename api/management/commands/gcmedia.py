@@ -0,0 +1,96 @@
+# Deletes the uploaded media files which nothing points to anymore
+
+import os
+from datetime import timedelta
+from logging import getLogger
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import images
+from api.models import (
+    LeaderboardEntry,
+    Movie,
+    MoviePoster,
+    Notification,
+    Profile,
+    ProfileImageUpload,
+)
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Deletes the posters and profile images no longer referenced"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="show the number of files to delete without deleting them",
+        )
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="files modified more recently are kept, they may be in use by a "
+            "request or an image worker",
+        )
+
+    def handle(self, *args, **options):
+        referenced = self._get_referenced()
+        cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+        unreferenced = [
+            path
+            for directory in [settings.MEDIA_POSTERS, settings.MEDIA_PROFILE]
+            for path in self._walk(directory)
+            if path not in referenced
+            and default_storage.get_modified_time(path) < cutoff
+        ]
+        self.stdout.write(f"{len(unreferenced)} unreferenced file(s)")
+        if options["dry_run"]:
+            return
+
+        for path in unreferenced:
+            logger.debug(f"deleting {path}")
+            default_storage.delete(path)
+        logger.info(f"{len(unreferenced)} unreferenced file(s) deleted")
+        self.stdout.write(f"{len(unreferenced)} file(s) deleted")
+
+    def _walk(self, directory):
+        if not default_storage.exists(directory):
+            return
+        dirs, files = default_storage.listdir(directory)
+        for name in files:
+            yield os.path.join(directory, name)
+        for name in dirs:
+            yield from self._walk(os.path.join(directory, name))
+
+    def _get_referenced(self):
+        referenced = set()
+        for poster, variants in Movie.objects.values_list("poster", "poster_variants"):
+            referenced.update(images.get_poster_paths(poster, variants))
+        for link in MoviePoster.objects.values_list("link", flat=True):
+            referenced.update(images.get_poster_paths(link, None))
+
+        # the leaderboard snapshots and notifications keep the image of the time
+        image_urls = set(Profile.objects.values_list("image", flat=True))
+        image_urls.update(LeaderboardEntry.objects.values_list("image", flat=True))
+        image_urls.update(Notification.objects.values_list("image", flat=True))
+        # the uploads not processed yet and the images they may fall back to
+        uploads = ProfileImageUpload.objects.values_list("path", "previous_image")
+        for path, previous_image in uploads:
+            referenced.add(path)
+            image_urls.add(previous_image)
+        for url in image_urls:
+            path = images.get_storage_path(url)
+            if not path:
+                continue
+            referenced.add(path)
+            if os.path.dirname(path) == settings.MEDIA_PROFILE:
+                referenced.update(
+                    images.get_profile_image_paths(os.path.basename(path))
+                )
+        return referenced
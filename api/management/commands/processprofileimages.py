@@ -0,0 +1,61 @@
+# Processes the profile image uploads whose image worker job was lost, e.g.
+# with a restarted web worker, the profiles would show PROCESSING_AVATAR forever
+
+from datetime import timedelta
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import images
+from api.constants import PROCESSING_AVATAR
+from api.management.utils import timed
+from api.models import Profile, ProfileImageUpload
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Processes the pending profile image uploads left by the image workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="show the number of uploads to process without processing them",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=10,
+            help="minutes, more recent uploads may still be queued in a worker",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["min_age"])
+        pending = list(
+            ProfileImageUpload.objects.filter(uploaded_at__lt=cutoff)
+            .order_by("id")
+            .values_list("profile_id", "path")
+        )
+        # left on the placeholder by the uploads from before they were persisted
+        stuck = list(
+            Profile.objects.filter(image=PROCESSING_AVATAR, image_upload__isnull=True)
+        )
+        self.stdout.write(
+            f"{len(pending)} upload(s) to process, {len(stuck)} profile(s) to reset"
+        )
+        if options["dry_run"]:
+            return
+
+        with timed(self.stdout, "process"):
+            for profile_id, path in pending:
+                logger.info(f"processing {path} of profile {profile_id}")
+                images.process_profile_image(profile_id, path)
+        for profile in stuck:
+            profile.image = None
+            profile.save()
+        logger.info(f"{len(pending)} upload(s) processed, {len(stuck)} reset")
+        self.stdout.write(
+            f"{len(pending)} upload(s) processed, {len(stuck)} profile(s) reset"
+        )
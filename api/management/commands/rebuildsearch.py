@@ -0,0 +1,30 @@
+# Rebuilds the search documents of the movies and profiles, they are kept up to
+# date on writes but not on queryset updates or raw SQL
+
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+
+from api import search
+from api.management.utils import timed
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the search documents of all the movies and profiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model, document in search.DOCUMENTS.items():
+            label = document.__name__
+            ids = list(model.objects.order_by("id").values_list("id", flat=True))
+            rebuilt = 0
+            with timed(self.stdout, label):
+                for start in range(0, len(ids), batch_size):
+                    rebuilt += document.objects.rebuild(ids[start : start + batch_size])
+            logger.info(f"{label}: {rebuilt} document(s) rebuilt")
+            self.stdout.write(f"{label}: {rebuilt} document(s) rebuilt")
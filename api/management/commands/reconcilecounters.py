@@ -0,0 +1,68 @@
+# Repairs drift in the like/movie counter columns of reviews and lists
+
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from api.models import MovieList, MovieRateReview
+
+logger = getLogger(__name__)
+
+# (model, m2m field, counter field)
+COUNTERS = [
+    (MovieRateReview, "liked_by", "like_count"),
+    (MovieList, "liked_by", "like_count"),
+    (MovieList, "movies", "movie_count"),
+]
+
+
+class Command(BaseCommand):
+    help = "Repairs drift in the like/movie counter columns of reviews and lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="show the number of drifted rows without making any changes",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        for model, m2m_field_name, counter in COUNTERS:
+            label = f"{model.__name__}.{counter}"
+            drifted = self._get_drifted(model, m2m_field_name, counter)
+            self.stdout.write(f"{label}: {len(drifted)} row(s) have drifted")
+            if options["dry_run"] or not drifted:
+                continue
+
+            batch_size = options["batch_size"]
+            for start in range(0, len(drifted), batch_size):
+                self._repair(
+                    model, m2m_field_name, counter, drifted[start : start + batch_size]
+                )
+            self.stdout.write(f"{label}: {len(drifted)} row(s) repaired")
+
+    def _get_through_rows(self, model, m2m_field_name):
+        m2m_field = model._meta.get_field(m2m_field_name)
+        source = f"{m2m_field.m2m_field_name()}_id"
+        return m2m_field.remote_field.through.objects.order_by().values(source), source
+
+    def _get_drifted(self, model, m2m_field_name, counter):
+        rows, source = self._get_through_rows(model, m2m_field_name)
+        expected = dict(rows.annotate(count=Count("id")).values_list(source, "count"))
+        drifted = []
+        for pk, value in model.objects.values_list("id", counter).iterator():
+            if value != expected.get(pk, 0):
+                logger.info(f"{model.__name__} {pk}: {value} => {expected.get(pk, 0)}")
+                drifted.append(pk)
+        return drifted
+
+    def _repair(self, model, m2m_field_name, counter, pks):
+        # counted inside the UPDATE itself, so that the changes made after the
+        # drift was detected are not lost
+        rows, source = self._get_through_rows(model, m2m_field_name)
+        counts = rows.filter(**{source: OuterRef("pk")}).annotate(count=Count("id"))
+        model.objects.filter(id__in=pks).update(
+            **{counter: Coalesce(Subquery(counts.values("count")), 0)}
+        )
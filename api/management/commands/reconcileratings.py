@@ -0,0 +1,89 @@
+# Repairs drift in the running audience rating sum/count of movies
+
+import math
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from api.models import Movie, MovieRateReview
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Repairs drift in the running audience rating sum/count of movies"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="show the drifted movies without making any changes",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        expected = self._get_expected_ratings()
+        drifted = []
+        for movie in Movie.objects.only(
+            "id", "rating_sum", "rating_count", "audience_rating"
+        ).iterator():
+            rating_sum, rating_count = expected.get(movie.id, (0, 0))
+            if self._has_drifted(movie, rating_sum, rating_count):
+                logger.info(
+                    f"{movie.id}: {movie.rating_sum}/{movie.rating_count} "
+                    f"=> {rating_sum}/{rating_count}"
+                )
+                drifted.append(movie.id)
+
+        self.stdout.write(f"{len(drifted)} movie(s) have drifted")
+        if options["dry_run"] or not drifted:
+            return
+
+        batch_size = options["batch_size"]
+        for start in range(0, len(drifted), batch_size):
+            self._repair(drifted[start : start + batch_size])
+        self.stdout.write(f"{len(drifted)} movie(s) repaired")
+
+    def _get_expected_ratings(self):
+        ratings = (
+            MovieRateReview.objects.exclude(rating__isnull=True)
+            .order_by()
+            .values("movie_id")
+            .annotate(rating_sum=Sum("rating"), rating_count=Count("id"))
+        )
+        return {
+            row["movie_id"]: (row["rating_sum"], row["rating_count"]) for row in ratings
+        }
+
+    def _has_drifted(self, movie, rating_sum, rating_count):
+        if movie.rating_count != rating_count:
+            return True
+        if not math.isclose(movie.rating_sum, rating_sum, abs_tol=1e-6):
+            return True
+        if rating_count == 0:
+            # movies which were never rated carry the default rating of 0
+            return movie.audience_rating not in (None, 0)
+        return movie.audience_rating is None or not math.isclose(
+            movie.audience_rating, rating_sum / rating_count, abs_tol=1e-6
+        )
+
+    def _repair(self, movie_ids):
+        # recomputed from the reviews inside the UPDATE itself, so that the
+        # ratings written after the drift was detected are not lost
+        ratings = (
+            MovieRateReview.objects.filter(movie=OuterRef("pk"), rating__isnull=False)
+            .order_by()
+            .values("movie")
+        )
+        Movie.objects.filter(id__in=movie_ids).update(
+            rating_sum=Coalesce(
+                Subquery(ratings.annotate(total=Sum("rating")).values("total")), 0.0
+            ),
+            rating_count=Coalesce(
+                Subquery(ratings.annotate(total=Count("id")).values("total")), 0
+            ),
+            audience_rating=Subquery(
+                ratings.annotate(average=Avg("rating")).values("average")
+            ),
+        )
@@ -0,0 +1,99 @@
+# Runs the nightly ranking jobs against a shared snapshot
+
+import json
+from logging import getLogger
+
+from django.conf import settings
+from django.core.management import call_command, load_command_class
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.management.snapshot import RankingSnapshot
+from api.management.utils import timed
+
+logger = getLogger(__name__)
+
+# status of a run in the state file, only the failed runs are resumed
+RUNNING, FAILED, COMPLETE = "running", "failed", "complete"
+
+# in dependency order, pop scores are only computed for profiles which
+# updateroles has marked as directors
+STAGES = [
+    "updateroles",
+    "updateengagementscore",
+    "updatepopscore",
+    "updatetopcreators",
+    "updatetopcurators",
+]
+
+
+class Command(BaseCommand):
+    help = "Runs the nightly ranking jobs against a shared snapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stages",
+            nargs="+",
+            choices=STAGES,
+            default=STAGES,
+            help="stages to run, always run in dependency order",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="skip the stages completed by the previous run if it failed",
+        )
+
+    def handle(self, *args, **options):
+        stages = [stage for stage in STAGES if stage in options["stages"]]
+        completed = []
+        if options["resume"]:
+            state = self._read_state()
+            # a run killed midway never recorded its failure
+            if state.get("status") in (RUNNING, FAILED):
+                completed = state.get("completed", [])
+            else:
+                self.stdout.write("no failed run to resume, running all stages")
+            skipped = [stage for stage in stages if stage in completed]
+            if skipped:
+                self.stdout.write(f"skipping completed stage(s): {', '.join(skipped)}")
+            stages = [stage for stage in stages if stage not in completed]
+
+        snapshot = RankingSnapshot()
+        with timed(self.stdout, "rankings"):
+            for stage in stages:
+                command = load_command_class("api", stage)
+                kwargs = {}
+                if "snapshot" in command.stealth_options:
+                    kwargs["snapshot"] = snapshot
+                try:
+                    with timed(self.stdout, stage):
+                        call_command(command, stdout=self.stdout, **kwargs)
+                except Exception as e:
+                    logger.exception(f"{stage} failed")
+                    self._write_state(FAILED, completed, failed=stage)
+                    raise CommandError(
+                        f"{stage} failed: {e}, rerun with --resume to continue"
+                    )
+                completed.append(stage)
+                self._write_state(RUNNING, completed)
+        self._write_state(COMPLETE, completed)
+
+    def _read_state(self):
+        try:
+            with open(settings.RANKINGS_STATE_PATH) as state:
+                return json.load(state)
+        except FileNotFoundError:
+            return {}
+
+    def _write_state(self, status, completed, failed=None):
+        with open(settings.RANKINGS_STATE_PATH, "w") as state:
+            json.dump(
+                {
+                    "updated_at": timezone.now().isoformat(),
+                    "status": status,
+                    "completed": completed,
+                    "failed": failed,
+                },
+                state,
+            )
@@ -0,0 +1,39 @@
+# Sends the emails queued in the outbox by email_trigger
+
+import time
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+from api.models import OutboxEmail
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Sends the queued emails, retrying the failed ones with a backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=OutboxEmail.objects.BATCH_SIZE,
+            help="number of emails claimed at a time",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="keep polling the outbox instead of exiting once it is drained",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5, help="seconds between the polls"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = OutboxEmail.objects.send_queued(options["batch_size"])
+            if sent or failed or not options["loop"]:
+                logger.info(f"{sent} email(s) sent, {failed} failed")
+                self.stdout.write(f"{sent} email(s) sent, {failed} failed")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -1,52 +1,147 @@
+from collections import defaultdict
 from logging import getLogger
 
 from django.db import transaction
+from django.db.models import Count
 from django.core.management.base import BaseCommand
-from api.models import Profile, MovieList
-
+from api.constants import LEADERBOARD
+from api.models import Profile, MovieList, MovieRateReview, LeaderboardSnapshot
+from api.cache import invalidate
+from api.management.snapshot import RankingSnapshot
+from api.management.utils import timed
 
 logger = getLogger(__name__)
 
+LIKE_POINTS = 0.25
+REVIEW_LIKES_LIMIT = 20
+FOLLOWER_POINTS = 0.25
+CURATION_LIKES_LIMIT = 200
+
 
 # TODO: compare recommend list and celeb recommend and assign points accordingly
 class Command(BaseCommand):
+    stealth_options = ("snapshot",)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="show the changed scores and ranks without making any changes",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
     def handle(self, *args, **options):
-        with transaction.atomic():
-            for profile in Profile.objects.filter(is_celeb=False).all():
-                logger.info(f"{profile.user}: {profile.engagement_score}")
-                engg_score = self._calculate_score(profile)
-                profile.engagement_score = engg_score
-                profile.save()
-                logger.info(f"{profile.user}: {profile.engagement_score}")
-
-            # updating curator ranks
-            for index, profile in enumerate(
-                Profile.objects.order_by("-engagement_score", "user__first_name").all()
-            ):
-                profile.curator_rank = index + 1
-                profile.save()
-
-    def _calculate_score(self, profile):
-        review_points = self._get_review_points(profile)
-        followers_points = self._get_followers_points(profile)
-        curation_points = self._get_curation_points(profile)
-        return round(review_points + followers_points + curation_points, 2)
-
-    def _get_review_points(self, profile):
+        snapshot = options.get("snapshot") or RankingSnapshot()
+        with timed(self.stdout, "total"):
+            with timed(self.stdout, "load"):
+                profiles = list(
+                    Profile.objects.select_related("user").only(
+                        "id",
+                        "user",
+                        "user__first_name",
+                        "is_celeb",
+                        "engagement_score",
+                        "curator_rank",
+                    )
+                )
+                review_points = self._get_review_points()
+                followers_points = self._get_followers_points(snapshot)
+                curation_points = self._get_curation_points()
+
+            with timed(self.stdout, "score"):
+                original = {
+                    profile.id: (profile.engagement_score, profile.curator_rank)
+                    for profile in profiles
+                }
+                for profile in profiles:
+                    if not profile.is_celeb:
+                        profile.engagement_score = round(
+                            review_points.get(profile.user_id, 0)
+                            + followers_points.get(profile.id, 0)
+                            + curation_points.get(profile.user_id, 0),
+                            2,
+                        )
+                self._update_ranks(profiles)
+                changed = [
+                    profile
+                    for profile in profiles
+                    if original[profile.id]
+                    != (profile.engagement_score, profile.curator_rank)
+                ]
+
+            if options["dry_run"]:
+                for profile in changed:
+                    old_score, old_rank = original[profile.id]
+                    self.stdout.write(
+                        f"{profile.id}: score {old_score} => {profile.engagement_score}"
+                        f", rank {old_rank} => {profile.curator_rank}"
+                    )
+                self.stdout.write(f"{len(changed)} profile(s) would be updated")
+                return
+
+            with timed(self.stdout, "save"):
+                with transaction.atomic():
+                    Profile.objects.bulk_update(
+                        changed,
+                        ["engagement_score", "curator_rank"],
+                        batch_size=options["batch_size"],
+                    )
+            logger.info(f"{len(changed)} profile(s) updated")
+            self.stdout.write(f"{len(changed)} profile(s) updated")
+
+            with timed(self.stdout, "publish"):
+                entries = LeaderboardSnapshot.objects.publish(
+                    LEADERBOARD.AUDIENCE, batch_size=options["batch_size"]
+                )
+            invalidate("leaderboard")
+            self.stdout.write(f"{entries} leaderboard entries published")
+
+    def _update_ranks(self, profiles):
+        """assigns curator ranks to all the profiles in a single sorted pass"""
+        ranked = sorted(
+            profiles,
+            key=lambda profile: (
+                -profile.engagement_score,
+                profile.user.first_name,
+                profile.id,
+            ),
+        )
+        for index, profile in enumerate(ranked):
+            profile.curator_rank = index + 1
+
+    def _get_review_points(self):
         """
-        points for writing good content, each like on
+        points for writing good content, each like on a review is worth 0.25
+        points capped at 20 points per review, returns user id => points
         """
-        reviews = profile.user.movieratereview_set.all()
-        return sum(min(review.liked_by.count() * 0.25, 20) for review in reviews)
-
-    def _get_followers_points(self, profile):
-        """points for being followed by other users 0.25 per follower with no limit"""
-        return profile.followed_by.count() * 0.25
+        points = defaultdict(float)
+        reviews = (
+            MovieRateReview.objects.annotate(likes=Count("liked_by"))
+            .filter(likes__gt=0)
+            .values_list("author_id", "likes")
+        )
+        for author_id, likes in reviews:
+            points[author_id] += min(likes * LIKE_POINTS, REVIEW_LIKES_LIMIT)
+        return points
 
-    def _get_curation_points(self, profile):
-        curation = MovieList.objects.filter(
-            contest__isnull=False, owner=profile.user
-        ).all()
+    def _get_followers_points(self, snapshot):
+        """points for being followed by other users 0.25 per follower with no limit,
+        returns profile id => points"""
+        return {
+            profile_id: count * FOLLOWER_POINTS
+            for profile_id, count in snapshot.follower_counts.items()
+        }
 
-        logger.debug(f"{len(curation)} curation from user in contests")
-        return sum(min(c.liked_by.count() * 0.25, 200) for c in curation)
+    def _get_curation_points(self):
+        """points for the likes on contest recommend lists, 0.25 per like capped at
+        200 points per list, returns user id => points"""
+        points = defaultdict(float)
+        curation = (
+            MovieList.objects.filter(contest__isnull=False)
+            .annotate(likes=Count("liked_by"))
+            .filter(likes__gt=0)
+            .values_list("owner_id", "likes")
+        )
+        for owner_id, likes in curation:
+            points[owner_id] += min(likes * LIKE_POINTS, CURATION_LIKES_LIMIT)
+        return points
@@ -1,8 +1,22 @@
+from bisect import bisect_right
+from collections import defaultdict
+
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.db.models import Q, Count
-from api.models import Role, CrewMember, Movie
-from api.constants import MOVIE_STATE
+from api.models import (
+    Role,
+    CrewMember,
+    Movie,
+    MovieList,
+    MovieRateReview,
+    Profile,
+    LeaderboardSnapshot,
+)
+from api.constants import MOVIE_STATE, DIRECTOR_ROLE, LEADERBOARD
+from api.cache import invalidate
+from api.management.snapshot import RankingSnapshot
+from api.management.utils import timed
 from logging import getLogger
 
 logger = getLogger(__name__)
@@ -16,58 +30,161 @@ PART_A_LEVELS = [
 ]
 PART_B_LEVELS = [128, 320, 640, 960, 1280]
 
+FOLLOWER_MULTIPLYER = 2
+JURY_MULTIPLYER = 2.5
+RECOMMEND_MULTIPLYER = 0.1
+RECOMMEND_LIMIT = 100
+REVIEW_MULTIPLYER = 1
+REVIEW_LIMIT = 20
+RATING_MULTIPLYER = 0.5
+RATING_LIMIT = 50
+RATING_GTE = 7
+
+
+class DirectorPoints:
+    """Per director table of the points earned by all of their published movies"""
+
+    __slots__ = ["followers", "jury", "recommends", "ratings", "reviews"]
+
+    def __init__(self):
+        self.followers = 0
+        self.jury = 0
+        self.recommends = 0
+        self.ratings = 0
+        self.reviews = 0
+
+    @property
+    def part_a(self):
+        return self.followers * FOLLOWER_MULTIPLYER
+
+    @property
+    def part_b(self):
+        return (
+            self.recommends * RECOMMEND_MULTIPLYER
+            + self.ratings * RATING_MULTIPLYER
+            + self.reviews * REVIEW_MULTIPLYER
+            + self.jury * JURY_MULTIPLYER
+        )
+
 
 class Command(BaseCommand):
+    stealth_options = ("snapshot",)
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
     def handle(self, *args, **options):
-        with transaction.atomic():
-            self.director_role = Role.objects.filter(name="Director").first()
-            directors = self.director_role.profiles.all()
-            logger.debug(f"updating {len(directors)} directors")
-            for profile in directors:
-                logger.info(f"{profile.user.username} => {profile.pop_score}")
-                directed_movies = [
-                    cm.movie
-                    for cm in CrewMember.objects.filter(
-                        role=self.director_role, profile=profile
+        snapshot = options.get("snapshot") or RankingSnapshot()
+        with timed(self.stdout, "total"):
+            with timed(self.stdout, "load"):
+                directors = list(
+                    Profile.objects.filter(roles__id=Role.objects.get_id(DIRECTOR_ROLE))
+                    .select_related("user")
+                    .only(
+                        "id",
+                        "user",
+                        "user__first_name",
+                        "user__last_name",
+                        "user__username",
+                        "pop_score",
+                        "creator_rank",
                     )
-                    if cm.movie.state == MOVIE_STATE.PUBLISHED
-                ]
-                logger.info(f"movies directed:  {len(directed_movies)}")
-                followers_points = self.get_follower_points(profile)
-                jury_points = self.get_jury_rating_points(directed_movies)
-                recommend_points = self.get_recommend_points(directed_movies)
-                rating_review_points = self.get_review_points(directed_movies)
-
-                part_b = recommend_points + rating_review_points + jury_points
-                part_a = followers_points
+                )
+                logger.debug(f"updating {len(directors)} directors")
+                points = self.get_director_points(snapshot)
+
+            with timed(self.stdout, "score"):
+                for profile in directors:
+                    director_points = points.get(profile.id, DirectorPoints())
+                    profile.pop_score = self._get_capped_points(
+                        director_points.part_a, director_points.part_b
+                    )
+                    logger.info(f"{profile.user.username} => {profile.pop_score}")
+                self.update_rank(directors)
+
+            with timed(self.stdout, "save"):
+                with transaction.atomic():
+                    Profile.objects.bulk_update(
+                        directors,
+                        ["pop_score", "creator_rank"],
+                        batch_size=options["batch_size"],
+                    )
+            self.stdout.write(f"{len(directors)} director(s) updated")
+
+            with timed(self.stdout, "publish"):
+                entries = LeaderboardSnapshot.objects.publish(
+                    LEADERBOARD.FILMMAKER, batch_size=options["batch_size"]
+                )
+            invalidate("leaderboard")
+            self.stdout.write(f"{entries} leaderboard entries published")
+
+    def get_director_points(self, snapshot):
+        """builds director profile id => DirectorPoints from a handful of
+        aggregate queries over the published movies with a director, each
+        director of a movie gets all of its points"""
+        points = defaultdict(DirectorPoints)
+        directors_by_movie = {}
+        for movie_id, (
+            director_ids,
+            jury_rating,
+            _,
+        ) in snapshot.published_movies.items():
+            directors_by_movie[movie_id] = director_ids
+            for director_id in director_ids:
+                points[director_id].jury += jury_rating or 0
+        movies = Movie.objects.filter(
+            state=MOVIE_STATE.PUBLISHED,
+            id__in=CrewMember.objects.directors().values("movie_id"),
+        )
 
-                capped_points = self._get_capped_points(part_a, part_b)
+        for profile_id, count in snapshot.follower_counts.items():
+            points[profile_id].followers = count
 
-                profile.pop_score = capped_points
-                logger.info(f"{profile.user.username} => {profile.pop_score}")
-                profile.save()
-            self.update_rank(directors)
+        recommends = (
+            MovieList.movies.through.objects.filter(
+                movie__in=movies, movielist__contest__isnull=False
+            )
+            .order_by()
+            .values("movie_id")
+            .annotate(recommends=Count("id"))
+            .values_list("movie_id", "recommends")
+        )
+        for movie_id, count in recommends:
+            for director_id in directors_by_movie.get(movie_id, ()):
+                points[director_id].recommends += min(count, RECOMMEND_LIMIT)
+
+        reviews = (
+            MovieRateReview.objects.filter(movie__in=movies)
+            .order_by()
+            .values("movie_id")
+            .annotate(
+                ratings=Count("id", filter=Q(content__isnull=False)),
+                reviews=Count("id", filter=Q(rating__gte=RATING_GTE)),
+            )
+            .values_list("movie_id", "ratings", "reviews")
+        )
+        for movie_id, ratings, reviews in reviews:
+            for director_id in directors_by_movie.get(movie_id, ()):
+                director_points = points[director_id]
+                director_points.ratings += min(ratings, RATING_LIMIT)
+                director_points.reviews += min(reviews, REVIEW_LIMIT)
+        return points
 
     def _get_capped_points(self, part_a, part_b):
-        level_a = self._get_part_a_level(part_a)
-        level_b = self._get_part_b_level(part_b)
-        level = min(level_a, level_b)
+        level = min(
+            self._get_level(part_a, PART_A_LEVELS),
+            self._get_level(part_b, PART_B_LEVELS),
+        )
         logger.info(f"level: {level}")
-        part_a = min(part_a, PART_A_LEVELS[level])
-        part_b = min(part_b, PART_B_LEVELS[level])
+        # points are capped at the limit of the next level, the last level
+        # is capped by its own limit
+        part_a = min(part_a, PART_A_LEVELS[min(level, len(PART_A_LEVELS) - 1)])
+        part_b = min(part_b, PART_B_LEVELS[min(level, len(PART_B_LEVELS) - 1)])
         return part_a + part_b
 
-    def _get_part_b_level(self, points):
-        for level, limit in enumerate(PART_B_LEVELS):
-            if points < limit:
-                return level + 1
-        return len(PART_B_LEVELS)
-
-    def _get_part_a_level(self, num):
-        for level, limit in enumerate(PART_A_LEVELS):
-            if num < limit:
-                return level + 1
-        return len(PART_A_LEVELS)
+    def _get_level(self, points, levels):
+        """1 based level i.e., index of the first limit greater than points"""
+        return min(bisect_right(levels, points) + 1, len(levels))
 
     def update_rank(self, directors):
         directors = list(directors)
@@ -77,60 +194,3 @@ class Command(BaseCommand):
         )
         for rank, profile in enumerate(directors):
             profile.creator_rank = rank + 1
-            profile.save()
-
-    def get_jury_rating_points(self, directed_movies):
-        MULTIPLYER = 2.5
-        jury_points = sum(m.jury_rating * MULTIPLYER for m in directed_movies)
-        logger.debug(f"jury_points {jury_points}")
-        return jury_points
-
-    def get_follower_points(self, profile):
-        """
-        accountable for 20% of the points
-        """
-        MULTIPYER = 2
-        logger.info(f"updating {profile.user.username}")
-        followers_count = profile.followed_by.count()
-        logger.info(f"followers_count {followers_count}")
-        followers_points = followers_count * MULTIPYER
-        logger.info(f"followers points {followers_points}")
-        return followers_points
-
-    def get_review_points(self, directed_movies):
-        REVIEW_MULTIPYER = 1
-        REVIEW_LIMIT = 20
-        RATING_MULTIPYER = 0.5
-        RATING_LIMIT = 50
-        RATING_GTE = 7
-
-        ratings_count = Count(
-            "movieratereview", filter=Q(movieratereview__content__isnull=False)
-        )
-        reviews_count = Count(
-            "movieratereview", filter=Q(movieratereview__rating__gte=RATING_GTE)
-        )
-        movies = (
-            Movie.objects.filter(id__in=[m.id for m in directed_movies])
-            .annotate(rating_count=ratings_count)
-            .annotate(actual_review_count=reviews_count)
-        )
-        review_count = 0
-        rating_count = 0
-        for movie in movies:
-            rating_count += min(RATING_LIMIT, movie.rating_count)
-            review_count += min(REVIEW_LIMIT, movie.actual_review_count)
-        logger.debug(f"rating: {rating_count}, review: {review_count}")
-        return rating_count * RATING_MULTIPYER + review_count * REVIEW_MULTIPYER
-
-    def get_recommend_points(self, directed_movies):
-        MULTIPYER = 0.1
-        RECOMMENT_LIMIT = 100
-        recommended_count = 0
-        for movie in directed_movies:
-            recommended_count += min(
-                movie.in_lists.exclude(contest_id__isnull=True).count(),
-                RECOMMENT_LIMIT,
-            )
-        logger.debug(f"recommended {recommended_count} times")
-        return recommended_count * MULTIPYER
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
-from django.db.models import Q
-from api.models import CrewMember
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from api.models import CrewMember, Profile
 from api.constants import MOVIE_STATE
 from logging import getLogger
 
@@ -8,9 +9,60 @@ logger = getLogger(__name__)
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--remove-stale",
+            action="store_true",
+            help="also remove the roles which no crew membership backs anymore",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="show the number of roles to add/remove without making any changes",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
     def handle(self, *args, **options):
-        for cm in CrewMember.objects.filter(~Q(movie__state=MOVIE_STATE.CREATED)):
-            if cm.role not in cm.profile.roles.all():
-                logger.info(f"{cm.profile} is {cm.role.name}")
-                cm.profile.roles.add(cm.role)
-                cm.profile.save()
+        ProfileRole = Profile.roles.through
+        crew = CrewMember.objects.filter(~Q(movie__state=MOVIE_STATE.CREATED))
+        missing = (
+            crew.exclude(
+                Exists(
+                    ProfileRole.objects.filter(
+                        profile_id=OuterRef("profile_id"), role_id=OuterRef("role_id")
+                    )
+                )
+            )
+            .order_by()
+            .values_list("profile_id", "role_id")
+            .distinct()
+        )
+        stale = ProfileRole.objects.exclude(
+            Exists(
+                crew.filter(
+                    profile_id=OuterRef("profile_id"), role_id=OuterRef("role_id")
+                )
+            )
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(f"{len(missing)} role(s) would be added")
+            if options["remove_stale"]:
+                self.stdout.write(f"{stale.count()} role(s) would be removed")
+            return
+
+        with transaction.atomic():
+            added = ProfileRole.objects.bulk_create(
+                [
+                    ProfileRole(profile_id=profile_id, role_id=role_id)
+                    for profile_id, role_id in missing
+                ],
+                batch_size=options["batch_size"],
+                ignore_conflicts=True,
+            )
+            logger.info(f"{len(added)} role(s) added")
+            self.stdout.write(f"{len(added)} role(s) added")
+            if options["remove_stale"]:
+                removed, _ = stale.delete()
+                logger.info(f"{removed} stale role(s) removed")
+                self.stdout.write(f"{removed} stale role(s) removed")
@@ -1,32 +1,43 @@
 # Updates Top creators for live contests
 
+from collections import defaultdict
+
 from api.constants import MOVIE_STATE, RECOMMENDATION
-from api.models import Contest, CrewMember, TopCreator
+from api.cache import invalidate
+from api.management.snapshot import RankingSnapshot
+from api.models import Movie, MovieList, Profile, TopCreator
 from django.db import transaction
+from django.db.models import Count
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 from logging import getLogger
 
 logger = getLogger(__name__)
 
 
 class Command(BaseCommand):
+    stealth_options = ("snapshot",)
+
     def handle(self, *args, **options):
-        now = timezone.now()
-        live_contests = Contest.objects.filter(start__lte=now, end__gte=now).all()
+        snapshot = options.get("snapshot") or RankingSnapshot()
+        live_contests = snapshot.live_contests
         logger.info(f"Live contests: {len(live_contests)}")
+        movies_by_contest = self._get_movies_by_contest(snapshot)
+        recommend_counts = self._get_recommend_counts(live_contests)
+        names = self._get_director_names(movies_by_contest)
+
         for contest in live_contests:
-            logger.info(f"Contest: {contest.name} with {contest.movies.count()} movies")
-            movies_by_director = self._get_movies_by_director(contest)
-            logger.info(f"found {len(movies_by_director)} directors")
+            movies_by_director = movies_by_contest[contest.id]
+            logger.info(
+                f"Contest: {contest.name} with {len(movies_by_director)} directors"
+            )
             top_creators = []
-            for director, movies in movies_by_director.items():
+            for director_id, movies in movies_by_director.items():
                 top_creator_data = {
-                    "profile_id": director.id,
+                    "profile_id": director_id,
                     "contest_id": contest.id,
-                    "name": director.user.get_full_name(),
+                    "name": names[director_id],
                 }
-                top_creator_data.update(self._get_score(movies))
+                top_creator_data.update(self._get_score(movies, recommend_counts))
                 top_creators.append(top_creator_data)
 
             top_creators = sorted(
@@ -42,25 +53,26 @@ class Command(BaseCommand):
 
             logger.info(f"created {len(top_creators)} creator(s)")
             with transaction.atomic():
-                old_top_creators = TopCreator.objects.filter(contest=contest)
-                logger.info(f"deleting {old_top_creators.count()} creators")
-                old_top_creators.delete()
+                deleted, _ = TopCreator.objects.filter(contest=contest).delete()
+                logger.info(f"deleted {deleted} creators")
                 logger.info(f"adding {len(top_creators)} new creators")
                 TopCreator.objects.bulk_create(top_creators, batch_size=100)
+            invalidate(f"top_creators:{contest.id}")
 
-    def _get_score(self, movies):
+    def _get_score(self, movies, recommend_counts):
         score = {
             "score": 0,
             "recommend_count": 0,
         }
         avg_jury_rating = round(
-            sum(movie.jury_rating or 0 for movie in movies) / len(movies), 2
+            sum(jury_rating or 0 for _, jury_rating, _ in movies) / len(movies), 2
         )
         avg_audience_rating = round(
-            sum(movie.audience_rating or 0 for movie in movies) / len(movies), 2
+            sum(audience_rating or 0 for _, _, audience_rating in movies) / len(movies),
+            2,
         )
         sum_of_all_recommendations = sum(
-            movie.in_lists.filter(name=RECOMMENDATION).count() for movie in movies
+            recommend_counts.get(movie_id, 0) for movie_id, _, _ in movies
         )
 
         composite_score = (
@@ -75,21 +87,47 @@ class Command(BaseCommand):
         score["recommend_count"] = sum_of_all_recommendations
         return score
 
-    def _get_movies_by_director(self, contest):
-        movies_by_director = {}
-        for movie in contest.movies.filter(state=MOVIE_STATE.PUBLISHED).all():
-            directors = self._get_directors(movie)
+    def _get_movies_by_contest(self, snapshot):
+        """contest id => director profile id => [(movie id, jury, audience)]
+        for the published movies of all the live contests"""
+        movies_by_contest = defaultdict(lambda: defaultdict(list))
+        rows = Movie.contests.through.objects.filter(
+            contest__in=snapshot.live_contests
+        ).values_list("contest_id", "movie_id")
+        for contest_id, movie_id in rows:
+            if movie_id not in snapshot.published_movies:
+                continue
+            director_ids, jury_rating, audience_rating = snapshot.published_movies[
+                movie_id
+            ]
+            # co-directors are ranked with the movie each
+            for director_id in director_ids:
+                movies_by_contest[contest_id][director_id].append(
+                    (movie_id, jury_rating, audience_rating)
+                )
+        return movies_by_contest
 
-            for director in directors:
-                if director.id not in movies_by_director:
-                    movies_by_director[director] = []
-                movies_by_director[director].append(movie)
-        return movies_by_director
+    def _get_recommend_counts(self, contests):
+        """movie id => number of recommendation lists the movie is in"""
+        return dict(
+            MovieList.movies.through.objects.filter(
+                movielist__name=RECOMMENDATION,
+                movie__contests__in=contests,
+                movie__state=MOVIE_STATE.PUBLISHED,
+            )
+            .order_by()
+            .values("movie_id")
+            .annotate(recommend_count=Count("id", distinct=True))
+            .values_list("movie_id", "recommend_count")
+        )
 
-    def _get_directors(self, movie):
-        return [
-            dir_role.profile
-            for dir_role in CrewMember.objects.filter(
-                movie=movie, role__name="Director"
-            ).all()
-        ]
+    def _get_director_names(self, movies_by_contest):
+        director_ids = set()
+        for movies_by_director in movies_by_contest.values():
+            director_ids.update(movies_by_director.keys())
+        return {
+            profile.id: profile.user.get_full_name()
+            for profile in Profile.objects.filter(id__in=director_ids)
+            .select_related("user")
+            .only("id", "user", "user__first_name", "user__last_name")
+        }
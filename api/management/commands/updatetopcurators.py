@@ -1,70 +1,150 @@
 # Updates Top curators for live contests
 
+from hashlib import sha1
+
 from django.core.management.base import BaseCommand
-from api.models import TopCurator, Contest
+from django.db.models import Count
+from api.cache import invalidate
+from api.management.snapshot import RankingSnapshot
+from api.models import MovieList, TopCurator
 from logging import getLogger
-from django.utils import timezone
 from django.db import transaction
-from itertools import chain
 
 logger = getLogger(__name__)
 
 
 class Command(BaseCommand):
+    help = "Updates Top curators for live contests"
+    stealth_options = ("snapshot",)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help=(
+                "only recompute the lists whose movies or likes changed since the "
+                "last run, a change in the celeb recommendations (lists added, "
+                "changed or deleted, celebs added or removed) recomputes all"
+            ),
+        )
+
     def handle(self, *args, **options):
-        now = timezone.now()
-        live_contests = Contest.objects.filter(start__lte=now, end__gte=now).all()
+        snapshot = options.get("snapshot") or RankingSnapshot()
+        live_contests = snapshot.live_contests
         logger.info(f"Live contests: {len(live_contests)}")
-        curators = []
         for contest in live_contests:
             logger.info(f"Contest: {contest.name}")
-            recommend_lists = (
-                contest.movie_lists.all()
-                .prefetch_related("owner__profile")
-                .prefetch_related("movies")
-            )
-            celeb_recommend_lists = [
-                rl for rl in recommend_lists if rl.owner.profile.is_celeb
-            ]
-            celeb_recommend_movies = list(
-                chain(*[crl.movies.all() for crl in celeb_recommend_lists])
+            self.update_contest(contest, snapshot.now, options["incremental"])
+
+    def update_contest(self, contest, now, incremental=False):
+        recommend_lists = MovieList.objects.filter(contest=contest)
+        celeb_lists = recommend_lists.filter(owner__profile__is_celeb=True)
+        audience_lists = recommend_lists.filter(owner__profile__is_celeb=False)
+        celeb_movies = MovieList.movies.through.objects.filter(
+            movielist__in=celeb_lists
+        ).values("movie_id")
+        celeb_movie_count = celeb_movies.distinct().count()
+        logger.info(f"{celeb_movie_count} movies recommended by celebs")
+        # deleted lists and celeb flags flipped leave no newer list behind
+        celeb_list_ids = sorted(celeb_lists.values_list("id", flat=True))
+        celeb_digest = sha1(
+            f"{celeb_list_ids}:{celeb_movie_count}".encode()
+        ).hexdigest()
+
+        previous = {}
+        since = None
+        if incremental:
+            previous = {
+                curator.profile_id: curator
+                for curator in TopCurator.objects.filter(contest=contest)
+            }
+            since = max(
+                (curator.computed_at for curator in previous.values()),
+                default=None,
             )
-            logger.info(f"{len(celeb_recommend_movies)} movies recommended by celebs")
-            audience_recommend_lists = [
-                rl for rl in recommend_lists if not rl.owner.profile.is_celeb
-            ]
-            logger.info(f"{len(audience_recommend_lists)} people recommended movies")
-            for recommend_list in audience_recommend_lists:
-                likes = recommend_list.liked_by.count()
-                match_count = len(
-                    set(recommend_list.movies.all()).intersection(
-                        celeb_recommend_movies
-                    )
+            if (
+                since is None
+                or any(c.celeb_digest != celeb_digest for c in previous.values())
+                or celeb_lists.filter(updated_at__gte=since).exists()
+            ):
+                logger.info("celeb recommendations changed, recomputing all")
+                previous, since = {}, None
+
+        owners = list(audience_lists.values_list("id", "owner__profile__id"))
+        logger.info(f"{len(owners)} people recommended movies")
+        changed_lists = audience_lists
+        changed_ids = {list_id for list_id, _ in owners}
+        if since is not None:
+            changed_ids = set(
+                audience_lists.filter(updated_at__gte=since).values_list(
+                    "id", flat=True
                 )
-                match_percent = 0
-                if match_count > 0:
-                    match_percent = round(
-                        (match_count / len(celeb_recommend_movies)) * 100, 2
-                    )
-
-                score = round(likes * match_percent, 2) if match_percent > 0 else likes
-                curators.append(
-                    {
-                        "profile_id": recommend_list.owner.profile.id,
-                        "contest_id": contest.id,
-                        "likes_on_recommend": likes,
-                        "match": match_percent,
-                        "score": score,
-                    }
+            )
+            # lists without a row of the last run have to be computed as well
+            changed_ids.update(
+                list_id for list_id, profile_id in owners if profile_id not in previous
+            )
+            changed_lists = audience_lists.filter(id__in=changed_ids)
+            logger.info(f"{len(changed_ids)} list(s) changed since {since}")
+
+        likes = self._count_by_list(
+            MovieList.liked_by.through.objects.filter(movielist__in=changed_lists)
+        )
+        matches = self._count_by_list(
+            MovieList.movies.through.objects.filter(
+                movielist__in=changed_lists, movie_id__in=celeb_movies
+            )
+        )
+
+        curators = []
+        for list_id, profile_id in owners:
+            if list_id in changed_ids:
+                data = self._get_score(
+                    likes.get(list_id, 0), matches.get(list_id, 0), celeb_movie_count
                 )
+            else:
+                curator = previous[profile_id]
+                data = {
+                    "likes_on_recommend": curator.likes_on_recommend,
+                    "match": curator.match,
+                    "score": curator.score,
+                }
+            data.update(
+                profile_id=profile_id,
+                contest_id=contest.id,
+                computed_at=now,
+                celeb_digest=celeb_digest,
+            )
+            curators.append((list_id, data))
+
+        curators = sorted(curators, key=lambda x: (-x[1].get("score"), x[0]))
+        curators = [
+            TopCurator(pos=pos + 1, **data) for pos, (_, data) in enumerate(curators)
+        ]
+        with transaction.atomic():
+            logger.info("deleting top curators")
+            contest.top_curators.all().delete()
+
+            logger.info(f"inserting {len(curators)} new curators")
+            TopCurator.objects.bulk_create(curators, batch_size=100)
+        invalidate(f"top_curators:{contest.id}")
+
+    def _count_by_list(self, through_queryset):
+        return dict(
+            through_queryset.order_by()
+            .values("movielist_id")
+            .annotate(count=Count("id"))
+            .values_list("movielist_id", "count")
+        )
 
-            curators = sorted(curators, key=lambda x: x.get("score"), reverse=True)
-            curators = [
-                TopCurator(pos=pos + 1, **data) for pos, data in enumerate(curators)
-            ]
-            with transaction.atomic():
-                logger.info("deleting top curators")
-                contest.top_curators.all().delete()
+    def _get_score(self, likes, match_count, celeb_movie_count):
+        match_percent = 0
+        if match_count > 0:
+            match_percent = round((match_count / celeb_movie_count) * 100, 2)
 
-                logger.info(f"inserting {len(curators)} new curators")
-                TopCurator.objects.bulk_create(curators, batch_size=100)
+        score = round(likes * match_percent, 2) if match_percent > 0 else likes
+        return {
+            "likes_on_recommend": likes,
+            "match": match_percent,
+            "score": score,
+        }
@@ -0,0 +1,48 @@
+from functools import cached_property
+
+from django.db.models import Count
+from django.utils import timezone
+
+from api.constants import MOVIE_STATE
+from api.models import Contest, CrewMember, Movie, Profile
+
+
+class RankingSnapshot:
+    """Data read by more than one of the ranking jobs, every dataset is loaded
+    on its first use and then shared by the jobs run against the snapshot"""
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+
+    @cached_property
+    def follower_counts(self):
+        """profile id => number of followers"""
+        return dict(
+            Profile.follows.through.objects.order_by()
+            .values("to_profile_id")
+            .annotate(followers=Count("id"))
+            .values_list("to_profile_id", "followers")
+        )
+
+    @cached_property
+    def published_movies(self):
+        """movie id => (director profile ids, jury rating, audience rating) of
+        the published movies with a director, co-directors share the credit"""
+        director_ids = {}
+        for movie_id, profile_id in (
+            CrewMember.objects.directors()
+            .filter(movie__state=MOVIE_STATE.PUBLISHED)
+            .order_by("id")
+            .values_list("movie_id", "profile_id")
+        ):
+            director_ids.setdefault(movie_id, []).append(profile_id)
+        return {
+            movie_id: (director_ids[movie_id], jury_rating, audience_rating)
+            for movie_id, jury_rating, audience_rating in Movie.objects.filter(
+                id__in=director_ids.keys()
+            ).values_list("id", "jury_rating", "audience_rating")
+        }
+
+    @cached_property
+    def live_contests(self):
+        return list(Contest.objects.filter(start__lte=self.now, end__gte=self.now))
@@ -0,0 +1,15 @@
+import time
+from contextlib import contextmanager
+from logging import getLogger
+
+logger = getLogger("api.management")
+
+
+@contextmanager
+def timed(stdout, label):
+    """Reports the time taken by the enclosed block on `stdout` of a command"""
+    start = time.perf_counter()
+    yield
+    message = f"{label}: {time.perf_counter() - start:.3f}s"
+    logger.info(message)
+    stdout.write(message)
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-16 19:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_director_profile(apps, schema_editor):
+    Movie = apps.get_model("api", "Movie")
+    CrewMember = apps.get_model("api", "CrewMember")
+    directors = {}
+    # oldest director membership of a movie wins
+    for movie_id, profile_id in (
+        CrewMember.objects.filter(role__name="Director")
+        .order_by("-id")
+        .values_list("movie_id", "profile_id")
+    ):
+        directors[movie_id] = profile_id
+    movies = list(Movie.objects.filter(id__in=directors.keys()).only("id"))
+    for movie in movies:
+        movie.director_profile_id = directors[movie.id]
+    Movie.objects.bulk_update(movies, ["director_profile"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_auto_20210123_2125"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="director_profile",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="directed_movies",
+                to="api.profile",
+            ),
+        ),
+        migrations.RunPython(
+            backfill_director_profile, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-16 19:05
+
+from django.db import migrations, models
+
+
+def backfill_rating_sum_count(apps, schema_editor):
+    Movie = apps.get_model("api", "Movie")
+    MovieRateReview = apps.get_model("api", "MovieRateReview")
+    ratings = (
+        MovieRateReview.objects.exclude(rating__isnull=True)
+        .order_by()
+        .values("movie_id")
+        .annotate(rating_sum=models.Sum("rating"), rating_count=models.Count("id"))
+    )
+    movies = []
+    for row in ratings:
+        movies.append(
+            Movie(
+                id=row["movie_id"],
+                rating_sum=row["rating_sum"],
+                rating_count=row["rating_count"],
+            )
+        )
+    Movie.objects.bulk_update(movies, ["rating_sum", "rating_count"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_movie_director_profile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="rating_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_sum",
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(
+            backfill_rating_sum_count, reverse_code=migrations.RunPython.noop
+        ),
+    ]
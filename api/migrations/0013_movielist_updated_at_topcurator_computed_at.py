@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-16 19:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_movie_rating_sum_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movielist",
+            name="updated_at",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+        migrations.AddField(
+            model_name="topcurator",
+            name="computed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
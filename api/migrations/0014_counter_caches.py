@@ -0,0 +1,68 @@
+# Generated by Django 3.2.25 on 2026-10-16 20:10
+
+from django.db import migrations, models
+
+
+def backfill_counter_caches(apps, schema_editor):
+    MovieList = apps.get_model("api", "MovieList")
+    MovieRateReview = apps.get_model("api", "MovieRateReview")
+    likes = dict(
+        MovieRateReview.liked_by.through.objects.order_by()
+        .values("movieratereview_id")
+        .annotate(count=models.Count("id"))
+        .values_list("movieratereview_id", "count")
+    )
+    reviews = list(MovieRateReview.objects.filter(id__in=likes.keys()).only("id"))
+    for review in reviews:
+        review.like_count = likes[review.id]
+    MovieRateReview.objects.bulk_update(reviews, ["like_count"], batch_size=500)
+
+    likes = dict(
+        MovieList.liked_by.through.objects.order_by()
+        .values("movielist_id")
+        .annotate(count=models.Count("id"))
+        .values_list("movielist_id", "count")
+    )
+    movies = dict(
+        MovieList.movies.through.objects.order_by()
+        .values("movielist_id")
+        .annotate(count=models.Count("id"))
+        .values_list("movielist_id", "count")
+    )
+    movie_lists = list(
+        MovieList.objects.filter(id__in=likes.keys() | movies.keys()).only("id")
+    )
+    for movie_list in movie_lists:
+        movie_list.like_count = likes.get(movie_list.id, 0)
+        movie_list.movie_count = movies.get(movie_list.id, 0)
+    MovieList.objects.bulk_update(
+        movie_lists, ["like_count", "movie_count"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_movielist_updated_at_topcurator_computed_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movielist",
+            name="like_count",
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="movielist",
+            name="movie_count",
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="movieratereview",
+            name="like_count",
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(
+            backfill_counter_caches, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-16 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_counter_caches"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["-publish_on", "-recommend_count", "title"],
+                name="movie_feed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movieratereview",
+            index=models.Index(
+                fields=["like_count", "published_at"], name="review_likes_idx"
+            ),
+        ),
+    ]
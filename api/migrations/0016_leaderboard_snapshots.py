@@ -0,0 +1,84 @@
+# Generated by Django 3.2.25 on 2026-10-16 19:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_feed_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "board",
+                    models.CharField(
+                        choices=[("A", "Audience"), ("F", "Filmmaker")], max_length=1
+                    ),
+                ),
+                ("published", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.IntegerField()),
+                ("user_id", models.IntegerField()),
+                ("email", models.EmailField(max_length=254)),
+                ("name", models.CharField(max_length=300)),
+                ("image", models.CharField(blank=True, max_length=200, null=True)),
+                ("city", models.CharField(blank=True, max_length=100, null=True)),
+                ("level", models.IntegerField(default=1)),
+                ("is_celeb", models.BooleanField(default=False)),
+                ("curator_rank", models.IntegerField(default=-1)),
+                ("creator_rank", models.IntegerField(default=-1)),
+                ("engagement_score", models.FloatField(default=0)),
+                ("pop_score", models.FloatField(default=0)),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="api.profile",
+                    ),
+                ),
+                (
+                    "snapshot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entries",
+                        to="api.leaderboardsnapshot",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["snapshot", "rank"], name="leaderboard_rank_idx"
+            ),
+        ),
+    ]
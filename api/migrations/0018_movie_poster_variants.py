@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-16 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_email_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="poster_variants",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
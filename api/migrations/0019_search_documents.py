@@ -0,0 +1,164 @@
+# Generated by Django 3.2.25 on 2026-10-16 20:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# (table, row id column) of the search documents
+DOCUMENT_TABLES = [
+    ("api_moviesearchdocument", "movie_id"),
+    ("api_profilesearchdocument", "profile_id"),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, rowid in DOCUMENT_TABLES:
+        if vendor == "mysql":
+            # MATCH needs an index on exactly its columns, the title alone is
+            # matched for the ranking
+            schema_editor.execute(
+                f"CREATE FULLTEXT INDEX {table}_title_ft ON {table} (title)"
+            )
+            schema_editor.execute(
+                f"CREATE FULLTEXT INDEX {table}_ft ON {table} (title, body)"
+            )
+        elif vendor == "sqlite":
+            # external content table synced by triggers, which are lost if
+            # Django ever rebuilds the document table to alter it
+            fts = f"{table}_fts"
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5(title, body, "
+                f"content='{table}', content_rowid='{rowid}', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, title, body) "
+                f"VALUES (new.{rowid}, new.title, new.body); END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, title, body) "
+                f"VALUES ('delete', old.{rowid}, old.title, old.body); END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_au AFTER UPDATE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, title, body) "
+                f"VALUES ('delete', old.{rowid}, old.title, old.body); "
+                f"INSERT INTO {fts}(rowid, title, body) "
+                f"VALUES (new.{rowid}, new.title, new.body); END"
+            )
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    # the indexes of MySQL are dropped with the tables
+    if schema_editor.connection.vendor == "sqlite":
+        for table, _ in DOCUMENT_TABLES:
+            for suffix in ["ai", "ad", "au"]:
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_{suffix}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+def _join(*parts):
+    return " ".join(part for part in parts if part)
+
+
+def _full_name(user):
+    return _join(user.first_name, user.last_name)
+
+
+def backfill_search_documents(apps, schema_editor):
+    Movie = apps.get_model("api", "Movie")
+    Profile = apps.get_model("api", "Profile")
+    MovieSearchDocument = apps.get_model("api", "MovieSearchDocument")
+    ProfileSearchDocument = apps.get_model("api", "ProfileSearchDocument")
+
+    movies = Movie.objects.select_related("lang").prefetch_related(
+        "genres", "crewmember_set__profile__user"
+    )
+    MovieSearchDocument.objects.bulk_create(
+        (
+            MovieSearchDocument(
+                movie=movie,
+                title=movie.title,
+                body=_join(
+                    *sorted(
+                        {
+                            _full_name(member.profile.user)
+                            for member in movie.crewmember_set.all()
+                        }
+                    ),
+                    *[genre.name for genre in movie.genres.all()],
+                    movie.lang and movie.lang.name,
+                    movie.about,
+                ),
+            )
+            for movie in movies
+        ),
+        batch_size=500,
+    )
+    ProfileSearchDocument.objects.bulk_create(
+        (
+            ProfileSearchDocument(
+                profile=profile,
+                title=_full_name(profile.user),
+                body=_join(profile.city, profile.about),
+            )
+            for profile in Profile.objects.select_related("user")
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0018_movie_poster_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MovieSearchDocument",
+            fields=[
+                ("title", models.CharField(max_length=300)),
+                ("body", models.TextField(blank=True, default="")),
+                (
+                    "movie",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="api.movie",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="ProfileSearchDocument",
+            fields=[
+                ("title", models.CharField(max_length=300)),
+                ("body", models.TextField(blank=True, default="")),
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="api.profile",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+        migrations.RunPython(
+            backfill_search_documents, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-16 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_search_documents"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="topcurator",
+            name="celeb_digest",
+            field=models.CharField(blank=True, default="", max_length=40),
+        ),
+    ]
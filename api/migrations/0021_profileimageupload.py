@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-16 20:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_topcurator_celeb_digest"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileImageUpload",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("path", models.CharField(max_length=200)),
+                ("previous_image", models.URLField(blank=True, null=True)),
+                (
+                    "uploaded_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="image_upload",
+                        to="api.profile",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -1,6 +1,14 @@
 from .payment import Order, Package
-from .profile import Role, Profile, User
+from .profile import (
+    Role,
+    Profile,
+    ProfileImageUpload,
+    User,
+    LeaderboardSnapshot,
+    LeaderboardEntry,
+)
 from .others import Notification
+from .email import OutboxEmail
 from .contest import (
     ContestType,
     Contest,
@@ -18,6 +26,7 @@ from .movie import (
     TopCreator,
     TopCurator,
 )
+from .search import MovieSearchDocument, ProfileSearchDocument
 
 __all__ = [
     "Genre",
@@ -30,7 +39,11 @@ __all__ = [
     "Role",
     "User",
     "Profile",
+    "ProfileImageUpload",
+    "LeaderboardSnapshot",
+    "LeaderboardEntry",
     "Notification",
+    "OutboxEmail",
     "CrewMember",
     "MoviePoster",
     "MovieList",
@@ -39,4 +52,6 @@ __all__ = [
     "Contest",
     "TopCreator",
     "TopCurator",
+    "MovieSearchDocument",
+    "ProfileSearchDocument",
 ]
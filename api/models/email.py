@@ -0,0 +1,138 @@
+from datetime import timedelta
+from logging import getLogger
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.constants import EMAIL_STATE
+from api.emails import build_email
+
+logger = getLogger("api.mail")
+
+
+class OutboxEmailManager(models.Manager):
+    # emails claimed at a time, the SendGrid backend sends the ones sharing a
+    # template in a single request
+    BATCH_SIZE = 1000
+    # claimed emails are sent again if the worker dies before marking them
+    CLAIM_TIMEOUT = timedelta(minutes=10)
+
+    def enqueue(self, to, template_id, template_data, key=None):
+        """queues the email to be sent by the `sendemails` command, an email
+        with the same idempotency `key` is queued only once"""
+        email, created = self.get_or_create(
+            key=key or uuid4().hex,
+            defaults={
+                "to": to,
+                "template_id": template_id,
+                "template_data": template_data,
+            },
+        )
+        if not created:
+            logger.info(f"email {email.key} is already queued")
+        return email
+
+    def claim(self, batch_size):
+        """picks the queued emails which are due, concurrent workers skip the
+        ones claimed by the others"""
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(
+                self.select_for_update(skip_locked=True)
+                .filter(state=EMAIL_STATE.QUEUED, next_attempt_at__lte=now)
+                .order_by("id")[:batch_size]
+            )
+            self.filter(id__in=[email.id for email in emails]).update(
+                attempts=F("attempts") + 1, next_attempt_at=now + self.CLAIM_TIMEOUT
+            )
+        for email in emails:
+            email.attempts += 1
+        return emails
+
+    def send_queued(self, batch_size=BATCH_SIZE, connection=None):
+        """sends the queued emails which are due, returns the number of emails
+        sent and failed"""
+        connection = connection or get_connection(fail_silently=True)
+        sent = failed = 0
+        with connection:
+            while True:
+                emails = self.claim(batch_size)
+                if not emails:
+                    break
+                messages = [email.build_message() for email in emails]
+                error = None
+                try:
+                    connection.send_messages(messages)
+                except Exception as ex:
+                    logger.exception(f"sending {len(emails)} email(s) failed")
+                    error = repr(ex)
+                sent_ids, retried = [], []
+                for email, message in zip(emails, messages):
+                    # the SendGrid backend reports the outcome of each email,
+                    # with the others all of them succeed or fail together
+                    email.last_error = getattr(message, "error", error) or ""
+                    if getattr(message, "sent", error is None):
+                        sent_ids.append(email.id)
+                    else:
+                        retried.append(email)
+                self.filter(id__in=sent_ids).update(
+                    state=EMAIL_STATE.SENT, sent_at=timezone.now(), last_error=""
+                )
+                if retried:
+                    self._retry(retried)
+                sent += len(sent_ids)
+                failed += len(retried)
+        return sent, failed
+
+    def _retry(self, emails):
+        now = timezone.now()
+        for email in emails:
+            if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                logger.error(f"email {email.key} failed {email.attempts} times")
+                email.state = EMAIL_STATE.FAILED
+            else:
+                delay = settings.EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1)
+                email.next_attempt_at = now + timedelta(seconds=delay)
+        self.bulk_update(emails, ["state", "next_attempt_at", "last_error"])
+
+
+class OutboxEmail(models.Model):
+    EMAIL_STATE_CHOICES = [
+        (EMAIL_STATE.QUEUED, "Queued"),
+        (EMAIL_STATE.SENT, "Sent"),
+        (EMAIL_STATE.FAILED, "Failed"),
+    ]
+    # idempotency key, also sent to SendGrid as a custom arg
+    key = models.CharField(max_length=100, unique=True)
+    to = models.EmailField()
+    template_id = models.CharField(max_length=64)
+    template_data = models.JSONField(default=dict)
+    state = models.CharField(
+        max_length=1, choices=EMAIL_STATE_CHOICES, default=EMAIL_STATE.QUEUED
+    )
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = OutboxEmailManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["state", "next_attempt_at"], name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} - {self.to}"
+
+    def build_message(self):
+        message = build_email(
+            to=[self.to], template_id=self.template_id, template_data=self.template_data
+        )
+        message.custom_args = {"outbox_key": self.key}
+        return message
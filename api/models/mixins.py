@@ -0,0 +1,106 @@
+from django.db import models
+
+
+class DirtyFieldsMixin:
+    """Remembers the values of the concrete fields as they were loaded from or
+    last written to the database, `save()` of an existing instance then writes
+    only the fields changed since and skips the UPDATE when nothing changed.
+
+    Instances which were not loaded via the ORM and saves with explicit
+    `update_fields` or `force_insert` are saved as usual.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # attnames of the loaded fields => their values, deferred ones excluded
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_dirty_fields(self):
+        """attnames of the fields changed since the instance was loaded or
+        saved, None if the instance is not tracked"""
+        loaded = getattr(self, "_loaded_values", None)
+        pk_name = self._meta.pk.attname
+        if loaded is None or self.pk is None or loaded.get(pk_name) != self.pk:
+            # never loaded, or copied to a new row by resetting the pk
+            return None
+        dirty = set()
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                # deferred fields which were never assigned
+                continue
+            if field.attname not in loaded:
+                dirty.add(field.attname)
+            elif getattr(self, field.attname) != loaded[field.attname]:
+                dirty.add(field.attname)
+        return dirty
+
+    def get_original(self, attname):
+        """value of the field as it was loaded or last saved, raises
+        LookupError if it is not known i.e., the instance is not tracked or the
+        field was deferred"""
+        loaded = getattr(self, "_loaded_values", None)
+        pk_name = self._meta.pk.attname
+        if loaded is None or self.pk is None or loaded.get(pk_name) != self.pk:
+            raise LookupError(attname)
+        return loaded[attname]
+
+    def _snapshot(self, attnames=None):
+        loaded = getattr(self, "_loaded_values", None) or {}
+        for field in self._meta.concrete_fields:
+            if attnames is not None and field.attname not in attnames:
+                continue
+            if field.attname in self.__dict__:
+                loaded[field.attname] = getattr(self, field.attname)
+        self._loaded_values = loaded
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        tracked = (
+            not args
+            and not self._state.adding
+            and update_fields is None
+            and not kwargs.get("force_insert")
+        )
+        dirty = self.get_dirty_fields() if tracked else None
+        if dirty is not None:
+            if not dirty:
+                return
+            # auto_now fields are set on every save
+            dirty.update(
+                field.attname
+                for field in self._meta.concrete_fields
+                if getattr(field, "auto_now", False)
+            )
+            kwargs["update_fields"] = dirty
+        super().save(*args, **kwargs)
+        if update_fields is not None:
+            self._snapshot(
+                {self._meta.get_field(name).attname for name in update_fields}
+            )
+        else:
+            self._snapshot()
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if getattr(self, "_loaded_values", None) is not None:
+            if fields is None:
+                self._snapshot()
+            else:
+                self._snapshot({self._meta.get_field(name).attname for name in fields})
+
+
+class DirtyFieldsQuerySet(models.QuerySet):
+    """keeps the snapshots of the DirtyFieldsMixin instances in line with the
+    bulk updates, so that a later `save()` does not write the fields again and
+    the transitions are detected against the values actually in the database"""
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        updated = super().bulk_update(objs, fields, batch_size=batch_size)
+        attnames = {self.model._meta.get_field(name).attname for name in fields}
+        for obj in objs:
+            if getattr(obj, "_loaded_values", None) is not None:
+                obj._snapshot(attnames)
+        return updated
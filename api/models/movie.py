@@ -1,13 +1,21 @@
 from logging import getLogger
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, NullIf
+from django.db.models.signals import m2m_changed
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.db.models.constraints import UniqueConstraint
 
+from api.cache import invalidate
 from api.constants import (
     MOVIE_STATE,
     REVIEW_STATE,
     CREW_MEMBER_REQUEST_STATE,
+    DIRECTOR_ROLE,
 )
+from .mixins import DirtyFieldsMixin, DirtyFieldsQuerySet
+from .profile import Role
 
 logger = getLogger("api.models")
 
@@ -40,7 +48,7 @@ class MoviePoster(models.Model):
     movie = models.ForeignKey("Movie", on_delete=models.CASCADE)
 
 
-class Movie(models.Model):
+class Movie(DirtyFieldsMixin, models.Model):
     MOVIE_STATE_CHOICES = (
         (MOVIE_STATE.CREATED, "Created"),
         (MOVIE_STATE.SUBMITTED, "Submitted"),
@@ -76,12 +84,18 @@ class Movie(models.Model):
     )
     # to be uploaded by user (Poster)
     poster = models.URLField(null=True, blank=True)
+    # content hash and widths of the resized copies of the poster, see
+    # api.images, None until they are generated
+    poster_variants = models.JSONField(null=True, blank=True, editable=False)
     month = models.DateField(null=True, blank=True)
     # the time at which the movie's state was changed to published
     publish_on = models.DateTimeField(null=True, blank=True)
     jury_rating = models.FloatField(null=True, blank=True, default=0)
-    # cached audience rating to be updated periodically
+    # cached audience rating i.e., rating_sum / rating_count
     audience_rating = models.FloatField(null=True, blank=True, default=0)
+    # running sum and count of audience ratings
+    rating_sum = models.FloatField(default=0)
+    rating_count = models.IntegerField(default=0)
     contests = models.ManyToManyField("Contest", related_name="movies", blank=True)
 
     # cached attributes
@@ -91,9 +105,29 @@ class Movie(models.Model):
     approved = models.BooleanField(
         "Approved by Director", null=True, blank=True, default=None
     )
+    # first director of the movie shown with it, maintained on CrewMember
+    # writes. Access and credit go to all the directors, see
+    # `CrewMember.objects.directors()`
+    director_profile = models.ForeignKey(
+        "Profile",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="directed_movies",
+    )
+
+    objects = DirtyFieldsQuerySet.as_manager()
 
     class Meta:
         ordering = ["publish_on"]
+        indexes = [
+            # default ordering of the movie feeds, see api.pagination
+            models.Index(
+                fields=["-publish_on", "-recommend_count", "title"],
+                name="movie_feed_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -106,16 +140,72 @@ class Movie(models.Model):
         score += self.jury_rating or 0
         return round(score / 2, 1)
 
+    def update_audience_rating(self, old_rating=None, new_rating=None):
+        """Atomically replaces `old_rating` with `new_rating` in the running sum
+        and count of audience ratings, either of them can be None i.e.,
+        a rating was added or removed"""
+        sum_delta = (new_rating or 0) - (old_rating or 0)
+        count_delta = (new_rating is not None) - (old_rating is not None)
+        if not sum_delta and not count_delta:
+            return
+        rating_sum = F("rating_sum") + sum_delta
+        rating_count = F("rating_count") + count_delta
+        Movie.objects.filter(id=self.id).update(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            # NULL when no ratings are left, same as AVG over no rows
+            audience_rating=rating_sum / NullIf(rating_count, 0),
+        )
+        self.refresh_from_db(fields=["rating_sum", "rating_count", "audience_rating"])
+        invalidate_movie_pages(self.id)
+
+    def update_recommend_count(self, delta):
+        """Atomically adds `delta` to the recommend count, never going below 0,
+        without touching the other columns"""
+        Movie.objects.filter(id=self.id).update(
+            recommend_count=Greatest(F("recommend_count") + delta, 0)
+        )
+        self.refresh_from_db(fields=["recommend_count"])
+        invalidate_movie_pages(self.id)
+
     # TODO: override save to check the change in approved attribute,
     # and send email to owner of the order to inform them that the director
     # has approved the movie submission.
 
 
+def invalidate_movie_pages(*movie_ids):
+    """marks the cached new releases and the pages of the mp genres the movies
+    are listed in as stale"""
+    if not movie_ids:
+        return
+    mp_genre_ids = set(
+        Movie.mp_genres.through.objects.filter(movie_id__in=movie_ids).values_list(
+            "mpgenre_id", flat=True
+        )
+    )
+    invalidate("new_releases", *[f"mpgenre:{pk}" for pk in mp_genre_ids])
+
+
+class CrewMemberQuerySet(models.QuerySet):
+    def directors(self):
+        """the Director memberships, a movie can have co-directors"""
+        try:
+            return self.filter(role_id=Role.objects.get_id(DIRECTOR_ROLE))
+        except Role.DoesNotExist:
+            return self.none()
+
+    def directed_by(self, profile):
+        """ids of the movies directed (or co-directed) by the profile"""
+        return self.directors().filter(profile=profile).values("movie_id")
+
+
 class CrewMember(models.Model):
     movie = models.ForeignKey("Movie", on_delete=models.CASCADE)
     profile = models.ForeignKey("Profile", on_delete=models.CASCADE)
     role = models.ForeignKey("Role", on_delete=models.CASCADE)
 
+    objects = CrewMemberQuerySet.as_manager()
+
     class Meta:
         # one person(profile) cannot be a Director(Role) multiple times in a movie
         unique_together = [["movie", "profile", "role"]]
@@ -156,7 +246,7 @@ class CrewMemberRequest(models.Model):
             logger.info(f"{cm} a crew membership was approved and added to movie")
 
 
-class MovieList(models.Model):
+class MovieList(DirtyFieldsMixin, models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     movies = models.ManyToManyField("Movie", related_name="in_lists", blank=True)
     name = models.CharField(max_length=50)
@@ -169,6 +259,13 @@ class MovieList(models.Model):
         blank=True,
         related_name="movie_lists",
     )
+    # bumped whenever the movies or likes of the list change
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # cached attributes, maintained by the m2m_changed handlers in api.signals
+    like_count = models.IntegerField(default=0, db_index=True, editable=False)
+    movie_count = models.IntegerField(default=0, db_index=True, editable=False)
+
+    objects = DirtyFieldsQuerySet.as_manager()
 
     class Meta:
         unique_together = [["owner", "name"]]
@@ -176,6 +273,44 @@ class MovieList(models.Model):
     def is_celeb_recommends(self):
         return self.owner.is_celeb and self.contest and self.contest.name == self.name
 
+    def add_movie(self, movie):
+        """adds the movie to the list, returns False if it was in the list
+        already e.g., added by a concurrent request"""
+        try:
+            with transaction.atomic():
+                MovieList.movies.through.objects.create(movielist=self, movie=movie)
+        except IntegrityError:
+            return False
+        self._send_movies_changed("post_add", movie)
+        return True
+
+    def remove_movie(self, movie):
+        """removes the movie from the list, returns False if it was not in the
+        list e.g., removed by a concurrent request"""
+        with transaction.atomic():
+            self._send_movies_changed("pre_remove", movie)
+            deleted, _ = MovieList.movies.through.objects.filter(
+                movielist=self, movie=movie
+            ).delete()
+            if not deleted:
+                self.__dict__.pop("_counter_cache_removed", None)
+                return False
+            self._send_movies_changed("post_remove", movie)
+        return True
+
+    def _send_movies_changed(self, action, movie):
+        # same as `movies.add()`/`movies.remove()` but only for the rows which
+        # were actually inserted or deleted
+        m2m_changed.send(
+            sender=MovieList.movies.through,
+            instance=self,
+            action=action,
+            reverse=False,
+            model=Movie,
+            pk_set={movie.pk},
+            using=self._state.db,
+        )
+
 
 class Visits(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -198,9 +333,17 @@ class MovieRateReview(models.Model):
     # is nullable since user might review the movie first before rating or may choose to not rate at all
     rating = models.FloatField(null=True, blank=True)
     liked_by = models.ManyToManyField(User, related_name="liked_reviews", blank=True)
+    # cached attributes, maintained by the m2m_changed handlers in api.signals
+    like_count = models.IntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         unique_together = [["movie", "author"]]
+        indexes = [
+            # default ordering of the reviews, see api.pagination
+            models.Index(
+                fields=["like_count", "published_at"], name="review_likes_idx"
+            ),
+        ]
 
 
 class TopCreator(models.Model):
@@ -226,6 +369,10 @@ class TopCurator(models.Model):
     # score here is used just for keeping the sort order
     score = models.FloatField(default=0)
     pos = models.IntegerField(default=0)
+    # start of the run which computed the row
+    computed_at = models.DateTimeField(null=True, blank=True)
+    # digest of the celeb recommendations the row was computed against
+    celeb_digest = models.CharField(max_length=40, blank=True, default="")
 
     class Meta:
         unique_together = [["contest", "profile"]]
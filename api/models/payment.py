@@ -5,7 +5,7 @@ from django.contrib.auth.models import User
 
 from api.constants import MOVIE_STATE
 from api.emails import TEMPLATES, email_trigger
-
+from .mixins import DirtyFieldsMixin, DirtyFieldsQuerySet
 
 logger = getLogger(__name__)
 
@@ -18,7 +18,7 @@ class Package(models.Model):
         return self.name.title()
 
 
-class Order(models.Model):
+class Order(DirtyFieldsMixin, models.Model):
     order_id = models.CharField(max_length=100, null=True, blank=True)
     payment_id = models.CharField(max_length=100, null=True, blank=True)
     receipt_number = models.CharField(max_length=32, null=True, blank=True)
@@ -26,31 +26,55 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
 
+    objects = DirtyFieldsQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.order_id} - {'C' if self.payment_id else 'P'}"
 
+    def is_completing_payment(self):
+        """whether saving the order completes its payment, compared against the
+        payment id it was loaded with instead of re-reading the row"""
+        if not self.payment_id:
+            return False
+        if self.id is None:
+            return True
+        try:
+            return not self.get_original("payment_id")
+        except LookupError:
+            # not loaded via the ORM
+            return not Order.objects.values_list("payment_id", flat=True).get(
+                id=self.id
+            )
+
     def save(self, **kwargs):
         logger.info("order updated")
-        old_payment_id = None
-        if self.id:
-            old_order = Order.objects.get(id=self.id)
-            old_payment_id = old_order.payment_id
+        has_completed_payment = self.is_completing_payment()
         super().save(**kwargs)
-        new_payment_id = self.payment_id
-        has_completed_payment = bool(not old_payment_id and new_payment_id)
         logger.info(f"order updated has_completed_payment: {has_completed_payment}")
         if has_completed_payment:
             # for cases when credits are being used by the user - only one movie under this order can have state CREATED
             movie = self.movies.filter(state=MOVIE_STATE.CREATED).first()
             movie.state = MOVIE_STATE.SUBMITTED
             movie.save()
-            director = (
-                movie.crewmember_set.filter(role__name="Director").first().profile.user
-            )
+            director = movie.director_profile.user
+            # queued once per order even if the payment is verified again
+            key = f"order:{self.id}"
             if director == self.owner:
                 logger.debug("Submission by Director")
-                email_trigger(director, TEMPLATES.SUBMIT_CONFIRM_DIRECTOR)
+                email_trigger(
+                    director,
+                    TEMPLATES.SUBMIT_CONFIRM_DIRECTOR,
+                    idempotency_key=f"{key}:confirm-director",
+                )
             else:
                 logger.debug("Submission by crew member")
-                email_trigger(director, TEMPLATES.DIRECTOR_APPROVAL)
-                email_trigger(self.owner, TEMPLATES.SUBMIT_CONFIRM_CREW)
+                email_trigger(
+                    director,
+                    TEMPLATES.DIRECTOR_APPROVAL,
+                    idempotency_key=f"{key}:director-approval",
+                )
+                email_trigger(
+                    self.owner,
+                    TEMPLATES.SUBMIT_CONFIRM_CREW,
+                    idempotency_key=f"{key}:confirm-crew",
+                )
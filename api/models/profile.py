@@ -1,20 +1,63 @@
 from logging import getLogger
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from api.constants import GENDER
+from django.utils import timezone
+from api.constants import DEFAULT_AVATARS, GENDER, LEADERBOARD
 from api.emails import email_trigger, TEMPLATES
+from .mixins import DirtyFieldsMixin, DirtyFieldsQuerySet
 
 logger = getLogger("api.model")
 
 
+class RoleManager(models.Manager):
+    """Process wide registry of role name => id, loaded once and invalidated
+    whenever a role is saved or deleted (see `api.signals`)"""
+
+    _ids = None
+
+    def get_ids(self):
+        if RoleManager._ids is None:
+            # in case of duplicate names the oldest role wins, same as `.first()`
+            RoleManager._ids = dict(self.order_by("-id").values_list("name", "id"))
+        return RoleManager._ids
+
+    def get_id(self, name):
+        ids = self.get_ids()
+        if name not in ids:
+            # role might have been added by some other process
+            self.clear_cache()
+            ids = self.get_ids()
+        try:
+            return ids[name]
+        except KeyError:
+            raise self.model.DoesNotExist(f"Role '{name}' does not exist")
+
+    def clear_cache(self):
+        RoleManager._ids = None
+
+
 class Role(models.Model):
     name = models.CharField(max_length=20)
 
+    objects = RoleManager()
+
     def __str__(self):
         return self.name
 
 
-class Profile(models.Model):
+class ProfileQuerySet(DirtyFieldsQuerySet):
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        onboarding = []
+        if "onboarded" in fields:
+            onboarding = [profile for profile in objs if profile.is_onboarding()]
+        updated = super().bulk_update(objs, fields, batch_size=batch_size)
+        for profile in onboarding:
+            profile.on_onboarded()
+        return updated
+
+
+class Profile(DirtyFieldsMixin, models.Model):
     GENDER_CHOICES = (
         (GENDER.MALE, "Male"),
         (GENDER.FEMALE, "Female"),
@@ -61,24 +104,163 @@ class Profile(models.Model):
 
     titles = models.ManyToManyField("Title", blank=True, related_name="title_holders")
 
+    objects = ProfileQuerySet.as_manager()
+
     def __str__(self):
         return str(self.id)
 
-    def save(self, *args, **kwargs):
-        is_new = self.id is None
-        new_onboarding = is_new and self.onboarded
-        old_onboarding = (
-            not is_new
-            and not Profile.objects.get(pk=self.id).onboarded
-            and self.onboarded
+    def is_onboarding(self):
+        """whether saving the profile onboards the user, compared against the
+        value it was loaded with instead of re-reading the row"""
+        if not self.onboarded:
+            return False
+        if self.id is None:
+            return True
+        try:
+            return not self.get_original("onboarded")
+        except LookupError:
+            # not loaded via the ORM
+            return not Profile.objects.values_list("onboarded", flat=True).get(
+                pk=self.id
+            )
+
+    def on_onboarded(self):
+        logger.info(f"user onboarded! {self.user.email}")
+        email = email_trigger(
+            self.user, TEMPLATES.WELCOME, idempotency_key=f"welcome:{self.user_id}"
         )
+        logger.info(f"welcome email queued: {email.key}")
+        # FIXME: enable verification after changing Email provider
+        # success = email_trigger(self.user, TEMPLATES.VERIFY)
+        # logger.info(f"verification email sent: {success}")
+
+    def save(self, *args, **kwargs):
+        onboarding = self.is_onboarding()
         super().save(*args, **kwargs)
 
-        logger.info(f"new_onboarding/old_onboarding: {new_onboarding}/{old_onboarding}")
-        if new_onboarding or old_onboarding:
-            logger.info(f"user onboarded! {self.user.email}")
-            success = email_trigger(self.user, TEMPLATES.WELCOME)
-            logger.info(f"welcome email sent: {success}")
-            # FIXME: enable verification after changing Email provider
-            # success = email_trigger(self.user, TEMPLATES.VERIFY)
-            # logger.info(f"verification email sent: {success}")
+        logger.info(f"onboarding: {onboarding}")
+        if onboarding:
+            self.on_onboarded()
+
+
+class ProfileImageUpload(models.Model):
+    """An uploaded profile image waiting for the image workers (see
+    `api.images`), the profile shows PROCESSING_AVATAR until it is processed.
+    The uploads whose job was lost with its worker are processed by the
+    `processprofileimages` command."""
+
+    profile = models.OneToOneField(
+        Profile, on_delete=models.CASCADE, related_name="image_upload"
+    )
+    # replaced by a newer upload of the profile
+    path = models.CharField(max_length=200)
+    # restored if the upload can not be processed
+    previous_image = models.URLField(null=True, blank=True)
+    uploaded_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.profile_id} - {self.path}"
+
+
+class LeaderboardSnapshotManager(models.Manager):
+    # board => rank column of the profiles it is ordered by
+    RANK_FIELDS = {
+        LEADERBOARD.AUDIENCE: "curator_rank",
+        LEADERBOARD.FILMMAKER: "creator_rank",
+    }
+
+    def get_ranked_profiles(self, board):
+        rank_field = self.RANK_FIELDS[board]
+        return Profile.objects.filter(
+            is_celeb=False, onboarded=True, **{f"{rank_field}__gte": 0}
+        ).order_by(rank_field)
+
+    def get_current_id(self, board):
+        """id of the latest published snapshot of the board, None if the
+        ranking jobs have not published one yet"""
+        return (
+            self.filter(board=board, published=True)
+            .order_by("-id")
+            .values_list("id", flat=True)
+            .first()
+        )
+
+    def publish(self, board, batch_size=500):
+        """writes a snapshot of the board from the current ranks of the profiles
+        and switches the readers to it, returns the number of entries"""
+        rank_field = self.RANK_FIELDS[board]
+        snapshot = self.create(board=board)
+        profiles = self.get_ranked_profiles(board).select_related("user")
+        entries = LeaderboardEntry.objects.bulk_create(
+            (
+                LeaderboardEntry.from_profile(snapshot, profile, rank_field)
+                for profile in profiles.iterator()
+            ),
+            batch_size=batch_size,
+        )
+        with transaction.atomic():
+            self.filter(pk=snapshot.pk).update(published=True)
+            # the previous snapshots along with the ones of failed runs
+            self.filter(board=board).exclude(pk=snapshot.pk).delete()
+        return len(entries)
+
+
+class LeaderboardSnapshot(models.Model):
+    """A version of the audience or filmmaker leaderboard written by the ranking
+    jobs, the leaderboard views serve the latest published one"""
+
+    BOARD_CHOICES = (
+        (LEADERBOARD.AUDIENCE, "Audience"),
+        (LEADERBOARD.FILMMAKER, "Filmmaker"),
+    )
+    board = models.CharField(max_length=1, choices=BOARD_CHOICES)
+    published = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = LeaderboardSnapshotManager()
+
+
+class LeaderboardEntry(models.Model):
+    """Denormalised row of a leaderboard snapshot, carries everything the
+    leaderboard shows so that it is served without any joins"""
+
+    snapshot = models.ForeignKey(
+        LeaderboardSnapshot, on_delete=models.CASCADE, related_name="entries"
+    )
+    rank = models.IntegerField()
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="+")
+    user_id = models.IntegerField()
+    email = models.EmailField()
+    name = models.CharField(max_length=300)
+    image = models.CharField(max_length=200, null=True, blank=True)
+    city = models.CharField(max_length=100, null=True, blank=True)
+    level = models.IntegerField(default=1)
+    is_celeb = models.BooleanField(default=False)
+    curator_rank = models.IntegerField(default=-1)
+    creator_rank = models.IntegerField(default=-1)
+    engagement_score = models.FloatField(default=0)
+    pop_score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["snapshot", "rank"], name="leaderboard_rank_idx")
+        ]
+
+    @classmethod
+    def from_profile(cls, snapshot, profile, rank_field):
+        return cls(
+            snapshot=snapshot,
+            rank=getattr(profile, rank_field),
+            profile=profile,
+            user_id=profile.user_id,
+            email=profile.user.email,
+            name=profile.user.get_full_name(),
+            image=profile.image or DEFAULT_AVATARS.get(profile.gender),
+            city=profile.city,
+            level=profile.level,
+            is_celeb=profile.is_celeb,
+            curator_rank=profile.curator_rank,
+            creator_rank=profile.creator_rank,
+            engagement_score=profile.engagement_score,
+            pop_score=profile.pop_score,
+        )
@@ -0,0 +1,99 @@
+from django.db import models, transaction
+from django.db.models import Prefetch
+
+from .movie import CrewMember, Movie
+from .profile import Profile
+
+
+def _join(*parts):
+    return " ".join(part for part in parts if part)
+
+
+class SearchDocumentManager(models.Manager):
+    def rebuild(self, ids):
+        """rebuilds the documents of the objects with the ids from their
+        current rows, the documents of the deleted objects are removed"""
+        ids = set(ids)
+        documents = self.model.build_documents(ids)
+        with transaction.atomic():
+            self.filter(pk__in=ids).delete()
+            # a concurrent rebuild read the same rows
+            self.bulk_create(documents, ignore_conflicts=True)
+        return len(documents)
+
+
+class SearchDocument(models.Model):
+    """Denormalised text of an object which the full-text search runs on, the
+    title weighs more than the body in the ranking, see `api.search`"""
+
+    title = models.CharField(max_length=300)
+    body = models.TextField(blank=True, default="")
+
+    objects = SearchDocumentManager()
+
+    class Meta:
+        abstract = True
+
+
+class MovieSearchDocument(SearchDocument):
+    movie = models.OneToOneField(
+        Movie,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+
+    @classmethod
+    def build_documents(cls, movie_ids):
+        movies = (
+            Movie.objects.filter(id__in=movie_ids)
+            .select_related("lang")
+            .prefetch_related(
+                "genres",
+                Prefetch(
+                    "crewmember_set",
+                    queryset=CrewMember.objects.select_related("profile__user"),
+                ),
+            )
+        )
+        documents = []
+        for movie in movies:
+            # a member of the crew with several roles is named once
+            crew = {
+                member.profile.user.get_full_name()
+                for member in movie.crewmember_set.all()
+            }
+            documents.append(
+                cls(
+                    movie=movie,
+                    title=movie.title,
+                    body=_join(
+                        *sorted(crew),
+                        *[genre.name for genre in movie.genres.all()],
+                        movie.lang and movie.lang.name,
+                        movie.about,
+                    ),
+                )
+            )
+        return documents
+
+
+class ProfileSearchDocument(SearchDocument):
+    profile = models.OneToOneField(
+        Profile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+
+    @classmethod
+    def build_documents(cls, profile_ids):
+        profiles = Profile.objects.filter(id__in=profile_ids).select_related("user")
+        return [
+            cls(
+                profile=profile,
+                title=profile.user.get_full_name(),
+                body=_join(profile.city, profile.about),
+            )
+            for profile in profiles
+        ]
@@ -0,0 +1,325 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import F, OrderBy, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+# a term of the keyset ordering, `nulls_last` follows the native null ordering of
+# the database so that the ORDER BY matches the one of limit/offset pages and
+# the indexes on the ordering columns
+Key = namedtuple("Key", ["name", "descending", "nulls_last", "nullable"])
+
+
+class CachedCountPagination(LimitOffsetPagination):
+    """Limit/offset pagination which caches the total count of the filtered
+    queryset for PAGINATION_COUNT_TTL seconds, keyed on the view and the SQL of
+    the queryset.
+
+    Clients can ask for an estimated count with `count=estimate` (the planner
+    estimate on PostgreSQL, the cached count elsewhere) or skip the count with
+    `count=false`, the count is then null and the next link is found by
+    fetching one row more than the page.
+    """
+
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        mode = request.query_params.get(self.count_query_param, "").lower()
+        if mode not in ("false", "0"):
+            self.count_mode = "estimate" if mode == "estimate" else "exact"
+            return super().paginate_queryset(queryset, request, view)
+
+        self.count_mode = None
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.count = None
+        results = list(queryset[self.offset : self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        self.display_page_controls = False
+        return results[: self.limit]
+
+    def get_next_link(self):
+        if self.count is None:
+            if not self.has_next:
+                return None
+            url = self.request.build_absolute_uri()
+            url = replace_query_param(url, self.limit_query_param, self.limit)
+            return replace_query_param(
+                url, self.offset_query_param, self.offset + self.limit
+            )
+        return super().get_next_link()
+
+    def get_count(self, queryset):
+        if self.count_mode == "estimate":
+            estimate = self.get_estimated_count(queryset)
+            if estimate is not None:
+                return estimate
+        ttl = settings.PAGINATION_COUNT_TTL
+        if not ttl:
+            return super().get_count(queryset)
+        return cache.get_or_set(
+            self.get_count_cache_key(queryset),
+            lambda: super(CachedCountPagination, self).get_count(queryset),
+            ttl,
+        )
+
+    def get_count_cache_key(self, queryset):
+        view = type(self.view).__name__ if self.view is not None else ""
+        try:
+            sql = str(queryset.query)
+        except AttributeError:
+            # a list or any other sequence
+            return f"pagination-count:{view}:{id(queryset)}"
+        digest = hashlib.sha1(f"{view}:{sql}".encode()).hexdigest()
+        return f"pagination-count:{digest}"
+
+    def get_estimated_count(self, queryset):
+        """row estimate of the query planner, None where not available"""
+        query = getattr(queryset, "query", None)
+        if query is None or connections[queryset.db].vendor != "postgresql":
+            return None
+        sql, params = query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetPagination(CachedCountPagination):
+    """Cached count pagination which switches to keyset pagination when the
+    request carries a `cursor` parameter (empty for the first page).
+
+    The page after a cursor is selected with a WHERE on the ordering columns of
+    the last row seen instead of an OFFSET, and the total count is not computed,
+    so deep pages cost the same as the first one. Orderings on local fields and
+    annotations are supported, `pk` is appended as the tie breaker; querysets
+    ordered in any other way are paginated with limit/offset.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        keyset = self.get_keyset(queryset)
+        if keyset is None:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset = keyset
+        self.request = request
+        self.limit = self.get_limit(request) or self.default_limit or 25
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        keys = [self._invert(key) for key in keyset] if reverse else keyset
+        queryset = queryset.order_by(*[self._order_by(key) for key in keys])
+        results = self._rows_after(queryset, keys, position)
+        has_more = len(results) > self.limit
+        results = results[: self.limit]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self._position(results[-1])
+            if (has_more and reverse) or (position is not None and not reverse):
+                self.previous_position = self._position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        if self.keyset is None:
+            return super().get_paginated_response(data)
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_next_link(self):
+        if self.keyset is None:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.keyset is None:
+            return super().get_previous_link()
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_keyset(self, queryset):
+        """ordering of the queryset as keys, None if keyset pagination can not
+        be used for it"""
+        query = queryset.query
+        ordering = list(query.order_by) or list(queryset.model._meta.ordering)
+        nulls_largest = connections[queryset.db].features.nulls_order_largest
+        keys = []
+        for term in ordering:
+            if isinstance(term, str):
+                name = term.lstrip("-")
+                descending = term.startswith("-")
+            elif isinstance(term, OrderBy) and isinstance(term.expression, F):
+                name = term.expression.name
+                descending = term.descending
+            else:
+                return None
+            if name == "pk":
+                name = queryset.model._meta.pk.attname
+            nullable = self._is_nullable(queryset, name)
+            if nullable is None:
+                return None
+            keys.append(Key(name, descending, descending != nulls_largest, nullable))
+        pk_name = queryset.model._meta.pk.attname
+        if pk_name not in [key.name for key in keys]:
+            # in the direction of the last term, so that an index on the
+            # ordering columns can be scanned as it is
+            descending = keys[-1].descending if keys else False
+            keys.append(Key(pk_name, descending, False, False))
+        return keys
+
+    def encode_cursor(self, position, reverse):
+        # str() of dates keeps the microseconds unlike DjangoJSONEncoder, they
+        # are needed for the exact comparisons of the next page
+        cursor = json.dumps({"p": position, "r": reverse}, default=str)
+        encoded = urlsafe_b64encode(cursor.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        """(values of the ordering columns to continue after, reverse)"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            position = cursor["p"]
+            if len(position) != len(self.keyset):
+                raise ValueError
+            position = [
+                self._to_python(model, key.name, value)
+                for key, value in zip(self.keyset, position)
+            ]
+            return position, bool(cursor["r"])
+        except (
+            Base64Error,
+            KeyError,
+            TypeError,
+            ValueError,
+            UnicodeDecodeError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _is_nullable(self, queryset, name):
+        """whether the ordering column can be null, None if it can not be read
+        off the rows i.e., is not a local field or an annotation"""
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            target = getattr(annotation, "target", None)
+            return target.null if target is not None else True
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.is_relation:
+            return None
+        return field.null
+
+    def _to_python(self, model, name, value):
+        if value is None:
+            return None
+        try:
+            return model._meta.get_field(name).to_python(value)
+        except FieldDoesNotExist:
+            return value
+
+    def _position(self, instance):
+        return [getattr(instance, key.name) for key in self.keyset]
+
+    def _invert(self, key):
+        return Key(key.name, not key.descending, not key.nulls_last, key.nullable)
+
+    def _order_by(self, key):
+        return F(key.name).desc() if key.descending else F(key.name).asc()
+
+    def _rows_after(self, queryset, keys, position):
+        """first limit + 1 rows after `position` in the order of `keys`"""
+        size = self.limit + 1
+        if position is None:
+            return list(queryset[:size])
+        condition, nulls = self._after(keys, position)
+        results = list(queryset.filter(condition)[:size])
+        if nulls is not None and len(results) < size:
+            results += queryset.filter(nulls)[: size - len(results)]
+        return results
+
+    def _after(self, keys, position):
+        """rows after `position` in the order of `keys`, as the condition on
+        the rows up to the nulls of the leading column and the condition on
+        these nulls when they sort last (None otherwise)
+
+        The first one is a range on the leading column followed by the tie
+        breaks on the others, so that an index on the ordering columns is
+        searched from the position instead of scanned from the first row. Nulls
+        can not be part of that range, OR-ing them in turns the search back into
+        a scan, they are selected on their own after the other rows instead.
+        """
+        first, value = keys[0], position[0]
+        if value is None:
+            return self._expand(keys, position), None
+        bound, lookup = ("lte", "lt") if first.descending else ("gte", "gt")
+        condition = Q(**{f"{first.name}__{bound}": value}) & (
+            Q(**{f"{first.name}__{lookup}": value})
+            | Q(**{first.name: value}) & self._expand(keys[1:], position[1:])
+        )
+        nulls = None
+        if first.nulls_last and first.nullable:
+            nulls = Q(**{f"{first.name}__isnull": True})
+        return condition, nulls
+
+    def _expand(self, keys, position):
+        """rows after `position` in the order of `keys`, the lexicographic
+        (a > x) or (a = x and b > y) or ... expansion of the row comparison"""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for key, value in zip(keys, position):
+            if value is None:
+                after = Q(**{f"{key.name}__isnull": False})
+                if key.nulls_last or not key.nullable:
+                    # nothing sorts after null
+                    after = Q(pk__in=[])
+                same = Q(**{f"{key.name}__isnull": True})
+            else:
+                lookup = "lt" if key.descending else "gt"
+                after = Q(**{f"{key.name}__{lookup}": value})
+                if key.nulls_last and key.nullable:
+                    after |= Q(**{f"{key.name}__isnull": True})
+                same = Q(**{key.name: value})
+            condition |= equal & after
+            equal &= same
+        return condition
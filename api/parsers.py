@@ -0,0 +1,66 @@
+"""Streaming parser of the multipart uploads.
+
+The uploaded files are spooled to temporary files chunk by chunk as the body is
+read, never held in memory, and hashed on the way so that the content-addressed
+storage does not read them again. A request larger than UPLOAD_MAX_SIZE (plus
+the form fields, unless they are unlimited) is rejected before its body is
+read, a file growing past it while streaming as soon as it does.
+"""
+
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+from rest_framework import parsers
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """spools the files to temporary files, setting the hex SHA-256 of each on
+    its `content_hash`"""
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.UPLOAD_MAX_SIZE
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        # the form fields are capped by DATA_UPLOAD_MAX_MEMORY_SIZE, None when
+        # they are not, the files are still capped while they are streamed
+        fields_max_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        if fields_max_size is None:
+            return
+        if content_length > self.max_size + fields_max_size:
+            raise MultiPartParserError(
+                f"request larger than {self.max_size} bytes of uploads"
+            )
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.file.close()
+            raise MultiPartParserError(
+                f"{self.field_name} larger than {self.max_size} bytes"
+            )
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_hash = self.digest.hexdigest()
+        return file
+
+
+class StreamingMultiPartParser(parsers.MultiPartParser):
+    """`MultiPartParser` with the files spooled by `HashingUploadHandler`"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context["request"]
+        request.upload_handlers = [HashingUploadHandler(request)]
+        return super().parse(stream, media_type, parser_context)
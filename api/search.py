@@ -0,0 +1,245 @@
+"""Full-text search of the movies and profiles.
+
+Each movie and profile has a search document (see `api.models.search`) with
+its title, the names of the crew, the genres, the language and the about text,
+rebuilt once the transactions changing any of them are committed. The `search`
+query parameter is matched against the documents instead of LIKE scans over the
+joined tables, each term as the prefix of a word and all the terms required:
+
+* MySQL: the FULLTEXT indexes on the documents, in boolean mode
+* SQLite: an FTS5 table kept in step with the documents by triggers, ranked
+  with bm25
+* anywhere else the documents are scanned with LIKE, without a ranking
+
+The matches are ordered by relevance unless an `ordering` is requested.
+"""
+
+import re
+import threading
+from collections import defaultdict
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, NotSupportedError, connections, transaction
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from api.models import (
+    CrewMember,
+    Genre,
+    Movie,
+    MovieLanguage,
+    MovieSearchDocument,
+    Profile,
+    ProfileSearchDocument,
+    User,
+)
+
+# at most this many terms of a query are searched
+MAX_TERMS = 8
+# the title counts this many times the body in the ranking
+TITLE_WEIGHT = 10.0
+
+DOCUMENTS = {
+    Movie: MovieSearchDocument,
+    Profile: ProfileSearchDocument,
+}
+
+
+def get_terms(query):
+    return re.findall(r"[^\W_]+", query.lower())[:MAX_TERMS]
+
+
+def get_fts_table(document):
+    """name of the FTS5 table indexing the documents on SQLite"""
+    return f"{document._meta.db_table}_fts"
+
+
+class Match(Func):
+    """MySQL `MATCH (columns) AGAINST (query IN BOOLEAN MODE)`, 0 for the rows
+    which do not match"""
+
+    output_field = FloatField()
+
+    def __init__(self, *columns, query):
+        super().__init__(*columns)
+        self.query = query
+
+    def as_sql(self, compiler, connection):
+        if connection.vendor != "mysql":
+            raise NotSupportedError("MATCH ... AGAINST is only supported on MySQL")
+        sql, params = super().as_sql(
+            compiler,
+            connection,
+            template="MATCH (%(expressions)s) AGAINST (%%s IN BOOLEAN MODE)",
+        )
+        return sql, (*params, self.query)
+
+
+class FTS5Match(Func):
+    """whether the row ids of the expression are in the matches of the FTS5
+    table, the rows are looked up by the ids of the matches"""
+
+    output_field = BooleanField()
+
+    def __init__(self, rowid, table, query):
+        super().__init__(rowid)
+        self.table = table
+        self.query = query
+
+    def as_sql(self, compiler, connection):
+        if connection.vendor != "sqlite":
+            raise NotSupportedError("FTS5 is only supported on SQLite")
+        table = connection.ops.quote_name(self.table)
+        sql, params = super().as_sql(
+            compiler,
+            connection,
+            template=(
+                f"%(expressions)s IN (SELECT rowid FROM {table} "
+                f"WHERE {table} MATCH %%s)"
+            ),
+        )
+        return sql, (*params, self.query)
+
+
+class FTS5Rank(FTS5Match):
+    """bm25 relevance of the row in the FTS5 table, greater is better, NULL for
+    the rows which do not match"""
+
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection):
+        if connection.vendor != "sqlite":
+            raise NotSupportedError("FTS5 is only supported on SQLite")
+        table = connection.ops.quote_name(self.table)
+        sql, params = Func.as_sql(
+            self,
+            compiler,
+            connection,
+            # bm25 is negative, lower for the better matches
+            template=(
+                f"(SELECT -bm25({table}, {TITLE_WEIGHT}, 1.0) FROM {table} "
+                f"WHERE {table} MATCH %%s AND rowid = %(expressions)s)"
+            ),
+        )
+        return sql, (self.query, *params)
+
+
+def search(queryset, query):
+    """the objects of the queryset (of a model with search documents) matching
+    all the terms of the query, annotated with their `search_rank`"""
+    terms = get_terms(query)
+    if not terms:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == "mysql":
+        query = " ".join(f"+{term}*" for term in terms)
+        title, body = F("search_document__title"), F("search_document__body")
+        # the condition on a single MATCH is the one served by its index
+        return (
+            queryset.annotate(search_match=Match(title, body, query=query))
+            .filter(search_match__gt=0)
+            .annotate(
+                search_rank=Match(title, query=query) * TITLE_WEIGHT
+                + Match(title, body, query=query)
+            )
+        )
+    if vendor == "sqlite":
+        query = " ".join(f'"{term}"*' for term in terms)
+        table = get_fts_table(DOCUMENTS[queryset.model])
+        return queryset.filter(FTS5Match(F("pk"), table, query)).annotate(
+            search_rank=FTS5Rank(F("pk"), table, query)
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(search_document__title__icontains=term) | Q(
+            search_document__body__icontains=term
+        )
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """`?search=` over the search documents of the listed model, the other
+    models are left unfiltered"""
+
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        if not query.strip() or queryset.model not in DOCUMENTS:
+            return queryset
+        queryset = search(queryset, query)
+        if "search_rank" not in queryset.query.annotations:
+            return queryset
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        # the ordering of the view breaks the ties
+        return queryset.order_by("-search_rank", *queryset.query.order_by)
+
+
+class PendingDocuments(threading.local):
+    """ids of the changed objects per database and model, of the transactions
+    of the current thread"""
+
+    def __init__(self):
+        self.ids = {}
+
+    def add(self, using, model, ids):
+        self.ids.setdefault(using, defaultdict(set))[model].update(ids)
+
+    def flush(self, using):
+        """rebuilds the documents of the objects changed since the last flush,
+        the later callbacks of the same transaction find nothing left"""
+        ids = self.ids.pop(using, None)
+        if ids:
+            rebuild_documents(ids)
+
+
+pending_documents = PendingDocuments()
+
+
+def rebuild_documents(ids):
+    """rebuilds the documents affected by the changed objects, model => ids"""
+    movie_ids, profile_ids = set(ids[Movie]), set(ids[Profile])
+    if ids[User]:
+        user_ids = ids[User]
+        profile_ids |= set(
+            Profile.objects.filter(user_id__in=user_ids).values_list("id", flat=True)
+        )
+        movie_ids |= set(
+            CrewMember.objects.filter(profile__user_id__in=user_ids).values_list(
+                "movie_id", flat=True
+            )
+        )
+    if ids[Genre]:
+        movie_ids |= set(
+            Movie.genres.through.objects.filter(genre_id__in=ids[Genre]).values_list(
+                "movie_id", flat=True
+            )
+        )
+    if ids[MovieLanguage]:
+        movie_ids |= set(
+            Movie.objects.filter(lang_id__in=ids[MovieLanguage]).values_list(
+                "id", flat=True
+            )
+        )
+    if movie_ids:
+        MovieSearchDocument.objects.rebuild(movie_ids)
+    if profile_ids:
+        ProfileSearchDocument.objects.rebuild(profile_ids)
+
+
+def schedule_update(model, ids, using=DEFAULT_DB_ALIAS):
+    """rebuilds the documents affected by the change of the objects of the
+    model once the current transaction is committed
+
+    Every change registers a callback but the first one of the transaction
+    rebuilds the documents of all of them. The ids of a rolled back
+    transaction or savepoint are rebuilt with the next commit instead, the
+    documents are rebuilt from the current rows either way.
+    """
+    pending_documents.add(using, model, ids)
+    transaction.on_commit(partial(pending_documents.flush, using), using=using)
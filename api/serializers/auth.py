@@ -83,11 +83,7 @@ class ActivationResentSerializer(Serializer):
                 profile = Profile.objects.create(user=user)
                 profile.save()
                 logger.warn(f"{email}: Empty profile created!")
-            email_trigger(
-                profile.user,
-                TEMPLATES.VERIFY,
-                fail_silently=False,
-            )
+            email_trigger(profile.user, TEMPLATES.VERIFY)
 
 
 class ForgotPasswordSerializer(Serializer):
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework.exceptions import ValidationError
 from api.constants import MOVIE_STATE
 from api.models.movie import MovieList
@@ -27,7 +28,7 @@ class ContestRecommendListSerializer(serializers.ModelSerializer):
         except MovieList.DoesNotExist:
             return 0
         else:
-            return movie_list.movies.count()
+            return movie_list.movie_count
 
     def validate(self, attrs):
         if not self.instance.is_live():
@@ -43,12 +44,13 @@ class ContestRecommendListSerializer(serializers.ModelSerializer):
         movie_list, _ = MovieList.objects.get_or_create(
             name=contest.name, owner=user, contest=contest
         )
-        if action == "add":
-            movie_list.movies.add(movie)
-            movie.recommend_count += 1
-            movie.save()
-        elif action == "remove":
-            movie_list.movies.remove(movie)
-            movie.recommend_count = max(movie.recommend_count - 1, 0)
-            movie.save()
+        # counted only when the list actually changed, so that repeated or
+        # concurrent requests do not count twice
+        with transaction.atomic():
+            if action == "add":
+                if movie_list.add_movie(movie):
+                    movie.update_recommend_count(1)
+            elif action == "remove":
+                if movie_list.remove_movie(movie):
+                    movie.update_recommend_count(-1)
         return contest
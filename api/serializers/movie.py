@@ -4,18 +4,23 @@ from rest_framework.exceptions import ValidationError
 from api.models.movie import MpGenre, TopCreator, TopCurator
 from logging import getLogger
 import hashlib
-import os
 import re
 
 from django.conf import settings
-from django.db.models import Avg, Count
+from django.db.models import Count, Prefetch, Q
 from django.db import transaction
-from django.core.files.storage import default_storage
 from rest_framework import serializers
 from collections import defaultdict
 import razorpay
 
-from api.constants import MOVIE_STATE, CREW_MEMBER_REQUEST_STATE, RECOMMENDATION
+from api import images
+from api.storage import content_storage
+from api.constants import (
+    MOVIE_STATE,
+    CREW_MEMBER_REQUEST_STATE,
+    RECOMMENDATION,
+    DIRECTOR_ROLE,
+)
 from api.models import (
     User,
     Movie,
@@ -71,10 +76,11 @@ class MovieLanguageSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         name = validated_data.get("name")
-        try:
-            lang = MovieLanguage.objects.get(name=name)
+        # the existing languages are not all lowercase
+        lang = MovieLanguage.objects.filter(name__iexact=name).order_by("id").first()
+        if lang:
             logger.debug(f"language `{name}` exists")
-        except MovieLanguage.DoesNotExist:
+        else:
             lang = MovieLanguage.objects.create(name=name)
             logger.debug(f"New language `{name}` added")
         return lang
@@ -91,7 +97,9 @@ class RoleSerializer(serializers.ModelSerializer):
         fields = ["name"]
 
     def validate_name(self, name):
-        if not Role.objects.filter(name=name).exists():
+        try:
+            Role.objects.get_id(name)
+        except Role.DoesNotExist:
             raise ValidationError(f"Unknown role '{name}'")
         return name
 
@@ -182,6 +190,7 @@ class SubmissionEntrySerializer(serializers.ModelSerializer):
 
 class MovieSerializerSummary(serializers.ModelSerializer):
     contests = serializers.SerializerMethodField()
+    poster_srcset = serializers.SerializerMethodField()
     crew = CrewMemberSerializer(source="crewmember_set", many=True)
 
     class Meta:
@@ -190,6 +199,7 @@ class MovieSerializerSummary(serializers.ModelSerializer):
             "id",
             "title",
             "poster",
+            "poster_srcset",
             "about",
             "contests",
             "crew",
@@ -201,11 +211,21 @@ class MovieSerializerSummary(serializers.ModelSerializer):
             "runtime",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(
+            Prefetch("contests", queryset=Contest.objects.only("id", "name")),
+            Prefetch(
+                "crewmember_set",
+                queryset=CrewMember.objects.select_related("role", "profile__user"),
+            ),
+        )
+
     def get_contests(self, obj):
-        contests = obj.contests.values(
-            "name",
-        ).all()
-        return [contest["name"] for contest in contests]
+        return [contest.name for contest in obj.contests.all()]
+
+    def get_poster_srcset(self, movie):
+        return images.get_poster_srcset(movie.poster_variants)
 
 
 class ContestSerializer(serializers.ModelSerializer):
@@ -217,6 +237,9 @@ class ContestSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "is_live", "start", "end", "recommended_movies"]
 
     def get_recommended_movies(self, contest):
+        viewer = self.context.get("viewer")
+        if viewer is not None:
+            return viewer.contest_recommends.get(contest.id, [])
         request = self.context.get("request")
         if not request.user.is_authenticated:
             return []
@@ -230,6 +253,51 @@ class ContestSerializer(serializers.ModelSerializer):
             return movie_ids
 
 
+class MovieViewerContext:
+    """Requestor specific state of a movie i.e., their rating, watchlist,
+    recommendation and live contest recommend lists.
+
+    Resolved in a fixed number of queries irrespective of the crew size or
+    the number of live contests the movie has participated in
+    """
+
+    def __init__(self, user, movie):
+        self.live_contests = [
+            contest for contest in movie.contests.all() if contest.is_live()
+        ]
+        self.review = None
+        self.is_watchlisted = False
+        self.is_recommended = False
+        # live contest id => [{"id": movie_id}] recommended by the requestor
+        self.contest_recommends = {}
+        if user is not None and user.is_authenticated:
+            self._load(user, movie)
+
+    def _load(self, user, movie):
+        self.review = MovieRateReview.objects.filter(movie=movie, author=user).first()
+        self.is_watchlisted = Profile.watchlist.through.objects.filter(
+            profile__user=user, movie=movie
+        ).exists()
+
+        live_contest_ids = [contest.id for contest in self.live_contests]
+        memberships = (
+            MovieList.movies.through.objects.filter(movielist__owner=user)
+            .filter(
+                Q(movielist__name=RECOMMENDATION, movie=movie)
+                | Q(movielist__contest__in=live_contest_ids)
+            )
+            .order_by("movie__publish_on")
+            .values_list("movielist__name", "movielist__contest_id", "movie_id")
+        )
+        for list_name, contest_id, movie_id in memberships:
+            if list_name == RECOMMENDATION and movie_id == movie.id:
+                self.is_recommended = True
+            if contest_id in live_contest_ids:
+                self.contest_recommends.setdefault(contest_id, []).append(
+                    {"id": movie_id}
+                )
+
+
 class MovieSerializer(serializers.ModelSerializer):
     order = OrderSerializer(required=False)
     lang = MovieLanguageSerializer()
@@ -245,6 +313,7 @@ class MovieSerializer(serializers.ModelSerializer):
     # is recommended by the requestor if he is authenticated
     is_recommended = serializers.SerializerMethodField(read_only=True)
     contests = serializers.SerializerMethodField()
+    poster_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Movie
@@ -258,6 +327,7 @@ class MovieSerializer(serializers.ModelSerializer):
             "genres",
             "lang",
             "poster",
+            "poster_srcset",
             "package",
             "crew",
             "director",
@@ -275,10 +345,24 @@ class MovieSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["about", "state"]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("order", "lang", "package").prefetch_related(
+            "genres",
+            "contests",
+            Prefetch(
+                "crewmember_set",
+                queryset=CrewMember.objects.select_related("role", "profile__user"),
+            ),
+        )
+
+    def get_poster_srcset(self, movie):
+        return images.get_poster_srcset(movie.poster_variants)
+
     def get_contests(self, movie):
         return ContestSerializer(
-            instance=[contest for contest in movie.contests.all() if contest.is_live()],
-            context=self.context,
+            instance=self._viewer.live_contests,
+            context={**self.context, "viewer": self._viewer},
             read_only=True,
             many=True,
         ).data
@@ -286,26 +370,13 @@ class MovieSerializer(serializers.ModelSerializer):
     def get_requestor_rating(self, movie):
         request = self.context.get("request")
         if request and request.user.is_authenticated:
-            review = MovieRateReview.objects.filter(
-                movie=movie, author=request.user
-            ).first()
-            return MovieReviewSerializer(instance=review).data
+            return MovieReviewSerializer(instance=self._viewer.review).data
 
     def get_is_recommended(self, movie):
-        request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            recommendation_list = MovieList.objects.filter(
-                owner=request.user, name=RECOMMENDATION
-            ).first()
-            if recommendation_list:
-                return recommendation_list.movies.filter(id=movie.id).exists()
-        return False
+        return self._viewer.is_recommended
 
     def get_is_watchlisted(self, movie):
-        request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            return movie.watchlisted_by.filter(user=request.user).exists()
-        return False
+        return self._viewer.is_watchlisted
 
     def get_crew(self, movie):
         # since one user can have multiple roles, we can
@@ -357,7 +428,7 @@ class MovieSerializer(serializers.ModelSerializer):
         validated_data["order"] = Order.objects.create(owner=user)
         validated_data["state"] = MOVIE_STATE.CREATED
         creator_is_director = any(
-            role.get("name") == "Director" for role in creator_roles
+            role.get("name") == DIRECTOR_ROLE for role in creator_roles
         )
         if creator_is_director:
             validated_data["approved"] = creator_is_director
@@ -389,7 +460,7 @@ class MovieSerializer(serializers.ModelSerializer):
         director_data = validated_data.pop("director", {})
         creator_roles = validated_data.pop("roles", [])
         creator_is_director = any(
-            role.get("name") == "Director" for role in creator_roles
+            role.get("name") == DIRECTOR_ROLE for role in creator_roles
         )
         if creator_is_director and "approved" not in validated_data:
             validated_data["approved"] = creator_is_director
@@ -413,8 +484,8 @@ class MovieSerializer(serializers.ModelSerializer):
         return movie
 
     def _is_director_present(self, movie):
-        director_role = Role.objects.get(name="Director")
-        return CrewMember.objects.filter(movie=movie, role=director_role).exists()
+        # kept in sync on CrewMember writes, see `api.signals`
+        return movie.director_profile_id is not None
 
     def _attach_director_role(
         self,
@@ -443,10 +514,10 @@ class MovieSerializer(serializers.ModelSerializer):
                 )
 
             # remove existing director relation on movie
-            director_role = Role.objects.get(name="Director")
-            CrewMember.objects.filter(role=director_role, movie=movie).delete()
+            director_role_id = Role.objects.get_id(DIRECTOR_ROLE)
+            CrewMember.objects.filter(role_id=director_role_id, movie=movie).delete()
             CrewMember.objects.create(
-                profile=director_profile, movie=movie, role=director_role
+                profile=director_profile, movie=movie, role_id=director_role_id
             )
 
     def _attach_creator_roles(
@@ -459,11 +530,11 @@ class MovieSerializer(serializers.ModelSerializer):
         """Attach all non-director roles to the creator
         if creator is the director then add CrewMember otherwise add as CrewMemeberRequest
         """
-        director_role = Role.objects.get(name="Director")
+        director_role_id = Role.objects.get_id(DIRECTOR_ROLE)
         creator_role_names = [
             role.get("name")
             for role in creator_roles_data
-            if role.get("name") != "Director"
+            if role.get("name") != DIRECTOR_ROLE
         ]
         creator_roles = Role.objects.filter(name__in=creator_role_names).all()
         logger.debug(f"creator_roles:{creator_roles}")
@@ -471,7 +542,7 @@ class MovieSerializer(serializers.ModelSerializer):
         # clear all roles of creator
         if creator_is_director:
             CrewMember.objects.filter(movie=movie, profile=creator_profile).exclude(
-                role__in=[director_role]
+                role_id=director_role_id
             ).delete()
         else:
             CrewMemberRequest.objects.filter(movie=movie).delete()
@@ -506,6 +577,8 @@ class MovieSerializer(serializers.ModelSerializer):
         return existing_genres
 
     def to_representation(self, instance):
+        request = self.context.get("request")
+        self._viewer = MovieViewerContext(request and request.user, instance)
         data = super().to_representation(instance)
         for float_key in ["audience_rating", "jury_rating"]:
             value = data.get(float_key)
@@ -520,52 +593,59 @@ class SubmissionSerializer(serializers.Serializer):
 
     def validate_payload(self, payload):
         logger.debug(f"validate_payload::{payload}")
-        serializer = MovieSerializer(
+        # kept for create/update, which save the validated payload through it
+        self._movie_serializer = MovieSerializer(
             data=payload, partial=self.partial, instance=self.instance
         )
-        serializer.is_valid(raise_exception=True)
+        self._movie_serializer.is_valid(raise_exception=True)
+        # read only through the movie API, but the synopsis is submitted
+        self._movie_fields = {}
+        if "about" in payload:
+            self._movie_fields["about"] = serializers.CharField(
+                allow_blank=True
+            ).run_validation(payload["about"])
         logger.debug("validate_payload:: is valid")
-        return payload
+        return self._movie_serializer.validated_data
 
     def create(self, validated_data):
         logger.debug(f"create::{validated_data}")
-        payload = validated_data["payload"]
-        payload["user"] = validated_data["user"]
-        movie = MovieSerializer().create(payload)
-        movie.poster = self._save_poster(validated_data, movie.id)
-        movie.save()
+        movie = self._save_movie(validated_data)
+        self._save_poster(validated_data, movie)
         logger.debug("create::end")
         return movie
 
     def update(self, instance, validated_data):
         logger.debug(f"update::{validated_data}")
-        payload = validated_data.get("payload")
-        payload["user"] = validated_data["user"]
-        movie = MovieSerializer().update(instance, payload)
-        movie.poster = self._save_poster(validated_data, movie.id)
+        movie = self._save_movie(validated_data)
+        self._save_poster(validated_data, movie)
         logger.debug("update::end")
         return movie
 
+    def _save_movie(self, validated_data):
+        return self._movie_serializer.save(
+            user=validated_data["user"], **self._movie_fields
+        )
+
     def to_representation(self, instance):
         return MovieSerializer().to_representation(instance)
 
-    def _save_poster(self, validated_data, movie_id):
-        if not validated_data:
+    def _save_poster(self, validated_data, movie):
+        poster = validated_data.get("poster")
+        if not poster:
             return
-        if "poster" in validated_data:
-            poster_file = validated_data.get("poster")
-            return self._write_poster(poster_file, movie_id)
+        movie.poster = self._write_poster(poster)
+        # rendered by the image workers, the original poster is shown till then
+        movie.poster_variants = None
+        movie.save()
+        images.schedule(images.process_movie_poster, movie.id)
 
-    def _write_poster(self, poster, movie_id):
+    def _write_poster(self, poster):
         if not poster:
             return
         ext = poster.name.split(".")[-1]
-        poster_filename = f"{movie_id:010d}.{ext}"
-        poster_path = os.path.join(settings.MEDIA_POSTERS, poster_filename)
-        if default_storage.exists(poster_path):
-            default_storage.delete(poster_path)
-        poster_filename = default_storage.save(poster_path, poster)
-        url = default_storage.url(poster_filename)
+        # the previous poster is left to `gcmedia`
+        poster_path = content_storage.save(settings.MEDIA_POSTERS, poster, ext)
+        url = content_storage.url(poster_path)
         logger.debug(f"poster saved at: {url}")
         return url
 
@@ -622,23 +702,28 @@ class MovieReviewDetailSerializer(serializers.ModelSerializer):
             )
         return validated_data
 
-    def _update_movie_audience_rating(self, movie):
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("author__profile", "movie").prefetch_related(
+            "liked_by",
+            Prefetch("movie__contests", queryset=Contest.objects.only("id", "name")),
+            Prefetch(
+                "movie__crewmember_set",
+                queryset=CrewMember.objects.select_related("role", "profile__user"),
+            ),
+        )
+
+    def _update_movie_audience_rating(self, movie, old_rating, new_rating):
         if movie is not None:
-            # FIXME: this average audience rating update might get into concurrency issue
-            # a better way(IMO) will be to cache the average rating of movies via a job periodically
-            movie.audience_rating = (
-                MovieRateReview.objects.filter(movie=movie)
-                .exclude(rating__isnull=True)
-                .aggregate(Avg("rating"))
-            ).get("rating__avg")
-            movie.save()
+            # incremental and atomic, drift (if any) is repaired by reconcileratings
+            movie.update_audience_rating(old_rating=old_rating, new_rating=new_rating)
 
     def create(self, validated_data):
         validated_data["author"] = validated_data.pop("user")
         if validated_data.get("rating") is not None:
             validated_data["rated_at"] = timezone.now()
         instance = super().create(validated_data)
-        self._update_movie_audience_rating(instance.movie)
+        self._update_movie_audience_rating(instance.movie, None, instance.rating)
         return instance
 
     def update(self, instance, validated_data):
@@ -651,15 +736,16 @@ class MovieReviewDetailSerializer(serializers.ModelSerializer):
                 raise ValidationError("Rating is now freezed")
             else:
                 validated_data["rated_at"] = timezone.now()
+        old_rating = instance.rating
         instance = super().update(instance, validated_data)
-        self._update_movie_audience_rating(instance.movie)
+        self._update_movie_audience_rating(instance.movie, old_rating, instance.rating)
         return instance
 
 
 class MovieListSerializer(serializers.ModelSerializer):
-    like_count = serializers.IntegerField(source="liked_by.count", read_only=True)
+    like_count = serializers.IntegerField(read_only=True)
     owner = UserSerializer(read_only=True)
-    movies_count = serializers.IntegerField(source="movies.count", read_only=True)
+    movies_count = serializers.IntegerField(source="movie_count", read_only=True)
 
     class Meta:
         model = MovieList
@@ -737,10 +823,11 @@ class CrewMemberRequestSerializer(serializers.ModelSerializer):
         email = validated_data.pop("email")
         name = validated_data.pop("name")
         instance = None
-        director = Role.objects.get(name="Director")
-        requestor_is_director_of_movie = CrewMember.objects.filter(
-            profile__user=requestor, role=director, movie=movie
-        ).exists()
+        requestor_is_director_of_movie = (
+            CrewMember.objects.directors()
+            .filter(movie=movie, profile__user=requestor)
+            .exists()
+        )
         state = (
             CREW_MEMBER_REQUEST_STATE.APPROVED
             if requestor_is_director_of_movie
@@ -764,6 +851,10 @@ class TopCreatorSerializer(serializers.ModelSerializer):
         model = TopCreator
         fields = ["score", "recommend_count", "profile", "pos"]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("profile__user")
+
     def to_representation(self, value):
         value = super().to_representation(value)
         value.update(value.pop("profile"))
@@ -777,6 +868,10 @@ class TopCuratorSerializer(serializers.ModelSerializer):
         model = TopCurator
         fields = ["match", "likes_on_recommend", "profile", "score", "pos"]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("profile__user")
+
     def to_representation(self, value):
         value = super().to_representation(value)
         value.update(value.pop("profile"))
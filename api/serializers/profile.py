@@ -1,6 +1,5 @@
 from django.core.exceptions import ValidationError
 from rest_framework.authtoken.models import Token
-from api.models.movie import CrewMember
 import os
 import uuid
 from logging import getLogger
@@ -9,12 +8,21 @@ from django.contrib.auth.models import User
 from django.db import transaction
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.utils import timezone
 
 from rest_framework import serializers
-from PIL import Image
 
-from api.models import Profile, Role, Movie, Notification
-from api.constants import MOVIE_STATE, DEFAULT_AVATARS
+from api.models import (
+    CrewMember,
+    Profile,
+    ProfileImageUpload,
+    Role,
+    Movie,
+    Notification,
+    LeaderboardEntry,
+)
+from api import images
+from api.constants import MOVIE_STATE, DEFAULT_AVATARS, PROCESSING_AVATAR
 
 logger = getLogger(__name__)
 
@@ -113,6 +121,30 @@ class ProfileSerializer(serializers.ModelSerializer):
         return representation
 
 
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    """same representation as `ProfileSerializer` read off a snapshot row"""
+
+    profile_id = serializers.IntegerField()
+    id = serializers.IntegerField(source="user_id")
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = [
+            "profile_id",
+            "image",
+            "creator_rank",
+            "curator_rank",
+            "level",
+            "is_celeb",
+            "engagement_score",
+            "pop_score",
+            "city",
+            "id",
+            "email",
+            "name",
+        ]
+
+
 # TODO: not used, check and remove the class
 class WatchListMovieSerializer(serializers.ModelSerializer):
     director = serializers.SerializerMethodField()
@@ -123,12 +155,8 @@ class WatchListMovieSerializer(serializers.ModelSerializer):
 
     def get_director(self, movie):
         logger.debug("getting director")
-        director_role = Role.objects.get(name="Director")
-        logger.debug(f"Role: {director_role}")
-        director_crew_relation = movie.crewmember_set.filter(role=director_role).first()
-        if director_crew_relation:
-            logger.debug(f"Crew: {director_crew_relation}")
-            return ProfileSerializer(instance=director_crew_relation.profile).data
+        if movie.director_profile:
+            return ProfileSerializer(instance=movie.director_profile).data
 
 
 class ProfileDetailSerializer(serializers.ModelSerializer):
@@ -210,9 +238,8 @@ class ProfileDetailSerializer(serializers.ModelSerializer):
         return representation
 
     def get_movies_directed(self, profile):
-        director_role = Role.objects.filter(name="Director").first()
-        return CrewMember.objects.filter(
-            profile=profile, role=director_role, movie__state=MOVIE_STATE.PUBLISHED
+        return Movie.objects.filter(
+            id__in=CrewMember.objects.directed_by(profile), state=MOVIE_STATE.PUBLISHED
         ).count()
 
     def get_title(self, profile):
@@ -241,7 +268,6 @@ class FollowSerializer(serializers.ModelSerializer):
             user.profile.follows.add(profile_to_follow)
         else:
             user.profile.follows.remove(profile_to_follow)
-        user.profile.save()
         return user.profile
 
 
@@ -253,68 +279,31 @@ class ProfileImageSerializer(serializers.Serializer):
         fields = ["image"]
 
     def update(self, profile, validated_data):
-        image = validated_data.get("image")
-        image_url, img_name = self._write_image(image, profile)
-        self._resize_image(img_name)
-        self._delete_existing_profile_image(profile)
-        profile.image = image_url
-        profile.save()
+        # the upload is only stored here, the variants are rendered by the
+        # image workers while the profile shows a placeholder
+        upload_path = self._write_upload(validated_data["image"])
+        # persisted with the profile, the job is lost if the worker restarts
+        pending = {"path": upload_path, "uploaded_at": timezone.now()}
+        if profile.image != PROCESSING_AVATAR:
+            # otherwise the image before the pending upload is kept
+            pending["previous_image"] = profile.image
+        with transaction.atomic():
+            ProfileImageUpload.objects.update_or_create(
+                profile=profile, defaults=pending
+            )
+            profile.image = PROCESSING_AVATAR
+            profile.save()
+        images.schedule(images.process_profile_image, profile.id, upload_path)
         return profile
 
-    def _get_thumb_path(self, dimen, img_name):
-        thumb_name = f"{dimen}_{img_name}"
-        return os.path.join(settings.MEDIA_PROFILE, thumb_name)
-
-    def _resize_image(self, img_name):
-        if not img_name:
-            return
-        img_abs_path = os.path.join(
-            settings.MEDIA_ROOT, settings.MEDIA_PROFILE, img_name
-        )
-
-        logger.debug(f"resizing {img_abs_path}")
-        try:
-            img = Image.open(img_abs_path)
-            img = img.resize((400, 400))
-            img.save(img_abs_path)
-            for dimen in settings.THUMB_DIMENS:
-                tmp_img = img.resize((dimen, dimen))
-                thumb_abs_path = os.path.join(
-                    settings.MEDIA_ROOT, self._get_thumb_path(dimen, img_name)
-                )
-                tmp_img.save(thumb_abs_path)
-        except Exception as ex:
-            logger.debug("image resize failed")
-            logger.exception(ex)
-        else:
-            logger.debug("image resized")
-
-    def _delete_existing_profile_image(self, profile):
-        if profile.image:
-            old_image_name = profile.image.lstrip(
-                settings.MEDIA_URL + settings.MEDIA_PROFILE
-            )
-            old_image_path = os.path.join(settings.MEDIA_PROFILE, old_image_name)
-            files_to_del = []
-            files_to_del.append(old_image_path)
-            for dimen in settings.THUMB_DIMENS:
-                files_to_del.append(self._get_thumb_path(dimen, old_image_name))
-
-            logger.debug(f"deleting files at {files_to_del}")
-            for file_path in files_to_del:
-                if default_storage.exists(file_path):
-                    default_storage.delete(file_path)
-
-    def _write_image(self, image, profile):
-        if not image:
-            return
+    def _write_upload(self, image):
+        # removed once processed, the variants are named after its content
         ext = image.name.split(".")[-1]
         image_filename = f"{uuid.uuid4()}.{ext}"
-        image_path = os.path.join(settings.MEDIA_PROFILE, image_filename)
-        image_path = default_storage.save(image_path, image)
-        url = default_storage.url(image_path)
-        logger.debug(f"image saved at: {url}")
-        return url, image_filename
+        upload_path = os.path.join(settings.MEDIA_PROFILE, "uploads", image_filename)
+        upload_path = default_storage.save(upload_path, image)
+        logger.debug(f"image uploaded at: {upload_path}")
+        return upload_path
 
     def to_representation(self, instance):
         return ProfileDetailSerializer(instance=instance).data
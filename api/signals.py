@@ -0,0 +1,247 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+
+from api import search
+from api.cache import invalidate
+from api.constants import DIRECTOR_ROLE
+from api.decorators import ignore_raw
+from api.models import (
+    Role,
+    Movie,
+    CrewMember,
+    MovieList,
+    MovieRateReview,
+    Genre,
+    MovieLanguage,
+    MpGenre,
+    Contest,
+    Profile,
+    User,
+)
+from api.models.movie import invalidate_movie_pages
+
+
+@receiver([post_save, post_delete], sender=Role)
+def invalidate_role_registry(sender, **kwargs):
+    Role.objects.clear_cache()
+
+
+def sync_director_profile(movie_id):
+    """Updates the cached `Movie.director_profile` from the crew of the movie,
+    returns the id of the director profile"""
+    try:
+        director_role_id = Role.objects.get_id(DIRECTOR_ROLE)
+    except Role.DoesNotExist:
+        director_profile_id = None
+    else:
+        director_profile_id = (
+            CrewMember.objects.filter(movie_id=movie_id, role_id=director_role_id)
+            .order_by("id")
+            .values_list("profile_id", flat=True)
+            .first()
+        )
+    Movie.objects.filter(id=movie_id).update(director_profile_id=director_profile_id)
+    return director_profile_id
+
+
+@receiver([post_save, post_delete], sender=CrewMember)
+def update_movie_director(sender, instance, **kwargs):
+    director_profile_id = sync_director_profile(instance.movie_id)
+    movie_field = CrewMember._meta.get_field("movie")
+    if movie_field.is_cached(instance):
+        # keep the in memory movie in sync, it might get saved later
+        instance.movie.director_profile_id = director_profile_id
+
+
+@receiver(post_save, sender=Movie)
+def update_loaded_movie_director(sender, instance, raw=False, **kwargs):
+    # movies loaded via loaddata might not carry the cached director
+    if raw:
+        instance.director_profile_id = sync_director_profile(instance.id)
+
+
+@receiver(m2m_changed, sender=MovieList.movies.through)
+@receiver(m2m_changed, sender=MovieList.liked_by.through)
+def touch_movie_list(sender, instance, action, reverse, pk_set, **kwargs):
+    """bumps `MovieList.updated_at` of the lists whose movies or likes changed,
+    the incremental top curators run relies on it"""
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            movie_lists = MovieList.objects.filter(pk=instance.pk)
+        else:
+            return
+    elif action in ("post_add", "post_remove"):
+        movie_lists = MovieList.objects.filter(pk__in=pk_set)
+    elif action == "pre_clear":
+        # the lists are gone from the relation after the clear
+        related_name = "movies" if sender is MovieList.movies.through else "liked_by"
+        movie_lists = MovieList.objects.filter(**{related_name: instance})
+    else:
+        return
+    movie_lists.update(updated_at=timezone.now())
+
+
+# through model => (model holding the counter, m2m field, counter field)
+COUNTER_CACHES = {
+    MovieRateReview.liked_by.through: (MovieRateReview, "liked_by", "like_count"),
+    MovieList.liked_by.through: (MovieList, "liked_by", "like_count"),
+    MovieList.movies.through: (MovieList, "movies", "movie_count"),
+}
+
+
+@receiver(m2m_changed, sender=MovieRateReview.liked_by.through)
+@receiver(m2m_changed, sender=MovieList.liked_by.through)
+@receiver(m2m_changed, sender=MovieList.movies.through)
+def update_counter_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """keeps the counter columns in step with the m2m relations using F()
+    updates, `instance` is the counted object unless the change was made
+    from the reverse side of the relation"""
+    model, m2m_field_name, counter = COUNTER_CACHES[sender]
+    m2m_field = model._meta.get_field(m2m_field_name)
+    source = m2m_field.m2m_field_name()
+    target = m2m_field.m2m_reverse_field_name()
+
+    if action == "post_add":
+        if reverse:
+            model.objects.filter(pk__in=pk_set).update(**{counter: F(counter) + 1})
+        else:
+            model.objects.filter(pk=instance.pk).update(
+                **{counter: F(counter) + len(pk_set)}
+            )
+    elif action in ("pre_remove", "pre_clear"):
+        # pk_set of a remove may hold objects which were never related, so the
+        # rows about to be removed are looked up before they are gone
+        rows = sender.objects.filter(**{target if reverse else source: instance.pk})
+        if pk_set is not None:
+            rows = rows.filter(**{f"{source if reverse else target}__in": pk_set})
+        instance._counter_cache_removed = list(
+            rows.values_list(f"{source}_id", flat=True)
+        )
+    elif action in ("post_remove", "post_clear"):
+        removed = instance.__dict__.pop("_counter_cache_removed", [])
+        if not removed:
+            return
+        if reverse:
+            model.objects.filter(pk__in=removed).update(**{counter: F(counter) - 1})
+        else:
+            model.objects.filter(pk=instance.pk).update(
+                **{counter: F(counter) - len(removed)}
+            )
+
+
+# model => tag of the cached responses listing it
+RESPONSE_CACHE_TAGS = {
+    Genre: "genre",
+    MovieLanguage: "lang",
+    MpGenre: "mpgenre",
+    Contest: "contest",
+    Profile: "leaderboard",
+}
+
+
+@receiver([post_save, post_delete], sender=Genre)
+@receiver([post_save, post_delete], sender=MovieLanguage)
+@receiver([post_save, post_delete], sender=MpGenre)
+@receiver([post_save, post_delete], sender=Contest)
+@receiver([post_save, post_delete], sender=Profile)
+@ignore_raw
+def invalidate_response_cache(sender, **kwargs):
+    invalidate(RESPONSE_CACHE_TAGS[sender])
+
+
+@receiver(post_save, sender=Movie)
+@receiver(pre_delete, sender=Movie)
+@ignore_raw
+def invalidate_movie_response_cache(sender, instance, **kwargs):
+    # on pre_delete as the mp genres of the movie are gone after the delete
+    invalidate_movie_pages(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CrewMember)
+@ignore_raw
+def invalidate_crew_response_cache(sender, instance, **kwargs):
+    invalidate_movie_pages(instance.movie_id)
+
+
+@receiver(m2m_changed, sender=Movie.contests.through)
+def invalidate_contest_movie_response_cache(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        movie_ids = [instance.pk]
+    elif action == "pre_clear":
+        movie_ids = instance.movies.values_list("id", flat=True)
+    else:
+        movie_ids = pk_set
+    invalidate_movie_pages(*movie_ids)
+
+
+@receiver(post_save, sender=User)
+@ignore_raw
+def invalidate_crew_name_response_cache(sender, instance, update_fields, **kwargs):
+    # the names of the crew are listed with the movies
+    if update_fields is not None and not {"first_name", "last_name"} & update_fields:
+        return
+    invalidate_movie_pages(
+        *CrewMember.objects.filter(profile__user=instance)
+        .values_list("movie_id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(m2m_changed, sender=Movie.mp_genres.through)
+def invalidate_mp_genre_response_cache(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        mp_genre_ids = [instance.pk]
+    elif action == "pre_clear":
+        mp_genre_ids = instance.mp_genres.values_list("id", flat=True)
+    else:
+        mp_genre_ids = pk_set
+    invalidate(*[f"mpgenre:{pk}" for pk in mp_genre_ids])
+
+
+# model => fields of its rows which end up in the search documents
+SEARCH_FIELDS = {
+    Movie: {"title", "about", "lang", "lang_id"},
+    Profile: {"about", "city", "user", "user_id"},
+    User: {"first_name", "last_name"},
+    Genre: {"name"},
+    MovieLanguage: {"name"},
+}
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=MovieLanguage)
+@ignore_raw
+def update_search_documents(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields is None or SEARCH_FIELDS[sender] & update_fields:
+        search.schedule_update(sender, [instance.pk])
+
+
+@receiver([post_save, post_delete], sender=CrewMember)
+@ignore_raw
+def update_crew_search_documents(sender, instance, **kwargs):
+    search.schedule_update(Movie, [instance.movie_id])
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def update_genre_search_documents(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            search.schedule_update(Movie, [instance.pk])
+    elif action in ("post_add", "post_remove"):
+        search.schedule_update(Movie, pk_set)
+    elif action == "pre_clear":
+        # the movies are gone from the relation after the clear
+        search.schedule_update(Movie, instance.movies.values_list("id", flat=True))
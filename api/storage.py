@@ -0,0 +1,65 @@
+"""Content-addressed storage of the uploaded media.
+
+The files are named after the SHA-256 of their content, so the same upload is
+stored once and a file never changes once written: its url can be cached
+forever, see `IMMUTABLE_CACHE_CONTROL`. Replacing a file means pointing to a
+new name, the files no longer referenced are removed by the `gcmedia` command
+instead of by the requests, as the same file may be shared.
+"""
+
+import os
+import re
+from hashlib import sha256
+from logging import getLogger
+
+from django.core.files.storage import default_storage
+
+logger = getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# the names derived from a content hash: `{hash}.{ext}`, the profile image
+# variants `{size}_{hash}.{ext}` and the poster variants `{hash}-{width}.{ext}`
+_HASHED_NAME = re.compile(r"^(\d+_)?[0-9a-f]{16,}(-\d+)?\.\w+$")
+
+
+def hash_content(content):
+    """hex SHA-256 of the file, read in chunks unless it was hashed while
+    uploaded, see `api.parsers`"""
+    if getattr(content, "content_hash", None):
+        return content.content_hash
+    digest = sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_immutable(name):
+    """whether the stored file is named after its content"""
+    return bool(_HASHED_NAME.match(os.path.basename(name)))
+
+
+class ContentAddressedStorage:
+    """saves the files of a storage under the hash of their content"""
+
+    def __init__(self, storage=default_storage):
+        self.storage = storage
+
+    def save(self, directory, content, ext):
+        """saves the content in the directory unless the same content is
+        already there, returns the name of the file"""
+        name = os.path.join(directory, f"{hash_content(content)}.{ext.lower()}")
+        if self.storage.exists(name):
+            logger.debug(f"{name} already stored")
+            return name
+        saved = self.storage.save(name, content)
+        if saved != name:
+            # the same content saved concurrently, the storage picked a new name
+            self.storage.delete(saved)
+        return name
+
+    def url(self, name):
+        return self.storage.url(name)
+
+
+content_storage = ContentAddressedStorage()
@@ -1,13 +1,17 @@
 import logging
 import time
 import inspect
+from contextlib import contextmanager
 from functools import partial, wraps
+from unittest import mock
 
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework.authtoken.models import Token
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
-from api.models import User
+from api.models import OutboxEmail, User
 
 reverse = partial(reverse, args=["v1"])
 
@@ -34,6 +38,21 @@ def log_runtime(fn):
     return decorated
 
 
+@contextmanager
+def capture_on_commit(execute=False):
+    """collects the callbacks given to transaction.on_commit in the block, which
+    never run in the transaction of a TestCase, and runs them after it with
+    `execute`"""
+    callbacks = []
+    with mock.patch.object(
+        transaction, "on_commit", lambda func, using=None: callbacks.append(func)
+    ):
+        yield callbacks
+    if execute:
+        for callback in callbacks:
+            callback()
+
+
 class APITestCaseMixin:
     client_class = APIClient
     maxDiff = None
@@ -41,11 +60,17 @@ class APITestCaseMixin:
     def setUp(self):
         super().setUp()
         logging.disable(logging.CRITICAL)
+        cache.clear()
 
     def tearDown(self):
         super().tearDown()
         logging.disable(logging.NOTSET)
 
+    def send_queued_emails(self):
+        """sends the emails queued by the requests, as the sendemails command
+        would"""
+        return OutboxEmail.objects.send_queued()
+
 
 class LoggedInMixin:
     auth_user_id = 1
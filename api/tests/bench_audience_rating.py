@@ -0,0 +1,70 @@
+"""Write latency of the audience rating update with 10k reviews on a movie
+
+Not collected by the default test run, execute explicitly via
+`python manage.py test api.tests.bench_audience_rating`
+"""
+
+import time
+
+from django.db.models import Avg
+from django.test import TestCase
+
+from api.constants import REVIEW_STATE
+from api.models import Movie, MovieRateReview, User
+from .base import APITestCaseMixin
+
+REVIEWS_PER_MOVIE = 10000
+WRITES = 200
+
+
+class AudienceRatingBenchmark(APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "movie"]
+
+    def setUp(self):
+        super().setUp()
+        User.objects.bulk_create(
+            User(username=f"bench{i}", email=f"bench{i}@a.com")
+            for i in range(REVIEWS_PER_MOVIE)
+        )
+        authors = User.objects.filter(username__startswith="bench")
+        MovieRateReview.objects.bulk_create(
+            (
+                MovieRateReview(
+                    movie_id=1,
+                    author=author,
+                    rating=i % 10 + 1,
+                    state=REVIEW_STATE.PUBLISHED,
+                )
+                for i, author in enumerate(authors)
+            ),
+            batch_size=1000,
+        )
+        self.movie = Movie.objects.get(pk=1)
+
+    def _full_average(self, rating):
+        # previous implementation, AVG over all the reviews and full row save
+        self.movie.audience_rating = (
+            MovieRateReview.objects.filter(movie=self.movie)
+            .exclude(rating__isnull=True)
+            .aggregate(Avg("rating"))
+        ).get("rating__avg")
+        self.movie.save()
+
+    def _incremental(self, rating):
+        self.movie.update_audience_rating(old_rating=rating, new_rating=rating + 1)
+
+    def _measure(self, update):
+        start = time.perf_counter()
+        for i in range(WRITES):
+            update(i % 9 + 1)
+        return (time.perf_counter() - start) / WRITES * 1000
+
+    def test_write_latency(self):
+        full_average = self._measure(self._full_average)
+        incremental = self._measure(self._incremental)
+        print(
+            f"\n{REVIEWS_PER_MOVIE} reviews, {WRITES} writes -- "
+            f"full average: {full_average:.3f}ms/write, "
+            f"incremental: {incremental:.3f}ms/write"
+        )
+        self.assertLess(incremental, full_average)
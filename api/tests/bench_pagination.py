@@ -0,0 +1,106 @@
+"""Latency of deep pages with limit/offset vs keyset pagination
+
+Not collected by the default test run, execute explicitly via
+`python manage.py test api.tests.bench_pagination`
+"""
+
+import time
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.test import TestCase
+from django.utils import timezone
+
+from api.constants import MOVIE_STATE, REVIEW_STATE
+from api.models import Movie, MovieRateReview, User
+from .base import reverse, APITestCaseMixin
+
+PAGE_SIZE = 25
+PAGES = [100, 1000]
+ROWS = 50000
+REQUESTS = 20
+
+
+class PaginationBenchmark(APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order"]
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        Movie.objects.bulk_create(
+            (
+                Movie(
+                    title=f"bench{i}",
+                    link=f"http://bench.com/{i}",
+                    state=MOVIE_STATE.PUBLISHED,
+                    runtime=10,
+                    lang_id=1,
+                    recommend_count=i % 50,
+                    # a few movies are published each day
+                    publish_on=now - timedelta(days=i // 5),
+                )
+                for i in range(ROWS)
+            ),
+            batch_size=1000,
+        )
+        User.objects.bulk_create(
+            User(username=f"bench{i}", email=f"bench{i}@a.com") for i in range(ROWS)
+        )
+        MovieRateReview.objects.bulk_create(
+            (
+                MovieRateReview(
+                    movie_id=movie_id,
+                    author_id=author_id,
+                    content="Good one",
+                    like_count=i % 30,
+                    state=REVIEW_STATE.PUBLISHED,
+                )
+                for i, (movie_id, author_id) in enumerate(
+                    zip(
+                        Movie.objects.values_list("id", flat=True),
+                        User.objects.filter(username__startswith="bench").values_list(
+                            "id", flat=True
+                        ),
+                    )
+                )
+            ),
+            batch_size=1000,
+        )
+
+    def _cursors_of_pages(self, url):
+        """page => url of the page, following the next links from the first"""
+        cursors = {}
+        next_url, params = url, {"cursor": "", "limit": PAGE_SIZE}
+        for page in range(1, max(PAGES) + 1):
+            if page in PAGES:
+                cursors[page] = (next_url, params)
+            next_link = urlparse(self.client.get(next_url, params).json()["next"])
+            next_url, params = f"{next_link.path}?{next_link.query}", None
+        return cursors
+
+    def _measure(self, url, params):
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            res = self.client.get(url, params)
+        self.assertEqual(200, res.status_code)
+        return (time.perf_counter() - start) / REQUESTS * 1000, res.json()
+
+    def _compare(self, name, url):
+        first, _ = self._measure(url, {"limit": PAGE_SIZE})
+        print(f"\n{name}, {ROWS} rows -- first page: {first:.3f}ms")
+        for page, cursor in self._cursors_of_pages(url).items():
+            offset, offset_page = self._measure(
+                url, {"offset": (page - 1) * PAGE_SIZE, "limit": PAGE_SIZE}
+            )
+            keyset, keyset_page = self._measure(*cursor)
+            self.assertEqual(
+                [row["id"] for row in offset_page["results"]],
+                [row["id"] for row in keyset_page["results"]],
+            )
+            print(f"page {page} -- offset: {offset:.3f}ms, keyset: {keyset:.3f}ms")
+
+    def test_movies(self):
+        self._compare("movies", reverse("api:movie-list"))
+
+    def test_reviews(self):
+        self._compare("reviews", reverse("api:review-list"))
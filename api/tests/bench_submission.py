@@ -0,0 +1,142 @@
+"""Latency, peak memory and poster bytes read back of 10MB poster
+submissions, parsed by `MultiPartParser` vs the streaming parser
+
+The bodies are read from files on disk as a server reads them from the socket,
+the test client would hold them in memory. Both parsers spool uploads over
+FILE_UPLOAD_MAX_MEMORY_SIZE to disk chunk by chunk, so their peak memory is
+about the same, the streaming parser saves reading the poster back to hash it.
+
+Not collected by the default test run, execute explicitly via
+`python manage.py test api.tests.bench_submission`
+"""
+
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.test import TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+from rest_framework import parsers
+
+from api.views.movie import SubmissionView
+from .base import reverse, APITestCaseMixin, LoggedInMixin
+from .test_posters import TempMediaMixin
+
+# noise does not compress, the PNG is about as large as the pixels
+POSTER_SIDE = 1830
+SUBMISSIONS = 10
+
+
+class SubmissionBenchmark(TempMediaMixin, APITestCaseMixin, LoggedInMixin, TestCase):
+    fixtures = ["test_submission.yaml"]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        buffer = BytesIO()
+        Image.frombytes(
+            "RGB", (POSTER_SIDE, POSTER_SIDE), os.urandom(POSTER_SIDE**2 * 3)
+        ).save(buffer, "PNG", compress_level=1)
+        cls.poster = buffer.getvalue()
+
+    def _body(self, i):
+        # bytes past the end of the PNG make every poster a new file
+        poster = BytesIO(self.poster + str(i).encode())
+        poster.name = "poster.png"
+        payload = dict(
+            title=f"Bench {i}",
+            link=f"http://bench.com/{i}",
+            lang=dict(name="English"),
+            runtime=12,
+            roles=[dict(name="Director")],
+            genres=[dict(name="Drama")],
+        )
+        return encode_multipart(
+            BOUNDARY, dict(payload=json.dumps(payload), poster=poster)
+        )
+
+    def _body_file(self, i):
+        body_file = tempfile.TemporaryFile()
+        body_file.write(self._body(i))
+        body_file.seek(0)
+        return body_file
+
+    def _post(self, body_file):
+        size = os.fstat(body_file.fileno()).st_size
+        environ = self.client._base_environ(
+            PATH_INFO=reverse("api:submit-list"),
+            REQUEST_METHOD="POST",
+            CONTENT_TYPE=MULTIPART_CONTENT,
+            CONTENT_LENGTH=str(size),
+            **self.client._credentials,
+        )
+        environ["wsgi.input"] = body_file
+        with body_file:
+            res = self.client.handler(environ)
+        self.assertEqual(201, res.status_code, res.content)
+
+    def _measure(self, label):
+        # written beforehand, only the handling of the requests is measured
+        bodies = [self._body_file(f"{label}{i}") for i in range(SUBMISSIONS + 1)]
+        self._post(bodies.pop())
+        start = time.perf_counter()
+        for body_file in bodies:
+            self._post(body_file)
+        elapsed = (time.perf_counter() - start) / SUBMISSIONS * 1000
+
+        body_file = self._body_file(f"{label}-traced")
+        read_back = 0
+        chunks = TemporaryUploadedFile.chunks
+
+        def count_chunks(upload, *args, **kwargs):
+            nonlocal read_back
+            for chunk in chunks(upload, *args, **kwargs):
+                read_back += len(chunk)
+                yield chunk
+
+        with mock.patch.object(
+            TemporaryUploadedFile, "chunks", autospec=True, side_effect=count_chunks
+        ):
+            tracemalloc.start()
+            before, _ = tracemalloc.get_traced_memory()
+            self._post(body_file)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return elapsed, (peak - before) / 2**20, read_back / 2**20
+
+    def test_submissions(self):
+        size = len(self.poster) / 2**20
+        print(f"\n{SUBMISSIONS} submissions of a {size:.1f}MB poster")
+        with mock.patch.object(
+            SubmissionView,
+            "parser_classes",
+            (parsers.MultiPartParser, parsers.FormParser),
+        ):
+            elapsed, peak, read_back = self._measure("multipart")
+        print(
+            f"MultiPartParser -- {elapsed:.3f}ms, peak {peak:.2f}MB, "
+            f"{read_back:.1f}MB read back"
+        )
+        elapsed, peak, read_back = self._measure("streaming")
+        print(
+            f"StreamingMultiPartParser -- {elapsed:.3f}ms, peak {peak:.2f}MB, "
+            f"{read_back:.1f}MB read back"
+        )
+
+    @override_settings(UPLOAD_MAX_SIZE=5 * 2**20)
+    def test_rejected_submissions(self):
+        bodies = [self._body(f"rejected{i}") for i in range(SUBMISSIONS)]
+        start = time.perf_counter()
+        for body in bodies:
+            res = self.client.post(
+                reverse("api:submit-list"), body, content_type=MULTIPART_CONTENT
+            )
+            self.assertEqual(400, res.status_code, res.content)
+        elapsed = (time.perf_counter() - start) / SUBMISSIONS * 1000
+        print(f"\nrejected past a 5MB cap -- {elapsed:.3f}ms")
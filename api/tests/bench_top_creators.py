@@ -0,0 +1,108 @@
+"""Run time of updatetopcreators with 50 live contests x 2k movies
+
+Not collected by the default test run, execute explicitly via
+`python manage.py test api.tests.bench_top_creators`
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.constants import CONTEST_STATE, MOVIE_STATE, RECOMMENDATION
+from api.models import Contest, Movie, MovieList, Profile, TopCreator, User
+from .base import APITestCaseMixin
+
+CONTESTS = 50
+MOVIES_PER_CONTEST = 2000
+DIRECTORS = 200
+RECOMMENDATION_LISTS = 100
+
+
+class TopCreatorsBenchmark(APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "contest_type"]
+
+    def setUp(self):
+        super().setUp()
+        User.objects.bulk_create(
+            User(username=f"bench{i}", email=f"bench{i}@a.com", first_name=f"{i}")
+            for i in range(DIRECTORS)
+        )
+        users = User.objects.filter(username__startswith="bench")
+        Profile.objects.bulk_create(Profile(user=user) for user in users)
+        directors = list(Profile.objects.filter(user__in=users))
+
+        now = timezone.now()
+        Contest.objects.bulk_create(
+            Contest(
+                name=f"bench{i}",
+                start=now - timedelta(days=1),
+                end=now + timedelta(days=1),
+                type_id=1,
+                state=CONTEST_STATE.LIVE,
+            )
+            for i in range(CONTESTS)
+        )
+        contests = list(Contest.objects.filter(name__startswith="bench"))
+
+        Movie.objects.bulk_create(
+            (
+                Movie(
+                    title=f"bench{i}",
+                    link=f"http://bench.com/{i}",
+                    state=MOVIE_STATE.PUBLISHED,
+                    runtime=10,
+                    lang_id=1,
+                    jury_rating=i % 10,
+                    audience_rating=i % 7,
+                    director_profile=directors[i % DIRECTORS],
+                )
+                for i in range(CONTESTS * MOVIES_PER_CONTEST)
+            ),
+            batch_size=1000,
+        )
+        movie_ids = list(
+            Movie.objects.filter(title__startswith="bench")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        Movie.contests.through.objects.bulk_create(
+            (
+                Movie.contests.through(
+                    contest_id=contests[i // MOVIES_PER_CONTEST].id, movie_id=movie_id
+                )
+                for i, movie_id in enumerate(movie_ids)
+            ),
+            batch_size=1000,
+        )
+
+        MovieList.objects.bulk_create(
+            MovieList(name=RECOMMENDATION, owner=user)
+            for user in users[:RECOMMENDATION_LISTS]
+        )
+        lists = MovieList.objects.filter(name=RECOMMENDATION)
+        MovieList.movies.through.objects.bulk_create(
+            (
+                MovieList.movies.through(movielist_id=movie_list.id, movie_id=movie_id)
+                for movie_list in lists
+                for movie_id in movie_ids[movie_list.id % 20 :: 20]
+            ),
+            batch_size=1000,
+        )
+
+    def test_run_time(self):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            call_command("updatetopcreators")
+            elapsed = time.perf_counter() - start
+        print(
+            f"\n{CONTESTS} contests x {MOVIES_PER_CONTEST} movies -- "
+            f"{elapsed:.3f}s, {len(queries)} queries"
+        )
+        self.assertEqual(CONTESTS * DIRECTORS, TopCreator.objects.count())
+        # the number of queries depends on the contests, not on their movies
+        self.assertLess(len(queries), CONTESTS * 10)
@@ -0,0 +1,66 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSendgrid:
+    """Local stand-in for the SendGrid v3 API, records the mail send requests
+    and answers them with the queued status codes, 202 by default, or 400 for
+    the requests with any of the `rejected` recipients
+
+        with FakeSendgrid() as sendgrid:
+            backend = SendgridEmailBackend(api_key="key", host=sendgrid.url)
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.rejected = set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                body = json.loads(body or b"{}")
+                fake.requests.append(
+                    {
+                        "path": self.path,
+                        # the same for the requests sent over a kept alive
+                        # connection
+                        "client": self.client_address,
+                        "headers": dict(self.headers),
+                        "body": body,
+                    }
+                )
+                recipients = {
+                    to["email"]
+                    for personalization in body.get("personalizations", [])
+                    for to in personalization.get("to", [])
+                }
+                if recipients & fake.rejected:
+                    status = 400
+                else:
+                    status = fake.statuses.pop(0) if fake.statuses else 202
+                payload = b"" if status < 400 else b'{"errors": [{"message": "x"}]}'
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
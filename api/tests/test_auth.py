@@ -49,6 +49,7 @@ class WithPayloadMixin:
 class SignUpTestCase(APITestCaseMixin, WithPayloadMixin, TestCase):
     def test_signup_ok(self):
         res = self.client.post(reverse("api:profile-list"), data=self.payload)
+        self.send_queued_emails()
         self.assertEquals(len(mail.outbox), 1)
         self.assertEquals(mail.outbox[0].template_id, TEMPLATES.WELCOME)
         # self.assertEquals(mail.outbox[1].template_id, TEMPLATES.VERIFY)
@@ -58,6 +59,7 @@ class SignUpTestCase(APITestCaseMixin, WithPayloadMixin, TestCase):
     def test_signup_password_error(self):
         self.payload["user"]["password"] = "1223"
         res = self.client.post(reverse("api:profile-list"), data=self.payload)
+        self.send_queued_emails()
         self.assertEquals(len(mail.outbox), 0)
         self.assertEquals(res.status_code, 400)
         self.assertEquals(
@@ -80,6 +82,7 @@ class SignInTestCase(APITestCaseMixin, WithPayloadMixin, TestCase):
             reverse("api:profile-detail", args=["v1", profile_id]),
             data=self.payload,
         )
+        self.send_queued_emails()
         self.assertEquals(len(mail.outbox), 1)
         self.assertEquals(mail.outbox[0].template_id, TEMPLATES.WELCOME)
         # FIXME: enable verification email after selecting sendgrid alternative
@@ -102,6 +105,7 @@ class SignInTestCase(APITestCaseMixin, WithPayloadMixin, TestCase):
             },
             res.json(),
         )
+        self.send_queued_emails()
         self.assertEquals(len(mail.outbox), 0)
 
     def test_active_login_ok(self):
@@ -119,6 +123,7 @@ class SignInTestCase(APITestCaseMixin, WithPayloadMixin, TestCase):
             },
             res.json(),
         )
+        self.send_queued_emails()
         self.assertEquals(len(mail.outbox), 0)
 
     def test_activate_account(self):
@@ -127,6 +132,7 @@ class SignInTestCase(APITestCaseMixin, WithPayloadMixin, TestCase):
         res = self.client.get(reverse("api:account-verify", args=["v1", "token-abcd"]))
         self.assertEquals(res.status_code, 200)
         self.assertEquals(res.json(), {"success": True})
+        self.send_queued_emails()
         self.assertEquals(len(mail.outbox), 0)
         user.refresh_from_db()
         self.assertTrue(user.is_active)
@@ -159,6 +165,7 @@ class SignInTestCase(APITestCaseMixin, WithPayloadMixin, TestCase):
                 reverse("api:account-forgot"),
                 {"email": "test2@example.com", "recaptcha": "recaptcha-1234"},
             )
+        self.send_queued_emails()
         self.assertEquals(len(mail.outbox), 1)
         self.assertEquals(mail.outbox[0].template_id, TEMPLATES.PASSWORD_REST)
         self.assertEquals(["test2@example.com"], mail.outbox[0].to)
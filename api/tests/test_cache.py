@@ -0,0 +1,159 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.cache import get_stats, invalidate
+from api.constants import CONTEST_STATE
+from api.models import Contest, CrewMember, Genre, Movie, MpGenre, User
+from .base import reverse, APITestCaseMixin
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=300)
+class ResponseCacheTestCase(APITestCaseMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "package",
+        "order",
+        "movie",
+        "contest_type",
+        "contest",
+        "crewmember",
+        "test_mp_live_genre",
+    ]
+
+    def _get(self, url, params=None, queries=None):
+        if queries is None:
+            res = self.client.get(url, params)
+        else:
+            with self.assertNumQueries(queries):
+                res = self.client.get(url, params)
+        self.assertEqual(200, res.status_code, res.content)
+        return res.json()
+
+    def test_hit_and_miss(self):
+        url = reverse("api:genre-list")
+        first = self._get(url)
+        self.assertEqual(first, self._get(url, queries=0))
+        # other query parameters are another entry
+        self._get(url, {"limit": 1})
+        self.assertEqual((1, 2), get_stats()["GenreView.list"])
+
+        out, err = StringIO(), StringIO()
+        call_command("cachestats", "--reset", stdout=out, stderr=err)
+        self.assertIn("GenreView.list: 1 hit(s), 2 miss(es), 33%", out.getvalue())
+        # the tests run on the local memory cache
+        self.assertIn("the cache is not shared", err.getvalue())
+        self.assertEqual((0, 0), get_stats()["GenreView.list"])
+
+    def test_query_parameters_are_normalised(self):
+        url = reverse("api:genre-list")
+        self._get(url, {"limit": 2, "offset": 1})
+        self._get(f"{url}?offset=1&limit=2", queries=0)
+
+    def test_saving_a_genre_invalidates_the_genres(self):
+        url = reverse("api:genre-list")
+        count = self._get(url)["count"]
+        Genre.objects.create(name="noir")
+        self.assertEqual(count + 1, self._get(url)["count"])
+
+    def test_publishing_a_movie_invalidates_its_pages(self):
+        mp_genre_url = reverse("api:mpgenre-movies", args=["v1", 1])
+        other_url = reverse("api:mpgenre-movies", args=["v1", 2])
+        new_releases_url = reverse("api:movie-new-releases")
+        titles = [movie["title"] for movie in self._get(mp_genre_url)["results"]]
+        self._get(other_url)
+        self._get(new_releases_url)
+
+        movie = Movie.objects.get(pk=2)
+        movie.title = "Renamed"
+        movie.save()
+        self.assertNotEqual(
+            titles, [movie["title"] for movie in self._get(mp_genre_url)["results"]]
+        )
+        self._get(other_url, queries=0)
+        self._get(new_releases_url)
+        self.assertEqual((0, 2), get_stats()["MovieView.new_releases"])
+
+    def test_mp_genre_membership_invalidates_its_page(self):
+        url = reverse("api:mpgenre-movies", args=["v1", 2])
+        count = self._get(url)["count"]
+        MpGenre.objects.get(pk=2).movies.add(Movie.objects.get(pk=1))
+        self.assertEqual(count + 1, self._get(url)["count"])
+
+    def _mp_genre_movie(self, movie_id, mp_genre_id=1):
+        url = reverse("api:mpgenre-movies", args=["v1", mp_genre_id])
+        movies = self._get(url)["results"]
+        return next(movie for movie in movies if movie["id"] == movie_id)
+
+    def test_recommending_a_movie_invalidates_its_pages(self):
+        now = timezone.now()
+        contest = Contest.objects.create(
+            name="Live",
+            start=now - timedelta(days=1),
+            end=now + timedelta(days=1),
+            type_id=1,
+            state=CONTEST_STATE.LIVE,
+        )
+        contest.movies.add(2)
+        self.assertEqual(0, self._mp_genre_movie(2)["recommend_count"])
+
+        token, _ = Token.objects.get_or_create(user_id=1)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        url = reverse("api:contest-recommend", args=["v1", contest.id])
+        res = self.client.post(url, {"movie": 2})
+        self.assertEqual(200, res.status_code, res.content)
+        self.client.credentials()
+        self.assertEqual(1, self._mp_genre_movie(2)["recommend_count"])
+
+    def test_rating_a_movie_invalidates_its_pages(self):
+        score = self._mp_genre_movie(2)["score"]
+        Movie.objects.get(pk=2).update_audience_rating(new_rating=10)
+        self.assertNotEqual(score, self._mp_genre_movie(2)["score"])
+
+    def test_contest_membership_invalidates_the_movie_pages(self):
+        self.assertEqual([], self._mp_genre_movie(2)["contests"])
+        Contest.objects.get(pk=1).movies.add(2)
+        self.assertEqual(1, len(self._mp_genre_movie(2)["contests"]))
+        Contest.objects.get(pk=1).movies.clear()
+        self.assertEqual([], self._mp_genre_movie(2)["contests"])
+
+    def test_renaming_a_crew_member_invalidates_the_movie_pages(self):
+        CrewMember.objects.create(movie_id=2, profile_id=1, role_id=1)
+        self._mp_genre_movie(2)
+        user = User.objects.get(pk=1)
+        user.first_name = "Renamed"
+        user.save()
+        crew = self._mp_genre_movie(2)["crew"]
+        self.assertIn("Renamed", str(crew))
+
+    def test_invalidate_by_tag(self):
+        url = reverse("api:contest-top-creators", args=["v1", 1])
+        self._get(url)
+        self._get(url, queries=0)
+        invalidate("top_creators:1")
+        self._get(url)
+        self.assertEqual((1, 2), get_stats()["ContestView.top_creators"])
+
+    def test_requestor_specific_responses_are_not_shared(self):
+        url = reverse("api:contest-list")
+        self._get(url)
+        self._get(url, queries=0)
+        token, _ = Token.objects.get_or_create(user_id=1)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        self._get(url)
+        self.assertEqual((1, 1), get_stats()["ContestView.list"])
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        url = reverse("api:lang-list")
+        self._get(url)
+        self._get(url)
+        self.assertEqual((0, 0), get_stats()["MovieLanguageView.list"])
@@ -1,7 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import skipIf
+
 from api.constants import CONTEST_STATE
 from api.models import MovieList, Contest, Movie, User, Profile
-from django.test import TestCase
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
 from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 from .base import reverse, APITestCaseMixin, LoggedInMixin
 
 
@@ -333,3 +341,96 @@ class TestTopCurator(APITestCaseMixin, TestCase):
             ],
             actual_curators,
         )
+
+
+class RecommendRequestsMixin:
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "package",
+        "order",
+        "movie",
+        "crewmember",
+        "contest_type",
+    ]
+    users = 4
+    # requests of each user, interleaved with the ones of the others
+    requests = ["post", "post", "delete", "post", "delete", "delete", "post"] * 3
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.contest = Contest.objects.create(
+            name="Live",
+            start=now - timedelta(days=1),
+            end=now + timedelta(days=1),
+            type_id=1,
+            state=CONTEST_STATE.LIVE,
+        )
+        self.contest.movies.add(1)
+        self.tokens = [
+            Token.objects.create(
+                user=User.objects.create(username=f"fan{i}", email=f"fan{i}@a.com")
+            ).key
+            for i in range(self.users)
+        ]
+
+    def _request(self, token, method):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token " + token)
+        url = reverse("api:contest-recommend", args=["v1", self.contest.id])
+        return getattr(client, method)(url, {"movie": 1}).status_code
+
+    def _assert_counts_match(self):
+        movie = Movie.objects.get(pk=1)
+        recommends = MovieList.movies.through.objects.filter(movie=movie).count()
+        self.assertEqual(recommends, movie.recommend_count)
+        for movie_list in MovieList.objects.filter(contest=self.contest):
+            self.assertEqual(movie_list.movies.count(), movie_list.movie_count)
+        return recommends
+
+
+class RecommendCountTestCase(RecommendRequestsMixin, APITestCaseMixin, TestCase):
+    def test_repeated_recommends(self):
+        codes = [
+            self._request(token, method)
+            for method in self.requests
+            for token in self.tokens
+        ]
+        self.assertEqual({200}, set(codes))
+        # the last request of every user recommends the movie
+        self.assertEqual(self.users, self._assert_counts_match())
+
+
+@skipIf(
+    connection.vendor == "sqlite",
+    "SQLite locks the whole database, the requests would not run concurrently",
+)
+class ConcurrentRecommendTestCase(
+    RecommendRequestsMixin, APITestCaseMixin, TransactionTestCase
+):
+    """the same requests fired in parallel, needs a database serving
+    concurrent transactions e.g., MySQL"""
+
+    def _request(self, token, method):
+        try:
+            return super()._request(token, method)
+        finally:
+            connections.close_all()
+
+    def test_parallel_recommends(self):
+        jobs = [(token, method) for method in self.requests for token in self.tokens]
+        with ThreadPoolExecutor(max_workers=self.users) as pool:
+            codes = list(pool.map(lambda job: self._request(*job), jobs))
+        self.assertEqual({200}, set(codes))
+        # the requests of a user may overtake each other, the final state is
+        # not known but the counters have to agree with it
+        self.assertLessEqual(self._assert_counts_match(), self.users)
+
+        # and once the dust settles every user recommends it exactly once
+        for token in self.tokens:
+            self._request(token, "post")
+        self.assertEqual(self.users, self._assert_counts_match())
@@ -2,7 +2,8 @@ from django.test import TestCase
 
 from django.core import mail
 
-from api.models import CrewMemberRequest, CrewMember
+from api.constants import MOVIE_STATE
+from api.models import CrewMemberRequest, CrewMember, Movie, Profile, User
 from .base import reverse, APITestCaseMixin, LoggedInMixin
 
 
@@ -37,7 +38,49 @@ class CrewRequestTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
         self.assertEqual("A", cmr.state)
         self.assertEqual(old_state, new_state)
 
+        self.send_queued_emails()
         self.assertEquals(len(mail.outbox), 0)
 
         self.assertEqual(2, CrewMember.objects.count())
         self.assertTrue(CrewMember.objects.filter(**expected_crew_with_attr).exists())
+
+
+class CoDirectorTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
+    auth_user_id = 3
+    fixtures = ["test_crewrequest"]
+
+    def setUp(self):
+        user = User.objects.create(
+            pk=self.auth_user_id, username="codirector", email="codirector@a.com"
+        )
+        self.co_director = Profile.objects.create(user=user, onboarded=True)
+        CrewMember.objects.create(movie_id=1, profile=self.co_director, role_id=1)
+        super().setUp()
+
+    def _ids(self, url):
+        res = self.client.get(url)
+        self.assertEqual(200, res.status_code)
+        return [row["id"] for row in res.json()["results"]]
+
+    def test_first_director_is_shown(self):
+        self.assertEqual(1, Movie.objects.get(pk=1).director_profile_id)
+
+    def test_crew_requests_approved_by_co_director(self):
+        url = reverse("api:profile-crew-approvals", args=["v1", self.co_director.id])
+        self.assertEqual([1], self._ids(url))
+        res = self.client.patch(
+            reverse("api:crewmemberrequest-detail", args=["v1", 1]),
+            data={"state": "A"},
+        )
+        self.assertEqual(200, res.status_code)
+        self.assertTrue(CrewMember.objects.filter(profile_id=2, role_id=2).exists())
+
+    def test_movie_approvals_of_co_director(self):
+        Movie.objects.filter(pk=1).update(approved=None)
+        url = reverse("api:profile-movie-approvals", args=["v1", self.co_director.id])
+        self.assertEqual([1], self._ids(url))
+
+    def test_movies_by_co_director(self):
+        Movie.objects.filter(pk=1).update(state=MOVIE_STATE.PUBLISHED)
+        url = reverse("api:moviesby-detail", args=["v1", self.co_director.id])
+        self.assertEqual([1], self._ids(url))
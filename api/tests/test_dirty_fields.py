@@ -0,0 +1,212 @@
+from django.core import mail
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.constants import MOVIE_STATE
+from api.emails import TEMPLATES
+from api.models import Movie, MovieList, MovieRateReview, Order, Profile, User
+from .base import reverse, APITestCaseMixin, LoggedInMixin
+
+
+class DirtyFieldsTestCase(APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "movie"]
+
+    def _updates(self, fn):
+        with CaptureQueriesContext(connection) as queries:
+            fn()
+        return [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+
+    def test_unchanged_save_is_skipped(self):
+        movie = Movie.objects.get(pk=1)
+        with self.assertNumQueries(0):
+            movie.save()
+        movie.title = movie.title
+        with self.assertNumQueries(0):
+            movie.save()
+
+    def test_only_changed_fields_are_written(self):
+        movie = Movie.objects.get(pk=1)
+        movie.title = "Renamed"
+        (update,) = self._updates(movie.save)
+        self.assertIn('SET "title" =', update)
+        self.assertNotIn('"runtime"', update)
+        self.assertEqual("Renamed", Movie.objects.get(pk=1).title)
+        # and nothing is left to write
+        with self.assertNumQueries(0):
+            movie.save()
+
+    def test_deferred_fields(self):
+        profile = Profile.objects.only("id").get(pk=1)
+        profile.city = "Pune"
+        (update,) = self._updates(profile.save)
+        self.assertIn('SET "city" =', update)
+        self.assertEqual("Pune", Profile.objects.get(pk=1).city)
+
+    def test_refreshed_counter_is_not_written_back(self):
+        movie = Movie.objects.get(pk=1)
+        movie.update_recommend_count(1)
+        Movie.objects.filter(pk=1).update(recommend_count=5)
+        movie.title = "Renamed"
+        movie.save()
+        self.assertEqual(5, Movie.objects.get(pk=1).recommend_count)
+
+    def test_copy_to_a_new_row(self):
+        movie = Movie.objects.get(pk=1)
+        movie.pk = None
+        movie.link = "http://copy.com"
+        movie.save()
+        self.assertEqual(2, Movie.objects.filter(title=movie.title).count())
+
+    def test_auto_now_fields_are_written(self):
+        order = Order.objects.get(pk=1)
+        order.amount = 10
+        (update,) = self._updates(order.save)
+        self.assertIn('"created_at" =', update)
+
+
+class TransitionsTestCase(APITestCaseMixin, TestCase):
+    """the onboarding and payment transitions are detected against the loaded
+    values, without reading the row again"""
+
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "movie"]
+
+    def _assert_no_selects(self, model, queries):
+        table = model._meta.db_table
+        selects = [q["sql"] for q in queries if q["sql"].startswith("SELECT")]
+        self.assertFalse([sql for sql in selects if f'FROM "{table}"' in sql])
+
+    def test_profile_onboarding(self):
+        Profile.objects.filter(pk=1).update(onboarded=False)
+        profile = Profile.objects.get(pk=1)
+        profile.onboarded = True
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        self._assert_no_selects(Profile, queries)
+        self.send_queued_emails()
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual(TEMPLATES.WELCOME, mail.outbox[0].template_id)
+        # already onboarded
+        profile.city = "Pune"
+        profile.save()
+        self.send_queued_emails()
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_profile_onboarding_untracked(self):
+        Profile.objects.filter(pk=1).update(onboarded=False)
+        profile = Profile.objects.get(pk=1)
+        del profile._loaded_values
+        profile.onboarded = True
+        profile.save()
+        self.send_queued_emails()
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_profile_bulk_onboarding(self):
+        Profile.objects.filter(pk=1).update(onboarded=False)
+        profiles = list(Profile.objects.all())
+        for profile in profiles:
+            profile.onboarded = True
+        with CaptureQueriesContext(connection) as queries:
+            Profile.objects.bulk_update(profiles, ["onboarded"])
+        self._assert_no_selects(Profile, queries)
+        self.send_queued_emails()
+        self.assertEqual(1, len(mail.outbox))
+        # the snapshots follow the bulk update
+        with self.assertNumQueries(0):
+            profiles[0].save()
+
+    def test_order_payment(self):
+        movie = Movie.objects.create(
+            order_id=1,
+            state=MOVIE_STATE.CREATED,
+            title="Submitted",
+            link="http://submitted.com",
+            runtime=10,
+            director_profile_id=1,
+        )
+        order = Order.objects.get(pk=1)
+        order.payment_id = "pay_1234"
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self._assert_no_selects(Order, queries)
+        movie.refresh_from_db()
+        self.assertEqual(MOVIE_STATE.SUBMITTED, movie.state)
+        self.send_queued_emails()
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual(TEMPLATES.SUBMIT_CONFIRM_DIRECTOR, mail.outbox[0].template_id)
+        # already paid
+        order.amount = 10
+        order.save()
+        self.send_queued_emails()
+        self.assertEqual(1, len(mail.outbox))
+
+
+class FieldScopedSaveEndpointsTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
+    """the like, watchlist and follow endpoints only write the m2m rows and the
+    counter columns"""
+
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "order",
+        "movie",
+        "contest_type",
+        "contest",
+        "movielist",
+    ]
+
+    def _assert_no_full_row_saves(self, queries):
+        # the targeted updates never write the columns below
+        for query in queries:
+            self.assertNotRegex(
+                query["sql"],
+                r'^UPDATE "api_(movie" SET .*"title"|profile" SET .*"onboarded"'
+                r'|movielist" SET .*"name")',
+            )
+
+    def _request(self, method, url, data=None, num_queries=None):
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method)(url, data)
+        self.assertEqual(200, res.status_code, res.content)
+        self._assert_no_full_row_saves(queries)
+        self.assertEqual(num_queries, len(queries), [q["sql"] for q in queries])
+
+    def test_watchlist(self):
+        url = reverse("api:watchlist-detail", args=["v1", 1])
+        # token, movie, profile, insert
+        self._request("put", url, num_queries=4)
+        self.assertTrue(self.profile.watchlist.filter(pk=1).exists())
+        # token, movie, profile, delete
+        self._request("delete", url, num_queries=4)
+        self.assertFalse(self.profile.watchlist.filter(pk=1).exists())
+
+    def test_review_like(self):
+        author = User.objects.create(username="author", email="author@a.com")
+        review = MovieRateReview.objects.create(
+            movie_id=1, author=author, content="Good one"
+        )
+        url = reverse("api:reviewlike-detail", args=["v1", review.id])
+        # token, review, existing rows, insert, counter
+        self._request("put", url, num_queries=5)
+        # token, review, removed rows, delete, counter
+        self._request("delete", url, num_queries=5)
+        review.refresh_from_db()
+        self.assertEqual(0, review.like_count)
+
+    def test_movie_list_like(self):
+        url = reverse("api:movielist-like", args=["v1", 1])
+        # token, list, existing rows, insert, counter, updated_at, refresh
+        self._request("post", url, num_queries=7)
+        self.assertEqual(1, MovieList.objects.get(pk=1).like_count)
+
+    def test_follow(self):
+        user = User.objects.create(username="followed", email="followed@a.com")
+        Profile.objects.create(user=user)
+        url = reverse("api:follow-detail", args=["v1", user.id])
+        # token, profile to follow, own profile, insert and the follows of the
+        # response
+        self._request("patch", url, {"follow": True}, num_queries=5)
+        self.assertTrue(self.profile.follows.filter(user_id=2).exists())
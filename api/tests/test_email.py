@@ -0,0 +1,252 @@
+from datetime import timedelta
+from unittest import mock
+
+import requests
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.constants import EMAIL_STATE
+from api.emails import TEMPLATES, build_email, email_trigger
+from api.models import OutboxEmail, User
+from backends.sendgrid import SendgridEmailBackend
+from .base import reverse, APITestCaseMixin
+from .fake_sendgrid import FakeSendgrid
+
+
+class OutboxTestCase(APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile"]
+
+    def setUp(self):
+        super().setUp()
+        self.users = [
+            User.objects.create(
+                username=f"user{i}", email=f"user{i}@a.com", first_name=f"User {i}"
+            )
+            for i in range(3)
+        ]
+        self.sendgrid = FakeSendgrid().__enter__()
+        self.connection = SendgridEmailBackend(api_key="key", host=self.sendgrid.url)
+        # dry_run follows EMAIL_DISABLED
+        self.connection.dry_run = False
+
+    def tearDown(self):
+        self.sendgrid.__exit__(None, None, None)
+        super().tearDown()
+
+    def _send(self):
+        return OutboxEmail.objects.send_queued(connection=self.connection)
+
+    def test_request_only_queues(self):
+        with mock.patch("api.serializers.auth.requests") as requests:
+            requests.post.return_value.json.return_value = {"success": True}
+            res = self.client.post(
+                reverse("api:account-forgot"),
+                {"email": self.users[0].email, "recaptcha": "x"},
+            )
+        self.assertEqual(200, res.status_code, res.content)
+        self.assertEqual(0, len(mail.outbox))
+        self.assertEqual([], self.sendgrid.requests)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(TEMPLATES.PASSWORD_REST, email.template_id)
+        self.assertEqual(EMAIL_STATE.QUEUED, email.state)
+
+    def test_idempotency_key(self):
+        for _ in range(2):
+            email_trigger(self.users[0], TEMPLATES.WELCOME, idempotency_key="welcome")
+        self.assertEqual(1, OutboxEmail.objects.count())
+        self.assertEqual((1, 0), self._send())
+        # already sent
+        email_trigger(self.users[0], TEMPLATES.WELCOME, idempotency_key="welcome")
+        self.assertEqual((0, 0), self._send())
+        self.assertEqual(1, len(self.sendgrid.requests))
+
+    def test_batched_per_template(self):
+        for user in self.users:
+            email_trigger(user, TEMPLATES.WELCOME)
+        email_trigger(self.users[0], TEMPLATES.SUBMIT_CONFIRM_CREW)
+        self.assertEqual((4, 0), self._send())
+
+        self.assertEqual(2, len(self.sendgrid.requests))
+        welcome, crew = self.sendgrid.requests
+        self.assertEqual("/v3/mail/send", welcome["path"])
+        self.assertEqual("Bearer key", welcome["headers"]["Authorization"])
+        self.assertEqual(TEMPLATES.WELCOME, welcome["body"]["template_id"])
+        self.assertEqual(
+            [
+                {
+                    "to": [{"email": user.email, "name": ""}],
+                    "dynamic_template_data": {"user": user.get_full_name()},
+                    "custom_args": {"outbox_key": email.key},
+                }
+                for user, email in zip(self.users, OutboxEmail.objects.order_by("id"))
+            ],
+            welcome["body"]["personalizations"],
+        )
+        self.assertEqual(1, len(crew["body"]["personalizations"]))
+        self.assertFalse(OutboxEmail.objects.exclude(state=EMAIL_STATE.SENT).exists())
+
+    def test_batch_size(self):
+        for user in self.users:
+            email_trigger(user, TEMPLATES.WELCOME)
+        sent, _ = OutboxEmail.objects.send_queued(2, connection=self.connection)
+        self.assertEqual(3, sent)
+        self.assertEqual(
+            [2, 1], [len(r["body"]["personalizations"]) for r in self.sendgrid.requests]
+        )
+
+    @override_settings(EMAIL_MAX_ATTEMPTS=2, EMAIL_RETRY_DELAY=60)
+    def test_retry_with_backoff(self):
+        email = email_trigger(self.users[0], TEMPLATES.WELCOME)
+        self.sendgrid.statuses = [500, 500]
+
+        self.assertEqual((0, 1), self._send())
+        email.refresh_from_db()
+        self.assertEqual(EMAIL_STATE.QUEUED, email.state)
+        self.assertEqual(1, email.attempts)
+        self.assertIn("500", email.last_error)
+        delay = email.next_attempt_at - timezone.now()
+        self.assertTrue(timedelta(seconds=50) < delay <= timedelta(seconds=60))
+        # not due yet
+        self.assertEqual((0, 0), self._send())
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual((0, 1), self._send())
+        email.refresh_from_db()
+        self.assertEqual(EMAIL_STATE.FAILED, email.state)
+        self.assertEqual(2, email.attempts)
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual((0, 0), self._send())
+        self.assertEqual(2, len(self.sendgrid.requests))
+
+    def test_only_failed_emails_are_retried(self):
+        welcome = email_trigger(self.users[0], TEMPLATES.WELCOME)
+        crew = email_trigger(self.users[0], TEMPLATES.SUBMIT_CONFIRM_CREW)
+        self.sendgrid.statuses = [500]
+        self.assertEqual((1, 1), self._send())
+        welcome.refresh_from_db()
+        crew.refresh_from_db()
+        self.assertEqual(EMAIL_STATE.QUEUED, welcome.state)
+        self.assertEqual(EMAIL_STATE.SENT, crew.state)
+
+    def test_rejected_email_does_not_fail_the_batch(self):
+        emails = [email_trigger(user, TEMPLATES.WELCOME) for user in self.users]
+        self.sendgrid.rejected = {self.users[1].email}
+        self.assertEqual((2, 1), self._send())
+        self.assertEqual(
+            [EMAIL_STATE.SENT, EMAIL_STATE.QUEUED, EMAIL_STATE.SENT],
+            [OutboxEmail.objects.get(pk=email.pk).state for email in emails],
+        )
+        self.assertIn("400", OutboxEmail.objects.get(pk=emails[1].pk).last_error)
+
+    def test_claimed_emails_are_skipped(self):
+        email_trigger(self.users[0], TEMPLATES.WELCOME)
+        # claimed by another worker
+        self.assertEqual(1, len(OutboxEmail.objects.claim(10)))
+        self.assertEqual((0, 0), self._send())
+
+    def test_other_backends_send_one_each(self):
+        for user in self.users:
+            email_trigger(user, TEMPLATES.WELCOME)
+        self.assertEqual((3, 0), self.send_queued_emails())
+        self.assertEqual(
+            [[user.email] for user in self.users], [m.to for m in mail.outbox]
+        )
+
+
+class SendgridBackendTestCase(APITestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.sendgrid = FakeSendgrid().__enter__()
+        self.backend = SendgridEmailBackend(
+            api_key="key", host=self.sendgrid.url, fail_silently=True
+        )
+        self.backend.dry_run = False
+
+    def tearDown(self):
+        self.sendgrid.__exit__(None, None, None)
+        super().tearDown()
+
+    def _emails(self, count, template_id=TEMPLATES.WELCOME):
+        return [
+            build_email(
+                to=[f"user{i}@a.com"],
+                template_id=template_id,
+                template_data={"user": f"User {i}"},
+            )
+            for i in range(count)
+        ]
+
+    def test_grouped_by_template_and_sender(self):
+        emails = self._emails(2) + self._emails(1, TEMPLATES.VERIFY)
+        other_sender = self._emails(1)[0]
+        other_sender.from_email = "other@a.com"
+        emails.append(other_sender)
+        self.assertEqual(4, self.backend.send_messages(emails))
+        self.assertEqual(
+            [(TEMPLATES.WELCOME, 2), (TEMPLATES.VERIFY, 1), (TEMPLATES.WELCOME, 1)],
+            [
+                (r["body"]["template_id"], len(r["body"]["personalizations"]))
+                for r in self.sendgrid.requests
+            ],
+        )
+        self.assertEqual(
+            {"email": "other@a.com", "name": ""},
+            self.sendgrid.requests[2]["body"]["from"],
+        )
+        self.assertEqual(
+            {
+                "to": [{"email": "user1@a.com", "name": ""}],
+                "dynamic_template_data": {"user": "User 1"},
+            },
+            self.sendgrid.requests[0]["body"]["personalizations"][1],
+        )
+
+    def test_personalizations_limit(self):
+        self.assertEqual(1001, self.backend.send_messages(self._emails(1001)))
+        self.assertEqual(
+            [1000, 1],
+            [len(r["body"]["personalizations"]) for r in self.sendgrid.requests],
+        )
+
+    def test_connection_is_kept_alive(self):
+        with self.backend:
+            self.backend.send_messages(self._emails(1))
+            self.backend.send_messages(self._emails(1, TEMPLATES.VERIFY))
+        first, second = self.sendgrid.requests
+        self.assertEqual(first["client"], second["client"])
+        self.assertIsNone(self.backend.session)
+
+    def test_outcome_of_each_email(self):
+        welcome, verify = self._emails(2), self._emails(1, TEMPLATES.VERIFY)
+        self.sendgrid.statuses = [500]
+        self.assertEqual(1, self.backend.send_messages(welcome + verify))
+        self.assertEqual([False, False, True], [e.sent for e in welcome + verify])
+        self.assertIn("500", welcome[0].error)
+        self.assertIsNone(verify[0].error)
+        # the server errors are not worth splitting the batch for
+        self.assertEqual(2, len(self.sendgrid.requests))
+
+    def test_rejected_emails_are_isolated(self):
+        emails = self._emails(8)
+        self.sendgrid.rejected = {"user2@a.com", "user3@a.com"}
+        self.assertEqual(6, self.backend.send_messages(emails))
+        self.assertEqual(
+            [True, True, False, False, True, True, True, True],
+            [e.sent for e in emails],
+        )
+        self.assertIn("400", emails[2].error)
+        # the rejected requests are split in halves until single emails
+        self.assertEqual(
+            [8, 4, 2, 2, 1, 1, 4],
+            [len(r["body"]["personalizations"]) for r in self.sendgrid.requests],
+        )
+
+    def test_raises_after_sending_the_others(self):
+        self.backend.fail_silently = False
+        emails = self._emails(1) + self._emails(1, TEMPLATES.VERIFY)
+        self.sendgrid.statuses = [400]
+        with self.assertRaises(requests.HTTPError):
+            self.backend.send_messages(emails)
+        self.assertEqual([False, True], [e.sent for e in emails])
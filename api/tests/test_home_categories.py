@@ -121,6 +121,7 @@ class LiveContestTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                     "id": 4,
                     "title": "Movie4",
                     "poster": None,
+                    "poster_srcset": None,
                     "about": "This is a good movie4",
                     "contests": ["January"],
                     "crew": [],
@@ -135,6 +136,7 @@ class LiveContestTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                     "id": 3,
                     "title": "Movie3",
                     "poster": None,
+                    "poster_srcset": None,
                     "about": "This is a good movie3",
                     "contests": ["January"],
                     "crew": [],
@@ -149,6 +151,7 @@ class LiveContestTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                     "id": 2,
                     "title": "Movie2",
                     "poster": None,
+                    "poster_srcset": None,
                     "about": "This is a good movie2",
                     "contests": ["January"],
                     "crew": [],
@@ -193,6 +196,7 @@ class MpGenreMoviesTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                     "id": 2,
                     "title": "Submitted Movie2",
                     "poster": None,
+                    "poster_srcset": None,
                     "about": "This is a good movie2",
                     "contests": [],
                     "crew": [],
@@ -207,6 +211,7 @@ class MpGenreMoviesTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                     "id": 4,
                     "title": "Submitted Movie3",
                     "poster": None,
+                    "poster_srcset": None,
                     "about": "This is a good movie4",
                     "contests": [],
                     "crew": [],
@@ -0,0 +1,662 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.constants import CONTEST_STATE, MOVIE_STATE, RECOMMENDATION
+from api.management.commands import updatepopscore
+from api.management.commands.runrankings import STAGES
+from api.models import (
+    Contest,
+    CrewMember,
+    Movie,
+    MovieList,
+    MovieRateReview,
+    Profile,
+    Role,
+    TopCreator,
+    TopCurator,
+    User,
+)
+from .base import APITestCaseMixin
+
+
+def _create_profiles(count, prefix="user", **kwargs):
+    profiles = []
+    for i in range(count):
+        user = User.objects.create(
+            username=f"{prefix}{i}", email=f"{prefix}{i}@a.com", first_name=prefix
+        )
+        profiles.append(Profile.objects.create(user=user, onboarded=False, **kwargs))
+    return profiles
+
+
+class UpdateEngagementScoreTestCase(APITestCaseMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "order",
+        "movie",
+        "contest_type",
+        "contest",
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.profile = Profile.objects.get(pk=1)
+        self.fans = _create_profiles(100, prefix="fan")
+        fan_users = [fan.user for fan in self.fans]
+
+        # 100 likes are capped at 20 points
+        review = MovieRateReview.objects.create(movie_id=1, author_id=1, rating=5)
+        review.liked_by.add(*fan_users)
+        # 2 followers, 0.25 each
+        self.profile.followed_by.add(*self.fans[:2])
+        # 1 like on contest recommendations, 0.25 each
+        contest = Contest.objects.get(pk=1)
+        curation = MovieList.objects.create(
+            name=contest.name, contest=contest, owner_id=1
+        )
+        curation.liked_by.add(fan_users[0])
+        # likes on personal lists are not counted
+        MovieList.objects.create(name="Personal", owner_id=1).liked_by.add(*fan_users)
+        # fan 0 got one like on their review
+        fan_review = MovieRateReview.objects.create(
+            movie_id=1, author=fan_users[0], rating=5
+        )
+        fan_review.liked_by.add(fan_users[1])
+
+    def test_engagement_score(self):
+        call_command("updateengagementscore", stdout=StringIO())
+        self.profile.refresh_from_db()
+        self.assertEqual(20.75, self.profile.engagement_score)
+        self.assertEqual(1, self.profile.curator_rank)
+
+        self.fans[0].refresh_from_db()
+        self.assertEqual(0.25, self.fans[0].engagement_score)
+        self.assertEqual(2, self.fans[0].curator_rank)
+
+        ranks = sorted(Profile.objects.values_list("curator_rank", flat=True))
+        self.assertEqual(list(range(1, Profile.objects.count() + 1)), ranks)
+
+    def test_celeb_score_unchanged(self):
+        celeb = _create_profiles(1, prefix="celeb", is_celeb=True)[0]
+        celeb.followed_by.add(*self.fans)
+        call_command("updateengagementscore", stdout=StringIO())
+        celeb.refresh_from_db()
+        self.assertEqual(0, celeb.engagement_score)
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command("updateengagementscore", "--dry-run", stdout=out)
+        self.assertIn("1: score 0.0 => 20.75, rank -1 => 1", out.getvalue())
+        self.profile.refresh_from_db()
+        self.assertEqual(0, self.profile.engagement_score)
+        self.assertEqual(-1, self.profile.curator_rank)
+
+    def test_unchanged_profiles_not_written(self):
+        call_command("updateengagementscore", stdout=StringIO())
+        out = StringIO()
+        call_command("updateengagementscore", stdout=out)
+        self.assertIn("0 profile(s) updated", out.getvalue())
+
+
+class LegacyPopScore:
+    """per row implementation updatepopscore was replaced with, copied from it
+    (without the logging and the saves, one annotation renamed) as the
+    reference of the parity test"""
+
+    def __init__(self):
+        self.director_role = Role.objects.filter(name="Director").first()
+
+    def pop_score(self, profile):
+        directed_movies = [
+            cm.movie
+            for cm in CrewMember.objects.filter(
+                role=self.director_role, profile=profile
+            )
+            if cm.movie.state == MOVIE_STATE.PUBLISHED
+        ]
+        followers_points = self.get_follower_points(profile)
+        jury_points = self.get_jury_rating_points(directed_movies)
+        recommend_points = self.get_recommend_points(directed_movies)
+        rating_review_points = self.get_review_points(directed_movies)
+
+        part_b = recommend_points + rating_review_points + jury_points
+        part_a = followers_points
+
+        return self._get_capped_points(part_a, part_b)
+
+    def _get_capped_points(self, part_a, part_b):
+        level_a = self._get_part_a_level(part_a)
+        level_b = self._get_part_b_level(part_b)
+        level = min(level_a, level_b)
+        part_a = min(part_a, updatepopscore.PART_A_LEVELS[level])
+        part_b = min(part_b, updatepopscore.PART_B_LEVELS[level])
+        return part_a + part_b
+
+    def _get_part_b_level(self, points):
+        for level, limit in enumerate(updatepopscore.PART_B_LEVELS):
+            if points < limit:
+                return level + 1
+        return len(updatepopscore.PART_B_LEVELS)
+
+    def _get_part_a_level(self, num):
+        for level, limit in enumerate(updatepopscore.PART_A_LEVELS):
+            if num < limit:
+                return level + 1
+        return len(updatepopscore.PART_A_LEVELS)
+
+    def get_jury_rating_points(self, directed_movies):
+        MULTIPLYER = 2.5
+        jury_points = sum(m.jury_rating * MULTIPLYER for m in directed_movies)
+        return jury_points
+
+    def get_follower_points(self, profile):
+        MULTIPYER = 2
+        followers_count = profile.followed_by.count()
+        followers_points = followers_count * MULTIPYER
+        return followers_points
+
+    def get_review_points(self, directed_movies):
+        REVIEW_MULTIPYER = 1
+        REVIEW_LIMIT = 20
+        RATING_MULTIPYER = 0.5
+        RATING_LIMIT = 50
+        RATING_GTE = 7
+
+        ratings_count = Count(
+            "movieratereview", filter=Q(movieratereview__content__isnull=False)
+        )
+        reviews_count = Count(
+            "movieratereview", filter=Q(movieratereview__rating__gte=RATING_GTE)
+        )
+        # `rating_count` renamed, a column of the movies by now
+        movies = (
+            Movie.objects.filter(id__in=[m.id for m in directed_movies])
+            .annotate(ratings_count=ratings_count)
+            .annotate(actual_review_count=reviews_count)
+        )
+        review_count = 0
+        rating_count = 0
+        for movie in movies:
+            rating_count += min(RATING_LIMIT, movie.ratings_count)
+            review_count += min(REVIEW_LIMIT, movie.actual_review_count)
+        return rating_count * RATING_MULTIPYER + review_count * REVIEW_MULTIPYER
+
+    def get_recommend_points(self, directed_movies):
+        MULTIPYER = 0.1
+        RECOMMENT_LIMIT = 100
+        recommended_count = 0
+        for movie in directed_movies:
+            recommended_count += min(
+                movie.in_lists.exclude(contest_id__isnull=True).count(),
+                RECOMMENT_LIMIT,
+            )
+        return recommended_count * MULTIPYER
+
+
+class UpdatePopScoreTestCase(APITestCaseMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "order",
+        "movie",
+        "crewmember",
+        "contest_type",
+        "contest",
+    ]
+
+    def setUp(self):
+        super().setUp()
+        Profile.objects.get(pk=1).roles.add(1)
+        self.directors = _create_profiles(4, prefix="director")
+        self.fans = _create_profiles(60, prefix="fan")
+        fan_users = [fan.user for fan in self.fans]
+        contest = Contest.objects.get(pk=1)
+        curations = [
+            MovieList.objects.create(name=f"{fan.id}", owner=fan, contest=contest)
+            for fan in fan_users
+        ]
+
+        template = Movie.objects.get(pk=1)
+        movies = []
+        for i, director in enumerate(self.directors):
+            director.roles.add(1)
+            director.followed_by.add(*self.fans[: i * 10])
+            for j in range(2):
+                movie = Movie.objects.get(pk=template.pk)
+                movie.pk = None
+                movie.link = f"http://movie.com/{i}/{j}"
+                movie.jury_rating = i + j
+                # the second movie of the last director is not published yet
+                if i == 3 and j == 1:
+                    movie.state = MOVIE_STATE.SUBMITTED
+                movie.save()
+                movies.append(movie)
+                CrewMember.objects.create(movie=movie, profile=director, role_id=1)
+                # reviews and recommends beyond the per movie limits
+                for n, fan in enumerate(fan_users[: i * 20 + j * 5]):
+                    MovieRateReview.objects.create(
+                        movie=movie,
+                        author=fan,
+                        rating=n % 10 + 1,
+                        content="good" if n % 3 else None,
+                    )
+                    curations[n].movies.add(movie)
+        # the first movie of the second director is co-directed by the third
+        self.co_direction = CrewMember.objects.create(
+            movie=movies[2], profile=self.directors[2], role_id=1
+        )
+
+    def test_parity_with_per_row_implementation(self):
+        profiles = Profile.objects.filter(roles__id=1)
+        legacy = LegacyPopScore()
+        expected = {profile.id: legacy.pop_score(profile) for profile in profiles}
+        call_command("updatepopscore", stdout=StringIO())
+
+        scores = dict(profiles.values_list("id", "pop_score"))
+        self.assertEqual(5, len(scores))
+        for profile_id, pop_score in expected.items():
+            self.assertAlmostEqual(pop_score, scores[profile_id])
+
+        ranked = sorted(
+            profiles.select_related("user"),
+            key=lambda p: (expected[p.id], p.user.get_full_name()),
+            reverse=True,
+        )
+        self.assertEqual(
+            [p.id for p in ranked],
+            list(profiles.order_by("creator_rank").values_list("id", flat=True)),
+        )
+
+    def test_co_directors_are_credited_with_the_movie(self):
+        call_command("updatepopscore", stdout=StringIO())
+        co_director = self.directors[2]
+        co_director.refresh_from_db()
+        pop_score = co_director.pop_score
+        self.co_direction.delete()
+        call_command("updatepopscore", stdout=StringIO())
+        co_director.refresh_from_db()
+        self.assertLess(co_director.pop_score, pop_score)
+
+    def test_query_count_independent_of_directors(self):
+        # the previous leaderboard snapshot is replaced from the second run on
+        call_command("updatepopscore", stdout=StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            call_command("updatepopscore", stdout=StringIO())
+        for director in _create_profiles(5, prefix="new"):
+            director.roles.add(1)
+        with self.assertNumQueries(len(queries)):
+            call_command("updatepopscore", stdout=StringIO())
+
+    def test_highest_level_capped_by_own_limit(self):
+        command = updatepopscore.Command()
+        self.assertEqual(5120 + 1280, command._get_capped_points(6000, 2000))
+        self.assertEqual(600 + 640, command._get_capped_points(600, 2000))
+
+
+def _create_movies(director, count, contest=None, **kwargs):
+    """copies of the fixture movie directed by `director`"""
+    movies = []
+    for i in range(count):
+        movie = Movie.objects.get(pk=1)
+        movie.pk = None
+        movie.link = f"http://movie.com/{director.id}/{i}"
+        for field, value in kwargs.items():
+            setattr(movie, field, value)
+        movie.save()
+        CrewMember.objects.create(movie=movie, profile=director, role_id=1)
+        if contest:
+            contest.movies.add(movie)
+        movies.append(movie)
+    return movies
+
+
+def _create_live_contest(name="January"):
+    """a contest live from yesterday until next month, the fixture contest is
+    over"""
+    now = timezone.now()
+    return Contest.objects.create(
+        name=name,
+        start=now - timedelta(days=1),
+        end=now + timedelta(days=30),
+        type_id=1,
+        state=CONTEST_STATE.LIVE,
+    )
+
+
+class UpdateTopCreatorsTestCase(APITestCaseMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "order",
+        "movie",
+        "contest_type",
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.contest = _create_live_contest()
+        self.director, self.other_director = _create_profiles(2, prefix="director")
+        first, second = _create_movies(self.director, 2, contest=self.contest)
+        self.first = first
+        first.jury_rating = 4
+        first.save()
+        second.jury_rating = 8
+        second.save()
+        _create_movies(self.other_director, 1, contest=self.contest, jury_rating=10)
+        # unpublished movies are not scored
+        _create_movies(
+            self.other_director,
+            1,
+            contest=self.contest,
+            jury_rating=0,
+            state=MOVIE_STATE.SUBMITTED,
+            link="http://movie.com/unpublished",
+        )
+        for fan in _create_profiles(2, prefix="fan"):
+            MovieList.objects.create(name=RECOMMENDATION, owner=fan.user).movies.add(
+                first
+            )
+
+    def test_all_movies_of_a_director_are_scored(self):
+        call_command("updatetopcreators")
+        top_creators = list(
+            TopCreator.objects.filter(contest=self.contest).order_by("pos")
+        )
+        self.assertEqual(
+            [
+                (self.other_director.id, 30.0, 0, 1),
+                (self.director.id, 18.5, 2, 2),
+            ],
+            [(t.profile_id, t.score, t.recommend_count, t.pos) for t in top_creators],
+        )
+
+    def test_replaces_previous_rows(self):
+        call_command("updatetopcreators")
+        call_command("updatetopcreators")
+        self.assertEqual(2, TopCreator.objects.filter(contest=self.contest).count())
+
+    def test_co_directors_are_ranked_with_the_movie(self):
+        co_director = _create_profiles(1, prefix="codirector")[0]
+        CrewMember.objects.create(movie=self.first, profile=co_director, role_id=1)
+        call_command("updatetopcreators")
+        self.assertEqual(
+            [
+                (self.other_director.id, 30.0, 0),
+                (self.director.id, 18.5, 2),
+                (co_director.id, 12.5, 2),
+            ],
+            list(
+                TopCreator.objects.filter(contest=self.contest)
+                .order_by("pos")
+                .values_list("profile_id", "score", "recommend_count")
+            ),
+        )
+
+
+class UpdateTopCuratorsTestCase(APITestCaseMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "order",
+        "movie",
+        "contest_type",
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.contest = _create_live_contest()
+        first, second = _create_movies(Profile.objects.get(pk=1), 2)
+        self.celeb = celeb = _create_profiles(1, prefix="celeb", is_celeb=True)[0]
+        self.curator, self.other_curator = _create_profiles(2, prefix="curator")
+        self.fans = fans = [fan.user for fan in _create_profiles(3, prefix="fan")]
+
+        self.celeb_list = self._contest_list(celeb)
+        self.celeb_list.movies.add(first, second)
+        curation = self._contest_list(self.curator)
+        curation.movies.add(first)
+        curation.liked_by.add(*fans[:2])
+        self.other_curation = self._contest_list(self.other_curator)
+        self.other_curation.movies.add(Movie.objects.get(pk=1))
+        self.other_curation.liked_by.add(*fans)
+
+    def _contest_list(self, profile, contest=None):
+        contest = contest or self.contest
+        return MovieList.objects.create(
+            name=contest.name, contest=contest, owner=profile.user
+        )
+
+    def _curators(self, contest=None):
+        return [
+            (c.profile_id, c.likes_on_recommend, c.match, c.score, c.pos)
+            for c in TopCurator.objects.filter(
+                contest=contest or self.contest
+            ).order_by("pos")
+        ]
+
+    def test_score_and_rank(self):
+        call_command("updatetopcurators")
+        self.assertEqual(
+            [
+                (self.curator.id, 2, 50.0, 100.0, 1),
+                (self.other_curator.id, 3, 0, 3, 2),
+            ],
+            self._curators(),
+        )
+
+    def test_contests_ranked_separately(self):
+        contest = _create_live_contest("February")
+        self._contest_list(self.other_curator, contest).liked_by.add(1)
+
+        call_command("updatetopcurators")
+        self.assertEqual(2, len(self._curators()))
+        self.assertEqual([(self.other_curator.id, 1, 0, 1, 1)], self._curators(contest))
+
+    def test_incremental_recomputes_changed_lists_only(self):
+        call_command("updatetopcurators")
+        # rows of unchanged lists are carried over as they are
+        TopCurator.objects.filter(profile=self.curator).update(score=1)
+        self.other_curation.liked_by.remove(self.fans[0])
+
+        call_command("updatetopcurators", "--incremental")
+        self.assertEqual(
+            [
+                (self.other_curator.id, 2, 0, 2, 1),
+                (self.curator.id, 2, 50.0, 1, 2),
+            ],
+            self._curators(),
+        )
+
+        call_command("updatetopcurators")
+        self.assertEqual(
+            [
+                (self.curator.id, 2, 50.0, 100.0, 1),
+                (self.other_curator.id, 2, 0, 2, 2),
+            ],
+            self._curators(),
+        )
+
+    def test_incremental_after_celeb_list_deleted(self):
+        call_command("updatetopcurators")
+        self.celeb_list.delete()
+
+        call_command("updatetopcurators", "--incremental")
+        self.assertEqual(
+            [
+                (self.other_curator.id, 3, 0, 3, 1),
+                (self.curator.id, 2, 0, 2, 2),
+            ],
+            self._curators(),
+        )
+
+    def test_incremental_after_celeb_removed(self):
+        call_command("updatetopcurators")
+        self.celeb.is_celeb = False
+        self.celeb.save()
+
+        call_command("updatetopcurators", "--incremental")
+        self.assertEqual(
+            [
+                (self.other_curator.id, 3, 0, 3, 1),
+                (self.curator.id, 2, 0, 2, 2),
+                (self.celeb.id, 0, 0, 0, 3),
+            ],
+            self._curators(),
+        )
+
+
+class RunRankingsTestCase(APITestCaseMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "order",
+        "movie",
+        "crewmember",
+        "contest_type",
+    ]
+
+    def setUp(self):
+        super().setUp()
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        state_path = os.path.join(state_dir.name, "rankings.state.json")
+        settings_override = override_settings(RANKINGS_STATE_PATH=state_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        _create_live_contest().movies.add(1)
+
+    def test_all_stages(self):
+        out = StringIO()
+        call_command("runrankings", stdout=out)
+        for stage in ["updateroles", "updatepopscore", "rankings"]:
+            self.assertIn(f"{stage}: ", out.getvalue())
+        profile = Profile.objects.get(pk=1)
+        # the director role from updateroles is used by updatepopscore
+        self.assertEqual(1, profile.creator_rank)
+        self.assertEqual(1, profile.curator_rank)
+        self.assertTrue(TopCreator.objects.filter(profile=profile).exists())
+
+    def test_selected_stages(self):
+        out = StringIO()
+        call_command(
+            "runrankings",
+            "--stages",
+            "updatetopcreators",
+            "updateengagementscore",
+            stdout=out,
+        )
+        output = out.getvalue()
+        self.assertLess(
+            output.index("updateengagementscore: "), output.index("updatetopcreators: ")
+        )
+        self.assertNotIn("updatepopscore: ", output)
+        self.assertEqual(-1, Profile.objects.get(pk=1).creator_rank)
+
+    def test_resume_after_failure(self):
+        with mock.patch(
+            "api.management.commands.updatepopscore.Command.get_director_points",
+            side_effect=ValueError("boom"),
+        ):
+            with self.assertRaises(CommandError):
+                call_command("runrankings", stdout=StringIO())
+        self.assertFalse(TopCreator.objects.exists())
+
+        out = StringIO()
+        call_command("runrankings", "--resume", stdout=out)
+        self.assertIn(
+            "skipping completed stage(s): updateroles, updateengagementscore",
+            out.getvalue(),
+        )
+        self.assertIn("updatepopscore: ", out.getvalue())
+        self.assertTrue(TopCreator.objects.exists())
+
+    def test_resume_after_success(self):
+        call_command("runrankings", stdout=StringIO())
+
+        out = StringIO()
+        call_command("runrankings", "--resume", stdout=out)
+        self.assertIn("no failed run to resume, running all stages", out.getvalue())
+        for stage in STAGES:
+            self.assertIn(f"{stage}: ", out.getvalue())
+
+
+class UpdateRolesTestCase(APITestCaseMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "order",
+        "movie",
+        "crewmember",
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.actors = _create_profiles(10, prefix="actor")
+        for actor in self.actors:
+            CrewMember.objects.create(movie_id=1, profile=actor, role_id=2)
+        # directing a movie which is still being created doesn't grant the role
+        _create_movies(self.actors[0], 1, state=MOVIE_STATE.CREATED)
+
+    def _roles(self, profile):
+        return list(profile.roles.order_by("id").values_list("id", flat=True))
+
+    def test_missing_roles_added_in_constant_queries(self):
+        out = StringIO()
+        # savepoint, select of the missing pairs and one insert
+        with self.assertNumQueries(4):
+            call_command("updateroles", stdout=out)
+        self.assertIn("11 role(s) added", out.getvalue())
+        self.assertEqual([1], self._roles(Profile.objects.get(pk=1)))
+        self.assertEqual([2], self._roles(self.actors[0]))
+
+        out = StringIO()
+        call_command("updateroles", stdout=out)
+        self.assertIn("0 role(s) added", out.getvalue())
+
+    def test_remove_stale(self):
+        stale = _create_profiles(1, prefix="stale")[0]
+        stale.roles.add(1)
+        call_command("updateroles", stdout=StringIO())
+        self.assertEqual([1], self._roles(stale))
+
+        out = StringIO()
+        call_command("updateroles", "--remove-stale", stdout=out)
+        self.assertIn("1 stale role(s) removed", out.getvalue())
+        self.assertEqual([], self._roles(stale))
+        self.assertEqual([1], self._roles(Profile.objects.get(pk=1)))
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command("updateroles", "--dry-run", "--remove-stale", stdout=out)
+        self.assertIn("11 role(s) would be added", out.getvalue())
+        self.assertIn("0 role(s) would be removed", out.getvalue())
+        self.assertEqual([], self._roles(self.actors[1]))
@@ -1,4 +1,26 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from api.constants import (
+    CONTEST_STATE,
+    DIRECTOR_ROLE,
+    MOVIE_STATE,
+    RECOMMENDATION,
+    REVIEW_STATE,
+)
+from api.models import (
+    Contest,
+    CrewMember,
+    Movie,
+    MovieList,
+    MovieRateReview,
+    Profile,
+    Role,
+    User,
+)
 from .base import reverse, APITestCaseMixin, LoggedInMixin
 
 
@@ -39,6 +61,7 @@ class MovieViewTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                 "genres": [{"id": 1, "name": "Drama"}],
                 "lang": {"id": 1, "name": "English"},
                 "poster": None,
+                "poster_srcset": None,
                 "package": None,
                 "crew": [
                     {
@@ -89,6 +112,7 @@ class MovieViewTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                     ],
                     "id": 1,
                     "poster": None,
+                    "poster_srcset": None,
                     "publish_on": "2021-01-01T10:53:15.167332+05:30",
                     "recommend_count": 0,
                     "runtime": 100.0,
@@ -113,6 +137,7 @@ class MovieViewTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                     "id": 1,
                     "title": "Submitted Movie",
                     "poster": None,
+                    "poster_srcset": None,
                     "about": "This is a good movie",
                     "contests": [],
                     "crew": [
@@ -128,3 +153,182 @@ class MovieViewTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
             ],
             actual_movies,
         )
+
+
+class MovieDetailQueryCountTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "package",
+        "order",
+        "movie",
+        "contest_type",
+        "contest",
+        "crewmember",
+    ]
+    # token, movie, genres, contests, crew, rating, watchlist and movie lists
+    expected_queries = 8
+
+    def _add_crew_members(self, count):
+        movie = Movie.objects.get(pk=1)
+        actor = Role.objects.get(name="Actor")
+        for i in range(count):
+            user = User.objects.create(username=f"crew{i}", email=f"crew{i}@a.com")
+            profile = Profile.objects.create(user=user, onboarded=False)
+            CrewMember.objects.create(movie=movie, profile=profile, role=actor)
+
+    def _add_live_contests(self, count):
+        movie = Movie.objects.get(pk=1)
+        now = timezone.now()
+        for i in range(count):
+            contest = Contest.objects.create(
+                name=f"Live {i}",
+                start=now - timedelta(days=1),
+                end=now + timedelta(days=1),
+                type_id=1,
+                state=CONTEST_STATE.LIVE,
+            )
+            contest.movies.add(movie)
+            movie_list = MovieList.objects.create(
+                name=contest.name, contest=contest, owner=self.user
+            )
+            movie_list.movies.add(movie)
+
+    def _get_movie_details(self):
+        with self.assertNumQueries(self.expected_queries):
+            res = self.client.get(reverse("api:movie-detail", args=["v1", 1]))
+        self.assertEqual(200, res.status_code)
+        return res.json()
+
+    def test_query_count_independent_of_crew_size(self):
+        self._get_movie_details()
+        self._add_crew_members(5)
+        movie = self._get_movie_details()
+        self.assertEqual(6, len(movie["crew"]))
+
+    def test_query_count_independent_of_live_contests(self):
+        self._get_movie_details()
+        self._add_live_contests(3)
+        movie = self._get_movie_details()
+        self.assertEqual(3, len(movie["contests"]))
+        for contest in movie["contests"]:
+            self.assertEqual([{"id": 1}], contest["recommended_movies"])
+
+    def test_viewer_flags(self):
+        movie = Movie.objects.get(pk=1)
+        self.profile.watchlist.add(movie)
+        MovieList.objects.create(name=RECOMMENDATION, owner=self.user).movies.add(movie)
+        MovieRateReview.objects.create(
+            movie=movie, author=self.user, rating=7, state=REVIEW_STATE.PUBLISHED
+        )
+        movie = self._get_movie_details()
+        self.assertTrue(movie["is_watchlisted"])
+        self.assertTrue(movie["is_recommended"])
+        self.assertEqual(7, movie["requestor_rating"]["rating"])
+
+
+class MovieListQueryCountTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "package",
+        "order",
+        "movie",
+        "contest_type",
+        "contest",
+        "crewmember",
+    ]
+    # token, count, page, contests and crew
+    expected_queries = 5
+
+    def setUp(self):
+        super().setUp()
+        contest = Contest.objects.get(pk=1)
+        roles = list(Role.objects.all())
+        for i in range(10):
+            movie = Movie.objects.create(
+                title=f"Movie {i}",
+                link=f"http://example.com/{i}",
+                runtime=10,
+                state=MOVIE_STATE.PUBLISHED,
+                publish_on=timezone.now(),
+            )
+            movie.contests.add(contest)
+            user = User.objects.create(username=f"crew{i}", email=f"crew{i}@a.com")
+            profile = Profile.objects.create(user=user, onboarded=False)
+            for role in roles:
+                CrewMember.objects.create(movie=movie, profile=profile, role=role)
+
+    def _get_movies(self, url, limit):
+        # the total count would be served from the cache the second time
+        cache.clear()
+        with self.assertNumQueries(self.expected_queries):
+            res = self.client.get(url, {"limit": limit})
+        self.assertEqual(200, res.status_code)
+        return res.json()["results"]
+
+    def test_movie_list_query_count_independent_of_page_size(self):
+        url = reverse("api:movie-list")
+        self.assertEqual(2, len(self._get_movies(url, 2)))
+        movies = self._get_movies(url, 10)
+        self.assertEqual(10, len(movies))
+        for movie in movies:
+            self.assertEqual(["January"], movie["contests"])
+            self.assertEqual(2, len(movie["crew"]))
+
+    def test_contest_movies_query_count_independent_of_page_size(self):
+        url = reverse("api:contest-movies", args=["v1", 1])
+        # contest lookup is an additional query
+        self.expected_queries += 1
+        self.assertEqual(2, len(self._get_movies(url, 2)))
+        self.assertEqual(10, len(self._get_movies(url, 10)))
+
+
+class DirectorProfileTestCase(APITestCaseMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "package",
+        "order",
+        "movie",
+        "crewmember",
+    ]
+
+    def test_director_profile_loaded_from_crew(self):
+        movie = Movie.objects.get(pk=1)
+        self.assertEqual(1, movie.director_profile_id)
+
+    def test_director_profile_updated_on_crew_change(self):
+        movie = Movie.objects.get(pk=1)
+        CrewMember.objects.filter(movie=movie, role__name=DIRECTOR_ROLE).delete()
+        movie.refresh_from_db()
+        self.assertIsNone(movie.director_profile)
+
+        user = User.objects.create(username="director", email="director@a.com")
+        profile = Profile.objects.create(user=user, onboarded=False)
+        director_role = Role.objects.get(name=DIRECTOR_ROLE)
+        CrewMember.objects.create(movie=movie, profile=profile, role=director_role)
+        # in memory movie is updated as well
+        self.assertEqual(profile.id, movie.director_profile_id)
+        movie.refresh_from_db()
+        self.assertEqual(profile, movie.director_profile)
+
+    def test_role_registry(self):
+        director_role_id = Role.objects.get_id(DIRECTOR_ROLE)
+        with self.assertNumQueries(0):
+            self.assertEqual(director_role_id, Role.objects.get_id(DIRECTOR_ROLE))
+
+        role = Role.objects.create(name="Editor")
+        self.assertEqual(role.id, Role.objects.get_id("Editor"))
+        role.delete()
+        with self.assertRaises(Role.DoesNotExist):
+            Role.objects.get_id("Editor")
@@ -94,6 +94,7 @@ class MovieListTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                     "id": 1,
                     "title": "Submitted Movie",
                     "poster": None,
+                    "poster_srcset": None,
                     "about": "This is a good movie",
                     "contests": [],
                     "crew": [],
@@ -0,0 +1,154 @@
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Movie, MovieRateReview, Profile, User
+from .base import reverse, APITestCaseMixin
+
+
+class KeysetPaginationTestCase(APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "movie"]
+
+    def setUp(self):
+        super().setUp()
+        template = Movie.objects.get(pk=1)
+        publish_on = template.publish_on
+        # ties on every ordering column and movies without a publish date
+        for i in range(9):
+            movie = Movie.objects.get(pk=1)
+            movie.pk = None
+            movie.link = f"http://movie.com/{i}"
+            movie.title = f"Movie {i % 3}"
+            movie.publish_on = None if i % 4 == 0 else publish_on - timedelta(i % 2)
+            movie.recommend_count = i % 2
+            movie.save()
+
+    def _get(self, url, params=None):
+        res = self.client.get(url, params)
+        self.assertEqual(200, res.status_code, res.content)
+        return res.json()
+
+    def _walk(self, url, params):
+        """ids of all the pages following the next links, with the last page"""
+        page = self._get(url, params)
+        ids = [row["id"] for row in page["results"]]
+        while page["next"]:
+            next_url = urlparse(page["next"])
+            page = self._get(f"{next_url.path}?{next_url.query}")
+            ids += [row["id"] for row in page["results"]]
+        return ids, page
+
+    def test_pages_match_offset_pagination(self):
+        url = reverse("api:movie-list")
+        expected = [row["id"] for row in self._get(url, {"limit": 100})["results"]]
+        self.assertEqual(10, len(expected))
+
+        ids, last_page = self._walk(url, {"cursor": "", "limit": 3})
+        self.assertEqual(expected, ids)
+        self.assertNotIn("count", last_page)
+
+        # and back again
+        ids = [row["id"] for row in last_page["results"]]
+        page = last_page
+        while page["previous"]:
+            previous_url = urlparse(page["previous"])
+            page = self._get(f"{previous_url.path}?{previous_url.query}")
+            ids = [row["id"] for row in page["results"]] + ids
+        self.assertEqual(expected, ids)
+
+    def test_requested_ordering(self):
+        url = reverse("api:movie-list")
+        params = {"ordering": "recommend_count", "limit": 100}
+        expected = [row["id"] for row in self._get(url, params)["results"]]
+        ids, _ = self._walk(
+            url, {"ordering": "recommend_count", "cursor": "", "limit": 4}
+        )
+        self.assertEqual(expected, ids)
+
+    def test_offset_pagination_without_cursor(self):
+        page = self._get(reverse("api:movie-list"), {"limit": 3})
+        self.assertEqual(10, page["count"])
+
+    def test_invalid_cursor(self):
+        res = self.client.get(reverse("api:movie-list"), {"cursor": "bm9wZQ=="})
+        self.assertEqual(404, res.status_code)
+
+    def test_reviews_by_likes(self):
+        fans = [
+            User.objects.create(username=f"fan{i}", email=f"fan{i}@a.com")
+            for i in range(5)
+        ]
+        for i, fan in enumerate(fans):
+            review = MovieRateReview.objects.create(
+                movie_id=1, author=fan, content="Good one"
+            )
+            review.liked_by.add(*fans[: i % 3])
+        url = reverse("api:review-list")
+        expected = [row["id"] for row in self._get(url, {"limit": 100})["results"]]
+        ids, _ = self._walk(url, {"cursor": "", "limit": 2})
+        self.assertEqual(expected, ids)
+
+    def test_leaderboard(self):
+        for i in range(5):
+            user = User.objects.create(username=f"curator{i}", email=f"c{i}@a.com")
+            Profile.objects.create(user=user, onboarded=True, curator_rank=i // 2)
+        url = reverse("api:audienceleaderboard-list")
+        expected = [row["id"] for row in self._get(url, {"limit": 100})["results"]]
+        self.assertEqual(5, len(expected))
+        ids, _ = self._walk(url, {"cursor": "", "limit": 2})
+        self.assertEqual(expected, ids)
+
+
+class CachedCountPaginationTestCase(APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "movie"]
+
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            movie = Movie.objects.get(pk=1)
+            movie.pk = None
+            movie.link = f"http://movie.com/{i}"
+            movie.save()
+        self.url = reverse("api:movie-list")
+
+    def _count_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(self.url, params)
+        self.assertEqual(200, res.status_code, res.content)
+        counts = [q for q in queries if q["sql"].startswith("SELECT COUNT(*)")]
+        return res.json(), len(counts)
+
+    def test_count_is_cached_per_filters(self):
+        page, counts = self._count_queries({"limit": 2})
+        self.assertEqual((5, 1), (page["count"], counts))
+        # another page of the same filters
+        page, counts = self._count_queries({"limit": 2, "offset": 2})
+        self.assertEqual((5, 0), (page["count"], counts))
+        # other filters are counted on their own
+        page, counts = self._count_queries({"limit": 2, "search": "nope"})
+        self.assertEqual((0, 1), (page["count"], counts))
+
+    @override_settings(PAGINATION_COUNT_TTL=0)
+    def test_cache_disabled(self):
+        self._count_queries({"limit": 2})
+        _, counts = self._count_queries({"limit": 2})
+        self.assertEqual(1, counts)
+
+    def test_without_count(self):
+        page, counts = self._count_queries({"limit": 2, "count": "false"})
+        self.assertEqual((None, 0), (page["count"], counts))
+        self.assertEqual(2, len(page["results"]))
+        self.assertIn("offset=2", page["next"])
+
+        page, _ = self._count_queries({"limit": 2, "offset": 4, "count": "false"})
+        self.assertEqual(1, len(page["results"]))
+        self.assertIsNone(page["next"])
+        self.assertIn("offset=2", page["previous"])
+
+    def test_estimated_count(self):
+        # sqlite has no planner estimate, the exact count is returned
+        page, _ = self._count_queries({"limit": 2, "count": "estimate"})
+        self.assertEqual(5, page["count"])
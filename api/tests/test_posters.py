@@ -0,0 +1,183 @@
+import os
+import shutil
+import tempfile
+from hashlib import sha256
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.constants import MOVIE_STATE
+from api.images import process_movie_poster, render_width_variants
+from api.models import Movie
+from api.serializers.movie import MovieSerializerSummary
+from .base import reverse, capture_on_commit, APITestCaseMixin, LoggedInMixin
+from .test_submission import MovieSubmitTestMixin
+
+
+def make_poster(size, image_format="JPEG"):
+    buffer = BytesIO()
+    Image.new("RGB", size, (20, 120, 200)).save(buffer, image_format)
+    buffer.seek(0)
+    return buffer
+
+
+class TempMediaMixin:
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        settings = override_settings(MEDIA_ROOT=self.media_root, IMAGE_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def _variant_files(self):
+        return sorted(os.listdir(os.path.join(self.media_root, "posters", "variants")))
+
+
+class RenderWidthVariantsTestCase(TestCase):
+    def _sizes(self, size, widths=(640, 320, 160)):
+        return [
+            variant.size
+            for _, variant in render_width_variants(make_poster(size), widths)
+        ]
+
+    def test_widths(self):
+        self.assertEqual(
+            [(640, 960), (320, 480), (160, 240)], self._sizes((1000, 1500))
+        )
+
+    def test_not_upscaled(self):
+        self.assertEqual([(320, 480), (160, 240)], self._sizes((400, 600)))
+        self.assertEqual([(100, 150)], self._sizes((100, 150)))
+
+
+class PosterVariantsTestCase(TempMediaMixin, APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "movie"]
+
+    def _set_poster(self, movie_id, buffer, name="poster.jpg"):
+        path = default_storage.save(
+            f"posters/{movie_id}-{name}", ContentFile(buffer.getvalue())
+        )
+        Movie.objects.filter(pk=movie_id).update(
+            poster=default_storage.url(path), poster_variants=None
+        )
+
+    def test_process_movie_poster(self):
+        self._set_poster(1, make_poster((1000, 1500)))
+        process_movie_poster(1)
+        movie = Movie.objects.get(pk=1)
+        digest = movie.poster_variants["hash"]
+        self.assertEqual([640, 320, 160], movie.poster_variants["widths"])
+        self.assertEqual(
+            sorted(
+                f"{digest}-{width}.{ext}"
+                for width in [640, 320, 160]
+                for ext in ["jpg", "webp"]
+            ),
+            self._variant_files(),
+        )
+        self.assertEqual(
+            {
+                ext: ", ".join(
+                    f"/media/posters/variants/{digest}-{width}.{ext} {width}w"
+                    for width in [640, 320, 160]
+                )
+                for ext in ["jpg", "webp"]
+            },
+            MovieSerializerSummary(movie).data["poster_srcset"],
+        )
+
+    def test_same_content_same_files(self):
+        self._set_poster(1, make_poster((400, 600)))
+        process_movie_poster(1)
+        files = self._variant_files()
+        # a new upload of the same poster
+        self._set_poster(1, make_poster((400, 600)), "again.jpg")
+        process_movie_poster(1)
+        self.assertEqual(files, self._variant_files())
+
+    def test_external_poster_is_skipped(self):
+        Movie.objects.filter(pk=1).update(poster="https://example.com/p.jpg")
+        process_movie_poster(1)
+        self.assertIsNone(Movie.objects.get(pk=1).poster_variants)
+
+    def test_backfill(self):
+        self._set_poster(1, make_poster((700, 1000)))
+        Movie.objects.create(
+            title="No Poster",
+            link="http://no-poster.com",
+            runtime=10,
+            state=MOVIE_STATE.PUBLISHED,
+        )
+        out = StringIO()
+        call_command("backfillposters", "--dry-run", stdout=out)
+        self.assertIn("1 poster(s) to process", out.getvalue())
+        self.assertIsNone(Movie.objects.get(pk=1).poster_variants)
+
+        call_command("backfillposters", "--workers", "1", stdout=out)
+        self.assertIn("1 poster(s) processed, 0 failed", out.getvalue())
+        self.assertEqual(
+            [640, 320, 160], Movie.objects.get(pk=1).poster_variants["widths"]
+        )
+
+        out = StringIO()
+        call_command("backfillposters", stdout=out)
+        self.assertIn("0 poster(s) to process", out.getvalue())
+
+    def test_backfill_broken_poster(self):
+        path = default_storage.save("posters/broken.jpg", ContentFile(b"broken"))
+        Movie.objects.filter(pk=1).update(poster=default_storage.url(path))
+        out = StringIO()
+        call_command("backfillposters", "--workers", "1", stdout=out)
+        self.assertIn("0 poster(s) processed, 1 failed", out.getvalue())
+
+
+class SubmissionPosterTestCase(
+    TempMediaMixin, MovieSubmitTestMixin, APITestCaseMixin, LoggedInMixin, TestCase
+):
+    fixtures = ["test_submission.yaml"]
+    roles = [dict(name="Director")]
+
+    def test_variants_after_submission(self):
+        with capture_on_commit(execute=True):
+            movie_id = self._submit_movie().json()["id"]
+        movie = Movie.objects.get(pk=movie_id)
+        # the test poster is 486px wide
+        self.assertEqual([320, 160], movie.poster_variants["widths"])
+        Movie.objects.filter(pk=movie_id).update(state=MOVIE_STATE.PUBLISHED)
+        res = self.client.get(reverse("api:movie-detail", args=["v1", movie_id]))
+        self.assertIn(" 320w, ", res.json()["poster_srcset"]["webp"])
+
+    def test_poster_hashed_while_uploaded(self):
+        with open("api/tests/test_poster.png", "rb") as fp:
+            digest = sha256(fp.read()).hexdigest()
+        # neither read again to be hashed nor copied to the storage
+        with mock.patch.object(TemporaryUploadedFile, "chunks") as chunks:
+            poster = self._submit_movie().json()["poster"]
+        chunks.assert_not_called()
+        self.assertEqual(f"/media/posters/{digest}.png", poster)
+
+    @override_settings(UPLOAD_MAX_SIZE=1000)
+    def test_poster_too_large(self):
+        res = self._submit_movie(check_success=False)
+        self.assertEqual(400, res.status_code)
+        self.assertIn("poster larger than 1000 bytes", res.json()["detail"])
+        self.assertFalse(Movie.objects.filter(title="Movie1").exists())
+
+    @override_settings(UPLOAD_MAX_SIZE=1000, DATA_UPLOAD_MAX_MEMORY_SIZE=1000)
+    def test_request_too_large(self):
+        res = self._submit_movie(check_success=False)
+        self.assertEqual(400, res.status_code)
+        self.assertIn("request larger than", res.json()["detail"])
+
+    @override_settings(UPLOAD_MAX_SIZE=1000, DATA_UPLOAD_MAX_MEMORY_SIZE=None)
+    def test_poster_too_large_without_fields_limit(self):
+        res = self._submit_movie(check_success=False)
+        self.assertEqual(400, res.status_code)
+        self.assertIn("poster larger than 1000 bytes", res.json()["detail"])
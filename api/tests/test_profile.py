@@ -1,6 +1,16 @@
-from api.constants import MOVIE_STATE, RECOMMENDATION
-from api.models import MovieList, Movie, User
+from api.constants import GENDER, LEADERBOARD, MOVIE_STATE, RECOMMENDATION
+from api.models import (
+    LeaderboardEntry,
+    LeaderboardSnapshot,
+    MovieList,
+    Movie,
+    Profile,
+    User,
+)
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from .base import reverse, APITestCaseMixin, LoggedInMixin
 
 
@@ -26,6 +36,7 @@ class PersonalRecommendListTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
                     "id": 1,
                     "title": "Submitted Movie",
                     "poster": None,
+                    "poster_srcset": None,
                     "about": "This is a good movie",
                     "contests": [],
                     "crew": [],
@@ -64,3 +75,58 @@ class PersonalRecommendListTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
         res = self.client.post(url, dict(movie=1))
         self.assertEqual(400, res.status_code)
         self.assertEqual({"movie": ["Movie does not exist"]}, res.json())
+
+
+class LeaderboardSnapshotTestCase(APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile"]
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            user = User.objects.create(
+                username=f"ranked{i}", email=f"r{i}@a.com", first_name=f"Ranked{i}"
+            )
+            Profile.objects.create(
+                user=user,
+                onboarded=True,
+                curator_rank=5 - i,
+                creator_rank=i,
+                city="Pune",
+                gender=GENDER.FEMALE if i % 2 else None,
+                image=f"http://img.com/{i}.png" if i % 2 == 0 else None,
+            )
+
+    def _get(self, name, queries=None):
+        if queries is None:
+            res = self.client.get(reverse(name))
+        else:
+            with self.assertNumQueries(queries):
+                res = self.client.get(reverse(name))
+        self.assertEqual(200, res.status_code)
+        return res.json()["results"]
+
+    def test_snapshot_matches_live_profiles(self):
+        for board, name in [
+            (LEADERBOARD.AUDIENCE, "api:audienceleaderboard-list"),
+            (LEADERBOARD.FILMMAKER, "api:filmmakerleaderboard-list"),
+        ]:
+            live = self._get(name)
+            self.assertEqual(len(live), LeaderboardSnapshot.objects.publish(board))
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(live, self._get(name))
+            # snapshot lookup, count and page
+            self.assertEqual(3, len(queries))
+            self.assertFalse(any("JOIN" in query["sql"] for query in queries))
+
+    def test_publish_switches_to_the_new_snapshot(self):
+        url = "api:audienceleaderboard-list"
+        LeaderboardSnapshot.objects.publish(LEADERBOARD.AUDIENCE)
+        Profile.objects.filter(user__username="ranked0").update(curator_rank=0)
+        LeaderboardSnapshot.objects.publish(LEADERBOARD.AUDIENCE)
+        cache.clear()
+        self.assertEqual("Ranked0", self._get(url)[0]["name"])
+        self.assertEqual(
+            1, LeaderboardSnapshot.objects.filter(board=LEADERBOARD.AUDIENCE).count()
+        )
+        self.assertEqual(5, LeaderboardEntry.objects.count())
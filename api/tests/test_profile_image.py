@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from api.constants import PROCESSING_AVATAR
+from api.images import process_profile_image, render_square_variants
+from api.models import Profile, ProfileImageUpload
+from .base import reverse, capture_on_commit, APITestCaseMixin, LoggedInMixin
+
+
+def make_image(size, image_format="JPEG", mode="RGB", color=(200, 30, 30)):
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, image_format)
+    buffer.seek(0)
+    return buffer
+
+
+class ProfileImageTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
+    fixtures = ["user", "profile"]
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        settings = override_settings(MEDIA_ROOT=self.media_root, IMAGE_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def _upload(self, buffer, name="image.jpg", process=True):
+        url = reverse("api:profileimage-detail", args=["v1", self.profile.id])
+        image = SimpleUploadedFile(name, buffer.getvalue())
+        with capture_on_commit() as callbacks:
+            res = self.client.put(url, {"image": image}, format="multipart")
+        self.assertEqual(200, res.status_code, res.content)
+        # not processed by the request itself
+        self.assertEqual(PROCESSING_AVATAR, res.json()["image"])
+        self.assertEqual(
+            PROCESSING_AVATAR, Profile.objects.get(pk=self.profile.id).image
+        )
+        if not process:
+            # the job is lost with its worker
+            return callbacks
+        for callback in callbacks:
+            callback()
+        self.assertFalse(ProfileImageUpload.objects.exists())
+        return Profile.objects.get(pk=self.profile.id).image
+
+    def _files(self):
+        return sorted(os.listdir(os.path.join(self.media_root, "profile")))
+
+    def test_variants(self):
+        image_url = self._upload(make_image((1200, 800)))
+        self.assertRegex(image_url, r"^/media/profile/[0-9a-f]{64}\.jpg$")
+        stem = image_url.split("/")[-1][: -len(".jpg")]
+        self.assertEqual(
+            sorted(
+                f"{prefix}{stem}.{ext}"
+                for prefix in ["", "150_", "80_"]
+                for ext in ["jpg", "webp"]
+            )
+            + ["uploads"],
+            self._files(),
+        )
+        # the upload is removed once processed
+        self.assertEqual(
+            [], os.listdir(os.path.join(self.media_root, "profile", "uploads"))
+        )
+        for prefix, size in [("", 400), ("150_", 150), ("80_", 80)]:
+            for ext, image_format in [("jpg", "JPEG"), ("webp", "WEBP")]:
+                path = os.path.join(self.media_root, "profile", f"{prefix}{stem}.{ext}")
+                with Image.open(path) as img:
+                    self.assertEqual((size, size), img.size)
+                    self.assertEqual(image_format, img.format)
+
+    def test_same_image_is_stored_once(self):
+        first = self._upload(make_image((500, 500)))
+        files = self._files()
+        self.assertEqual(first, self._upload(make_image((500, 500))))
+        self.assertEqual(files, self._files())
+
+    def test_previous_image_is_kept(self):
+        # other profiles may share it, gcmedia deletes it once unreferenced
+        previous = self._upload(make_image((500, 500)))
+        image_url = self._upload(make_image((500, 500), color=(0, 0, 255)))
+        self.assertNotEqual(previous, image_url)
+        files = self._files()
+        self.assertEqual(13, len(files))
+        self.assertIn(previous.split("/")[-1], files)
+
+    def test_undecodable_image_keeps_the_previous_one(self):
+        previous = self._upload(make_image((500, 500)))
+        upload_path = default_storage.save(
+            "profile/uploads/broken.jpg", ContentFile(b"not an image")
+        )
+        Profile.objects.filter(pk=self.profile.id).update(image=PROCESSING_AVATAR)
+        ProfileImageUpload.objects.create(
+            profile_id=self.profile.id, path=upload_path, previous_image=previous
+        )
+        process_profile_image(self.profile.id, upload_path)
+        self.assertEqual(previous, Profile.objects.get(pk=self.profile.id).image)
+        self.assertFalse(default_storage.exists(upload_path))
+        self.assertIn(previous.split("/")[-1], self._files())
+
+    def test_newer_upload_wins(self):
+        first = self._upload(make_image((500, 500)), process=False)
+        second = self._upload(make_image((500, 500), color=(0, 0, 255)), process=False)
+        # the job of the first upload runs while the second one is pending
+        for callback in first + second:
+            callback()
+        image_url = Profile.objects.get(pk=self.profile.id).image
+        self.assertEqual(
+            image_url, self._upload(make_image((500, 500), color=(0, 0, 255)))
+        )
+        self.assertEqual(
+            [], os.listdir(os.path.join(self.media_root, "profile", "uploads"))
+        )
+
+    def test_lost_upload_processed_by_the_command(self):
+        previous = self._upload(make_image((500, 500)))
+        self._upload(make_image((500, 500), color=(0, 0, 255)), process=False)
+        upload = ProfileImageUpload.objects.get()
+        self.assertEqual(previous, upload.previous_image)
+
+        out = StringIO()
+        call_command("processprofileimages", stdout=out)
+        # may still be queued in a worker
+        self.assertIn("0 upload(s) processed", out.getvalue())
+        ProfileImageUpload.objects.update(
+            uploaded_at=timezone.now() - timedelta(hours=1)
+        )
+        call_command("processprofileimages", stdout=out)
+        self.assertIn("1 upload(s) processed", out.getvalue())
+        image_url = Profile.objects.get(pk=self.profile.id).image
+        self.assertNotIn(image_url, [previous, PROCESSING_AVATAR])
+        self.assertFalse(ProfileImageUpload.objects.exists())
+        self.assertFalse(default_storage.exists(upload.path))
+
+    def test_stuck_profile_reset_by_the_command(self):
+        Profile.objects.filter(pk=self.profile.id).update(image=PROCESSING_AVATAR)
+        out = StringIO()
+        call_command("processprofileimages", stdout=out)
+        self.assertIn("1 profile(s) reset", out.getvalue())
+        self.assertIsNone(Profile.objects.get(pk=self.profile.id).image)
+
+
+class RenderSquareVariantsTestCase(TestCase):
+    def test_center_crop(self):
+        # red square in the middle of a wide white image
+        img = Image.new("RGB", (900, 300), (255, 255, 255))
+        img.paste((255, 0, 0), (300, 0, 600, 300))
+        buffer = BytesIO()
+        img.save(buffer, "PNG")
+        buffer.seek(0)
+        sizes = []
+        for size, variant in render_square_variants(buffer, [100, 50]):
+            sizes.append(variant.size)
+            r, g, b = variant.getpixel((0, 0))
+            self.assertTrue(r > 200 and g < 60 and b < 60, (r, g, b))
+        self.assertEqual([(100, 100), (50, 50)], sizes)
+
+    def test_transparent_background_is_white(self):
+        buffer = make_image((100, 100), "PNG", "RGBA", (0, 0, 0, 0))
+        _, variant = next(render_square_variants(buffer, [40, 20]))
+        self.assertEqual("RGB", variant.mode)
+        self.assertEqual((255, 255, 255), variant.getpixel((20, 20)))
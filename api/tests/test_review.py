@@ -0,0 +1,188 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.models import Movie, MovieList, MovieRateReview, User
+from .base import reverse, APITestCaseMixin, LoggedInMixin
+
+
+class AudienceRatingTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "movie"]
+
+    def _add_rating(self, rating, username):
+        author = User.objects.create(username=username, email=f"{username}@a.com")
+        MovieRateReview.objects.create(movie_id=1, author=author, rating=rating)
+        Movie.objects.get(pk=1).update_audience_rating(new_rating=rating)
+
+    def _rate(self, rating):
+        res = self.client.post(
+            reverse("api:review-list"), {"movie_id": 1, "rating": rating}
+        )
+        self.assertEqual(201, res.status_code, res.content)
+        return res.json()
+
+    def test_rating_added(self):
+        self._add_rating(6, "user2")
+        self._rate(8)
+        movie = Movie.objects.get(pk=1)
+        self.assertEqual(14, movie.rating_sum)
+        self.assertEqual(2, movie.rating_count)
+        self.assertEqual(7, movie.audience_rating)
+
+    def test_review_without_rating(self):
+        self._add_rating(6, "user2")
+        res = self.client.post(
+            reverse("api:review-list"), {"movie_id": 1, "content": "Good one"}
+        )
+        self.assertEqual(201, res.status_code, res.content)
+        movie = Movie.objects.get(pk=1)
+        self.assertEqual(1, movie.rating_count)
+        self.assertEqual(6, movie.audience_rating)
+
+    def test_rating_changed(self):
+        self._add_rating(6, "user2")
+        review = self._rate(8)
+        res = self.client.patch(
+            reverse("api:review-detail", args=["v1", review["id"]]), {"rating": 4}
+        )
+        self.assertEqual(200, res.status_code, res.content)
+        movie = Movie.objects.get(pk=1)
+        self.assertEqual(10, movie.rating_sum)
+        self.assertEqual(2, movie.rating_count)
+        self.assertEqual(5, movie.audience_rating)
+
+    def test_rating_removed(self):
+        movie = Movie.objects.get(pk=1)
+        movie.update_audience_rating(new_rating=8)
+        movie.update_audience_rating(old_rating=8)
+        self.assertEqual(0, movie.rating_count)
+        self.assertIsNone(movie.audience_rating)
+
+    def test_reconcile_ratings(self):
+        self._add_rating(6, "user2")
+        self._add_rating(9, "user3")
+        Movie.objects.filter(pk=1).update(
+            rating_sum=100, rating_count=1, audience_rating=100
+        )
+
+        out = StringIO()
+        call_command("reconcileratings", "--dry-run", stdout=out)
+        self.assertIn("1 movie(s) have drifted", out.getvalue())
+        self.assertEqual(1, Movie.objects.get(pk=1).rating_count)
+
+        call_command("reconcileratings", stdout=StringIO())
+        movie = Movie.objects.get(pk=1)
+        self.assertEqual(15, movie.rating_sum)
+        self.assertEqual(2, movie.rating_count)
+        self.assertEqual(7.5, movie.audience_rating)
+
+        out = StringIO()
+        call_command("reconcileratings", stdout=out)
+        self.assertIn("0 movie(s) have drifted", out.getvalue())
+
+
+class LikeCountTestCase(APITestCaseMixin, LoggedInMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "movie"]
+
+    def setUp(self):
+        super().setUp()
+        self.fans = [
+            User.objects.create(username=f"fan{i}", email=f"fan{i}@a.com")
+            for i in range(3)
+        ]
+        self.review = MovieRateReview.objects.create(
+            movie_id=1, author=self.fans[0], content="Good one"
+        )
+        self.liked_review = MovieRateReview.objects.create(
+            movie_id=1, author=self.fans[1], content="Good one"
+        )
+        self.movie_list = MovieList.objects.create(name="Mine", owner_id=1)
+
+    def _like_count(self, obj):
+        obj.refresh_from_db(fields=["like_count"])
+        return obj.like_count
+
+    def test_review_likes(self):
+        self.liked_review.liked_by.add(*self.fans)
+        self.assertEqual(3, self._like_count(self.liked_review))
+        # adding again or removing users who never liked it changes nothing
+        self.liked_review.liked_by.add(self.fans[0])
+        self.review.liked_by.remove(self.fans[0])
+        self.assertEqual(3, self._like_count(self.liked_review))
+        self.assertEqual(0, self._like_count(self.review))
+
+        self.fans[0].liked_reviews.add(self.review)
+        self.assertEqual(1, self._like_count(self.review))
+        self.fans[0].liked_reviews.clear()
+        self.assertEqual(0, self._like_count(self.review))
+        self.assertEqual(2, self._like_count(self.liked_review))
+        self.liked_review.liked_by.clear()
+        self.assertEqual(0, self._like_count(self.liked_review))
+
+    def test_review_like_api(self):
+        url = reverse("api:reviewlike-detail", args=["v1", self.review.id])
+        self.assertEqual(200, self.client.put(url).status_code)
+        self.assertEqual(1, self._like_count(self.review))
+        self.assertEqual(200, self.client.delete(url).status_code)
+        self.assertEqual(0, self._like_count(self.review))
+
+    def test_reviews_ordered_by_likes(self):
+        self.liked_review.liked_by.add(self.fans[0])
+        res = self.client.get(reverse("api:review-list"), {"movie__id": 1})
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(
+            [self.liked_review.id, self.review.id],
+            [review["id"] for review in res.json()["results"]],
+        )
+
+    def test_list_counts(self):
+        self.movie_list.liked_by.add(*self.fans)
+        self.movie_list.movies.add(1)
+        Movie.objects.get(pk=1).in_lists.add(
+            MovieList.objects.create(name="Theirs", owner=self.fans[0])
+        )
+        self.movie_list.liked_by.remove(self.fans[0])
+        self.movie_list.refresh_from_db()
+        self.assertEqual(2, self.movie_list.like_count)
+        self.assertEqual(1, self.movie_list.movie_count)
+        self.assertEqual(1, MovieList.objects.get(name="Theirs").movie_count)
+
+    def test_lists_ordered_by_counts(self):
+        self.movie_list.liked_by.add(*self.fans)
+        bigger = MovieList.objects.create(name="Theirs", owner=self.fans[0])
+        bigger.movies.add(*Movie.objects.all())
+        url = reverse("api:movielist-list")
+        for ordering, expected in [
+            ("-movies", [bigger.id, self.movie_list.id]),
+            ("movies", [self.movie_list.id, bigger.id]),
+            ("-likes", [self.movie_list.id, bigger.id]),
+        ]:
+            res = self.client.get(url, {"ordering": ordering})
+            self.assertEqual(200, res.status_code)
+            self.assertEqual(
+                expected, [movie_list["id"] for movie_list in res.json()["results"]]
+            )
+
+    def test_reconcile_counters(self):
+        self.liked_review.liked_by.add(*self.fans)
+        self.movie_list.movies.add(1)
+        MovieRateReview.objects.filter(pk=self.liked_review.id).update(like_count=7)
+        MovieList.objects.filter(pk=self.movie_list.id).update(movie_count=0)
+
+        out = StringIO()
+        call_command("reconcilecounters", "--dry-run", stdout=out)
+        self.assertIn(
+            "MovieRateReview.like_count: 1 row(s) have drifted", out.getvalue()
+        )
+        self.assertIn("MovieList.movie_count: 1 row(s) have drifted", out.getvalue())
+        self.assertEqual(7, self._like_count(self.liked_review))
+
+        call_command("reconcilecounters", stdout=StringIO())
+        self.assertEqual(3, self._like_count(self.liked_review))
+        self.movie_list.refresh_from_db()
+        self.assertEqual(1, self.movie_list.movie_count)
+
+        out = StringIO()
+        call_command("reconcilecounters", stdout=out)
+        self.assertEqual(3, out.getvalue().count("0 row(s) have drifted"))
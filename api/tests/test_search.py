@@ -0,0 +1,155 @@
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlparse
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase
+
+from api.models import (
+    CrewMember,
+    Genre,
+    Movie,
+    MovieSearchDocument,
+    ProfileSearchDocument,
+    User,
+)
+from api.search import search
+from .base import reverse, capture_on_commit, APITestCaseMixin
+
+
+class SearchTestCase(APITestCaseMixin, TestCase):
+    fixtures = [
+        "user",
+        "profile",
+        "genre",
+        "lang",
+        "role",
+        "order",
+        "movie",
+        "crewmember",
+    ]
+
+    def setUp(self):
+        super().setUp()
+        # the fixtures are loaded without the signals
+        call_command("rebuildsearch", stdout=StringIO())
+        with capture_on_commit(execute=True):
+            self.good_night = self._copy_movie("Good Night", about="")
+            self.night_shift = self._copy_movie("Night Shift", about="Goodbye")
+
+    def _copy_movie(self, title, **fields):
+        movie = Movie.objects.get(pk=1)
+        genres = list(movie.genres.all())
+        movie.pk = None
+        movie.title = title
+        movie.link = f"http://movie.com/{title}"
+        for name, value in fields.items():
+            setattr(movie, name, value)
+        movie.save()
+        movie.genres.set(genres)
+        return movie
+
+    def _search(self, query, name="movie", **params):
+        res = self.client.get(reverse(f"api:{name}-list"), {"search": query, **params})
+        self.assertEqual(200, res.status_code, res.content)
+        return [row["id"] for row in res.json()["results"]]
+
+    def test_title_ranks_first(self):
+        # "good" in the title of one and in the about of the others
+        ids = self._search("good")
+        self.assertEqual(self.good_night.id, ids[0])
+        self.assertCountEqual([1, self.night_shift.id], ids[1:])
+
+    def test_prefixes_of_all_terms(self):
+        self.assertEqual(
+            [self.good_night.id, self.night_shift.id], self._search("goo NIG")
+        )
+        self.assertEqual([], self._search("good nights"))
+
+    def test_crew_genres_and_language(self):
+        movie = Movie.objects.get(pk=1)
+        with capture_on_commit(execute=True):
+            # a second role does not duplicate the movie
+            CrewMember.objects.create(movie=movie, profile_id=1, role_id=2)
+        self.assertEqual([1], self._search("test user"))
+        self.assertEqual(3, len(self._search("drama english")))
+
+    def test_documents_follow_the_writes(self):
+        with capture_on_commit(execute=True):
+            user = User.objects.get(pk=1)
+            user.first_name = "Christopher"
+            user.save()
+        self.assertEqual([1], self._search("chris"))
+        self.assertEqual([1], self._search("chris", name="profile"))
+
+        with capture_on_commit(execute=True):
+            self.good_night.title = "Sunrise"
+            self.good_night.save()
+            self.good_night.genres.add(Genre.objects.create(name="thriller"))
+            CrewMember.objects.filter(movie_id=1).delete()
+        self.assertEqual([self.good_night.id], self._search("sunrise thriller"))
+        self.assertEqual([], self._search("chris"))
+
+    def test_one_rebuild_per_transaction(self):
+        rebuild = MovieSearchDocument.objects.rebuild
+        with mock.patch.object(
+            MovieSearchDocument.objects, "rebuild", wraps=rebuild
+        ) as mock_rebuild:
+            with capture_on_commit(execute=True):
+                self.good_night.title = "Sunrise"
+                self.good_night.save()
+                self.good_night.genres.clear()
+                CrewMember.objects.create(
+                    movie=self.good_night, profile_id=1, role_id=2
+                )
+        mock_rebuild.assert_called_once_with({self.good_night.id})
+
+    def test_rolled_back_savepoint(self):
+        with capture_on_commit(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.night_shift.title = "Sunset"
+                self.night_shift.save()
+                raise ValueError
+            self.good_night.title = "Sunrise"
+            self.good_night.save()
+        self.assertEqual([self.good_night.id], self._search("sunrise"))
+        self.assertEqual([], self._search("sunset"))
+        self.assertEqual([self.night_shift.id], self._search("shift"))
+
+    def test_keyset_pages(self):
+        expected = self._search("good")
+        url = reverse("api:movie-list")
+        page = self.client.get(url, {"search": "good", "cursor": "", "limit": 1}).json()
+        ids = [row["id"] for row in page["results"]]
+        while page["next"]:
+            next_url = urlparse(page["next"])
+            page = self.client.get(f"{next_url.path}?{next_url.query}").json()
+            ids += [row["id"] for row in page["results"]]
+        self.assertEqual(expected, ids)
+
+    def test_requested_ordering(self):
+        Movie.objects.filter(pk=self.night_shift.pk).update(recommend_count=5)
+        self.assertEqual(
+            self.night_shift.id,
+            self._search("good", ordering="-recommend_count")[0],
+        )
+
+    def test_rebuild_command(self):
+        MovieSearchDocument.objects.all().delete()
+        ProfileSearchDocument.objects.all().delete()
+        self.assertEqual([], self._search("good"))
+        out = StringIO()
+        call_command("rebuildsearch", "--batch-size", "2", stdout=out)
+        self.assertIn("MovieSearchDocument: 3 document(s) rebuilt", out.getvalue())
+        # the count of the first search is cached
+        cache.clear()
+        self.assertEqual(3, len(self._search("good")))
+
+    def test_without_full_text_index(self):
+        # the documents are scanned on the other databases
+        with mock.patch.object(connection, "vendor", "postgresql"):
+            movies = list(search(Movie.objects.order_by("id"), "goo nig"))
+        # any substring of the words
+        self.assertEqual([self.good_night, self.night_shift], movies)
@@ -0,0 +1,156 @@
+import os
+import time
+from hashlib import sha256
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+
+from api.constants import PROCESSING_AVATAR
+from api.images import process_movie_poster
+from api.models import (
+    LeaderboardEntry,
+    LeaderboardSnapshot,
+    Movie,
+    Profile,
+    ProfileImageUpload,
+)
+from api.storage import IMMUTABLE_CACHE_CONTROL, content_storage, is_immutable
+from api.views.media import serve_media
+from .base import APITestCaseMixin, LoggedInMixin
+from .test_posters import TempMediaMixin, make_poster
+from .test_submission import MovieSubmitTestMixin
+
+
+class ContentAddressedStorageTestCase(TempMediaMixin, APITestCaseMixin, TestCase):
+    def test_same_content_stored_once(self):
+        name = content_storage.save("posters", ContentFile(b"poster"), "JPG")
+        self.assertEqual(f"posters/{sha256(b'poster').hexdigest()}.jpg", name)
+        self.assertEqual(
+            name, content_storage.save("posters", ContentFile(b"poster"), "jpg")
+        )
+        self.assertEqual(
+            [os.path.basename(name)],
+            os.listdir(os.path.join(self.media_root, "posters")),
+        )
+
+    def test_is_immutable(self):
+        digest = sha256(b"image").hexdigest()
+        for name in [
+            f"posters/{digest}.png",
+            f"profile/150_{digest}.webp",
+            "posters/variants/0123456789abcdef-320.jpg",
+        ]:
+            self.assertTrue(is_immutable(name), name)
+        for name in [
+            "posters/0000000001.png",
+            "profile/150_6f1d7a0c-5a8e-4c1b-9a35-0d4b8f2e9c11.jpg",
+            "default_avatar_m.png",
+        ]:
+            self.assertFalse(is_immutable(name), name)
+
+    def test_serve_media_cache_control(self):
+        name = content_storage.save("posters", ContentFile(b"poster"), "jpg")
+        legacy = default_storage.save("posters/0000000001.jpg", ContentFile(b"old"))
+        request = RequestFactory().get(f"/media/{name}")
+        res = serve_media(request, name, document_root=self.media_root)
+        self.assertEqual(IMMUTABLE_CACHE_CONTROL, res["Cache-Control"])
+        res = serve_media(request, legacy, document_root=self.media_root)
+        self.assertNotIn("Cache-Control", res)
+
+
+class SubmissionStorageTestCase(
+    TempMediaMixin, MovieSubmitTestMixin, APITestCaseMixin, LoggedInMixin, TestCase
+):
+    fixtures = ["test_submission.yaml"]
+    roles = [dict(name="Director")]
+
+    def test_same_poster_stored_once(self):
+        first = self._submit_movie().json()["poster"]
+        self.assertRegex(first, r"^/media/posters/[0-9a-f]{64}\.png$")
+        # submitted again as another film
+        Movie.objects.update(link="http://example.com")
+        self.assertEqual(first, self._submit_movie().json()["poster"])
+        self.assertEqual(1, len(os.listdir(os.path.join(self.media_root, "posters"))))
+
+
+class GcMediaTestCase(TempMediaMixin, APITestCaseMixin, TestCase):
+    fixtures = ["user", "profile", "genre", "lang", "role", "order", "movie"]
+
+    def _save(self, name, content=b"content"):
+        return default_storage.save(name, ContentFile(content))
+
+    def _age(self, hours=48):
+        past = time.time() - hours * 3600
+        for directory, _, files in os.walk(self.media_root):
+            for name in files:
+                os.utime(os.path.join(directory, name), (past, past))
+
+    def _stored(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, files in os.walk(self.media_root)
+            for name in files
+        )
+
+    def test_unreferenced_files_deleted(self):
+        poster = content_storage.save(
+            "posters", ContentFile(make_poster((700, 1000)).getvalue()), "jpg"
+        )
+        Movie.objects.filter(pk=1).update(poster=content_storage.url(poster))
+        process_movie_poster(1)
+        orphan_poster = self._save("posters/0000000002.jpg")
+        profile_image = self._save("profile/abc.jpg")
+        thumbnail = self._save("profile/80_abc.jpg")
+        Profile.objects.filter(pk=1).update(image=default_storage.url(profile_image))
+        snapshot_image = self._save("profile/def.jpg")
+        LeaderboardEntry.objects.create(
+            snapshot=LeaderboardSnapshot.objects.create(),
+            rank=1,
+            profile_id=1,
+            user_id=1,
+            email="user@example.com",
+            name="User",
+            image=default_storage.url(snapshot_image),
+        )
+        orphan_images = [
+            self._save("profile/ghi.jpg"),
+            self._save("profile/80_ghi.jpg"),
+        ]
+        stale_upload = self._save("profile/uploads/jkl.jpg")
+        self._age()
+        recent = self._save("profile/uploads/mno.jpg")
+        stored = self._stored()
+
+        out = StringIO()
+        call_command("gcmedia", "--dry-run", stdout=out)
+        self.assertIn("4 unreferenced file(s)", out.getvalue())
+        self.assertEqual(stored, self._stored())
+
+        call_command("gcmedia", stdout=out)
+        self.assertIn("4 file(s) deleted", out.getvalue())
+        deleted = [orphan_poster, stale_upload] + orphan_images
+        self.assertEqual(sorted(set(stored) - set(deleted)), self._stored())
+        for path in [poster, profile_image, thumbnail, snapshot_image, recent]:
+            self.assertTrue(default_storage.exists(path), path)
+        self.assertEqual(
+            6, len(os.listdir(os.path.join(self.media_root, "posters", "variants")))
+        )
+
+    def test_pending_profile_image_kept(self):
+        upload = self._save("profile/uploads/abc.jpg")
+        previous_image = self._save("profile/def.jpg")
+        Profile.objects.filter(pk=1).update(image=PROCESSING_AVATAR)
+        ProfileImageUpload.objects.create(
+            profile_id=1,
+            path=upload,
+            previous_image=default_storage.url(previous_image),
+        )
+        self._age()
+
+        out = StringIO()
+        call_command("gcmedia", stdout=out)
+        self.assertIn("0 file(s) deleted", out.getvalue())
+        self.assertEqual(sorted([upload, previous_image]), self._stored())
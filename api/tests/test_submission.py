@@ -7,6 +7,7 @@ from django.test import TestCase
 from django.core import mail
 
 from api.models import CrewMember, Movie, Genre, MovieLanguage, User, Package
+from api.serializers.movie import MovieSerializer
 from .base import reverse, APITestCaseMixin, LoggedInMixin
 
 
@@ -14,6 +15,7 @@ class MovieSubmitTestMixin:
     genres = [dict(name="Drama")]
     lang = dict(name="English")
     runtime = 12
+    about = "synopsis here"
     director = None
 
     def _submit_movie(self, check_success=True):
@@ -28,6 +30,7 @@ class MovieSubmitTestMixin:
                 runtime=self.runtime,
                 roles=self.roles,
                 genres=self.genres,
+                about=self.about,
             )
         )
         if self.director:
@@ -44,6 +47,7 @@ class MovieSubmitTestMixin:
 class BasicMovieTestMixin(MovieSubmitTestMixin):
     def test_no_emails_sent(self):
         self._submit_movie()
+        self.send_queued_emails()
         self.assertEqual(0, len(mail.outbox))
 
     def test_poster_saved(self):
@@ -87,6 +91,10 @@ class BasicMovieTestMixin(MovieSubmitTestMixin):
         movie = Movie.objects.get(pk=movie_id)
         self.assertEquals(movie.runtime, self.runtime)
 
+    def test_about(self):
+        res = self._submit_movie()
+        self.assertEqual(self.about, Movie.objects.get(pk=res.json()["id"]).about)
+
 
 class SubmissionByDirectorTestCase(
     LoggedInMixin, APITestCaseMixin, TestCase, BasicMovieTestMixin
@@ -100,6 +108,16 @@ class SubmissionByDirectorTestCase(
         movie = Movie.objects.get(pk=movie_id)
         self.assertTrue(movie.approved)
 
+    def test_payload_validated_once(self):
+        with mock.patch.object(
+            MovieSerializer,
+            "validate_title",
+            autospec=True,
+            side_effect=MovieSerializer.validate_title,
+        ) as validate_title:
+            self._submit_movie()
+        self.assertEqual(1, validate_title.call_count)
+
     def test_roles_added(self):
         res = self._submit_movie()
         movie_id = res.json()["id"]
@@ -130,6 +148,12 @@ class SubmissionUnregisteredDirectorTestCase(
         self._submit_movie()
         self.assertEquals(User.objects.count(), users_count + 1)
 
+    def test_director_profile_cached(self):
+        res = self._submit_movie()
+        movie = Movie.objects.get(id=res.json()["id"])
+        crewmember = CrewMember.objects.get(movie=movie, role__name="Director")
+        self.assertEquals(crewmember.profile, movie.director_profile)
+
     def test_director_not_onboarded(self):
         res = self._submit_movie()
         movie_id = res.json()["id"]
@@ -16,12 +16,15 @@ from api.serializers.movie import (
     TopCuratorSerializer,
 )
 from api.models import Contest, TopCurator, TopCreator
-from .utils import paginated_response
+from api.cache import cache_response
+from api.pagination import KeysetPagination
+from .utils import EagerLoadingMixin, paginated_response
 
 logger = getLogger(__name__)
 
 
-class ContestView(viewsets.GenericViewSet, mixins.ListModelMixin):
+class ContestView(EagerLoadingMixin, viewsets.GenericViewSet, mixins.ListModelMixin):
+    pagination_class = KeysetPagination
     ordering_fields = ["start"]
     filterset_fields = ["type__name"]
 
@@ -49,11 +52,17 @@ class ContestView(viewsets.GenericViewSet, mixins.ListModelMixin):
             "movies": MovieSerializerSummary,
         }.get(self.action, ContestSerializer)
 
+    # the recommended movies of the requestor are part of the contests
+    @cache_response("contest", anonymous_only=True)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(
         methods=["get"],
         detail=True,
         url_path="top-creators",
     )
+    @cache_response("contest", "top_creators:{pk}")
     def top_creators(self, request, pk=None, **kwargs):
         contest = self.get_object()
         top_creators = contest.top_creators.order_by("pos").all()
@@ -64,6 +73,7 @@ class ContestView(viewsets.GenericViewSet, mixins.ListModelMixin):
         detail=True,
         url_path="top-curators",
     )
+    @cache_response("contest", "top_curators:{pk}")
     def top_curators(self, request, pk=None, **kwargs):
         contest = self.get_object()
         top_curators = contest.top_curators.order_by("pos").all()
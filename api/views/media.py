@@ -0,0 +1,12 @@
+from django.views.static import serve
+
+from api.storage import IMMUTABLE_CACHE_CONTROL, is_immutable
+
+
+def serve_media(request, path, document_root=None):
+    """`django.views.static.serve`, the files named after their content are
+    cached forever"""
+    response = serve(request, path, document_root=document_root)
+    if is_immutable(path):
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -2,17 +2,16 @@ from datetime import timedelta, datetime
 from logging import getLogger
 
 from django.utils.timezone import make_aware
-from django.db.models import Count
+from django.db.models import F
 from django.db import transaction
 
 
 import django_filters as filters
-from rest_framework.filters import SearchFilter
 from rest_framework import mixins, parsers, viewsets, response, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from api.models.movie import CrewMember, MpGenre
+from api.models.movie import MpGenre
 from api.constants import MOVIE_STATE, RECOMMENDATION
 from api.serializers.movie import (
     SubmissionSerializer,
@@ -33,12 +32,15 @@ from api.models import (
     Genre,
     MovieRateReview,
     MovieList,
+    CrewMember,
     CrewMemberRequest,
-    Role,
     Contest,
     Profile,
 )
-from .utils import paginated_response
+from api.cache import cache_response
+from api.parsers import StreamingMultiPartParser
+from api.pagination import KeysetPagination
+from .utils import EagerLoadingMixin, paginated_response
 
 logger = getLogger(__name__)
 
@@ -54,7 +56,8 @@ class SubmissionView(
     mixins.UpdateModelMixin,
     viewsets.GenericViewSet,
 ):
-    parser_classes = (parsers.MultiPartParser, parsers.FormParser)
+    # the poster is spooled to disk and hashed while the body is read
+    parser_classes = (StreamingMultiPartParser, parsers.FormParser)
     queryset = Movie.objects.all()
     serializer_class = SubmissionSerializer
     permission_classes = [IsMovieOrderOwner]
@@ -73,22 +76,19 @@ class SubmissionView(
 
 
 class MovieView(
+    EagerLoadingMixin,
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet,
 ):
+    pagination_class = KeysetPagination
     ordering_fields = ["publish_on", "recommend_count"]
     ordering = ["-publish_on", "-recommend_count", "title"]
     filterset_fields = {
         "genres__name": ["iexact", "in"],
         "lang__name": ["iexact", "in"],
     }
-    search_fields = [
-        "title",
-        "crew__user__first_name",
-        "crew__user__last_name",
-    ]
 
     def get_queryset(self):
         base_qs = Movie.objects.filter(state=MOVIE_STATE.PUBLISHED)
@@ -103,9 +103,10 @@ class MovieView(
                 return Movie.objects.none()
         if self.action == "partial_update":
             return Movie.objects.filter(
-                crewmember__role__name="Director",
-                crewmember__profile=self.request.user.profile,
-            ).distinct()
+                id__in=CrewMember.objects.directed_by(self.request.user.profile)
+            )
+        if self.action == "retrieve":
+            return MovieSerializer.setup_eager_loading(base_qs)
         return base_qs
 
     def get_serializer_class(self):
@@ -117,12 +118,15 @@ class MovieView(
         return dict(request=self.request)
 
     @action(methods=["get"], detail=False)
+    @cache_response("new_releases")
     def new_releases(self, request, pk=None, **kwargs):
         """All movies released on same day - need not be today any n-1 day"""
         return paginated_response(self, self.get_queryset())
 
 
-class MoviesByView(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+class MoviesByView(
+    EagerLoadingMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+):
     """All Movie of a director"""
 
     queryset = Profile.objects
@@ -131,11 +135,8 @@ class MoviesByView(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
 
     def retrieve(self, request, *args, **kwargs):
         profile = self.get_object()
-        director_membership = CrewMember.objects.filter(
-            profile=profile, role__name="Director"
-        ).all()
         movies_queryset = Movie.objects.filter(
-            id__in=[dm.movie_id for dm in director_membership],
+            id__in=CrewMember.objects.directed_by(profile),
             state=MOVIE_STATE.PUBLISHED,
         )
         queryset = self.filter_queryset(movies_queryset)
@@ -158,11 +159,19 @@ class MovieLanguageView(viewsets.GenericViewSet, mixins.ListModelMixin):
     queryset = MovieLanguage.objects.all()
     serializer_class = MovieLanguageSerializer
 
+    @cache_response("lang")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class GenreView(viewsets.GenericViewSet, mixins.ListModelMixin):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
 
+    @cache_response("genre")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class IsMovieRateReviewOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, object: MovieRateReview):
@@ -173,12 +182,14 @@ class IsMovieRateReviewOwner(permissions.BasePermission):
 
 
 class MovieReviewView(
+    EagerLoadingMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.UpdateModelMixin,
     mixins.CreateModelMixin,
 ):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsMovieRateReviewOwner]
+    pagination_class = KeysetPagination
     serializer_class = MovieReviewDetailSerializer
     filterset_fields = ["movie__id", "author__id"]
     ordering_fields = ["published_at", "number_of_likes"]
@@ -188,7 +199,8 @@ class MovieReviewView(
     ]
 
     def get_queryset(self):
-        query = MovieRateReview.objects.annotate(number_of_likes=Count("liked_by"))
+        # annotated rather than aliased, keyset pagination reads it off the rows
+        query = MovieRateReview.objects.annotate(number_of_likes=F("like_count"))
         if self.request.method in permissions.SAFE_METHODS:
             return query.exclude(content__isnull=True).exclude(content__exact="")
         else:
@@ -207,14 +219,12 @@ class MovieReviewLikeView(
         user = request.user
         instance = self.get_object()
         instance.liked_by.add(user)
-        instance.save()
         return response.Response(dict(success=True))
 
     def destroy(self, request, *args, **kwargs):
         user = request.user
         instance = self.get_object()
         instance.liked_by.remove(user)
-        instance.save()
         return response.Response(dict(success=True))
 
 
@@ -228,14 +238,12 @@ class MovieWatchlistView(
         user = request.user
         movie = self.get_object()
         user.profile.watchlist.add(movie)
-        user.profile.save()
         return response.Response(dict(success=True))
 
     def destroy(self, request, *args, **kwargs):
         user = request.user
         movie = self.get_object()
         user.profile.watchlist.remove(movie)
-        user.profile.save()
         return response.Response(dict(success=True))
 
 
@@ -265,7 +273,7 @@ class MovieRecommendView(
                 name=movie.contest.name, owner=user, contest=movie.contest, frozen=True
             )
             if (
-                contest_recomm_list.movies.count()
+                contest_recomm_list.movie_count
                 >= contest_recomm_list.contest.max_recommends
             ):
                 return response.Response(
@@ -274,9 +282,7 @@ class MovieRecommendView(
                         message=f"Cannot recommend more that {contest_recomm_list.contest.max_recommends} movies from {contest_recomm_list.contest.name}",
                     )
                 )
-            else:
-                contest_recomm_list.movies.add(movie)
-                contest_recomm_list.save()
+            elif contest_recomm_list.add_movie(movie):
                 logger.debug("Added to contest list")
 
     def _remove_from_contest_recommend(self, movie, user):
@@ -285,9 +291,7 @@ class MovieRecommendView(
             contest_recomm_list = MovieList.objects.filter(
                 owner=user, contest=movie.contest
             ).first()
-            if contest_recomm_list and movie in contest_recomm_list.movies.all():
-                contest_recomm_list.movies.remove(movie)
-                contest_recomm_list.save()
+            if contest_recomm_list and contest_recomm_list.remove_movie(movie):
                 logger.debug("Removed from contest list")
 
     def update(self, request, *args, **kwargs):
@@ -297,13 +301,11 @@ class MovieRecommendView(
             owner=user, name=RECOMMENDATION
         )
         logger.debug(f"{recommendation_list}")
-        if movie in recommendation_list.movies.all():
-            return response.Response(dict(success=False))
-        self._add_to_contest_recommend(movie, user)
-        recommendation_list.movies.add(movie)
-        recommendation_list.save()
-        movie.recommend_count += 1
-        movie.save()
+        with transaction.atomic():
+            if not recommendation_list.add_movie(movie):
+                return response.Response(dict(success=False))
+            self._add_to_contest_recommend(movie, user)
+            movie.update_recommend_count(1)
         return response.Response(dict(success=True))
 
     def destroy(self, request, *args, **kwargs):
@@ -311,14 +313,11 @@ class MovieRecommendView(
         movie = self.get_object()
         recommendation_list = MovieList.objects.get(owner=user, name=RECOMMENDATION)
         if recommendation_list:
-            if movie in recommendation_list.movies.all():
-                recommendation_list.movies.remove(movie)
-                recommendation_list.save()
-                movie.recommend_count -= 1
-                movie.save()
+            with transaction.atomic():
+                if not recommendation_list.remove_movie(movie):
+                    return response.Response(dict(success=False))
+                movie.update_recommend_count(-1)
                 self._remove_from_contest_recommend(movie, user)
-            else:
-                return response.Response(dict(success=False))
         return response.Response(dict(success=True))
 
 
@@ -340,13 +339,12 @@ class MovieListFilter(filters.FilterSet):
         fields = ["contest__isnull", "owner__id", "name"]
 
 
-class MovieListView(viewsets.ModelViewSet):
+class MovieListView(EagerLoadingMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsMovieListOwnerOrLike]
-    queryset = MovieList.objects.annotate(
-        likes=Count("liked_by"), number_of_movies=Count("movies")
-    )
+    queryset = MovieList.objects.all()
     filter_class = MovieListFilter
     ordering_fields = ["movies", "likes"]
+    ordering_aliases = {"movies": "movie_count", "likes": "like_count"}
 
     def get_serializer_class(self):
         if self.action in ("movies", "like"):
@@ -380,13 +378,10 @@ class MovieListView(viewsets.ModelViewSet):
         movie_list = self.get_object()
         if request.method.lower() == "post":
             movie_list.liked_by.add(request.user)
-            movie_list.save()
         else:
             movie_list.liked_by.remove(request.user)
-            movie_list.save()
-        return response.Response(
-            {"success": True, "like_count": movie_list.liked_by.count()}
-        )
+        movie_list.refresh_from_db(fields=["like_count"])
+        return response.Response({"success": True, "like_count": movie_list.like_count})
 
 
 class IsDirectorCreatorOrRequestor(permissions.BasePermission):
@@ -396,17 +391,16 @@ class IsDirectorCreatorOrRequestor(permissions.BasePermission):
             return (
                 object.user == me
                 or object.requestor == me
-                or object.movie.crewmember_set.filter(
-                    role__name="Director", profile__user=me
-                ).exists()
+                or self._is_director(object.movie, me)
             )
+        return self._is_director(object.movie, me)
 
-        director = Role.objects.get(name="Director")
-        return Movie.objects.filter(
-            id=object.movie.id,
-            crewmember__role=director,
-            crewmember__profile=me.profile,
-        ).exists()
+    def _is_director(self, movie, user):
+        return (
+            CrewMember.objects.directors()
+            .filter(movie_id=movie.id, profile__user_id=user.id)
+            .exists()
+        )
 
 
 class CrewMemberRequestView(viewsets.ModelViewSet):
@@ -425,13 +419,18 @@ class CrewMemberRequestView(viewsets.ModelViewSet):
         serializer.save(logged_in_user=self.request.user)
 
 
-class MpGenreView(mixins.ListModelMixin, viewsets.GenericViewSet):
+class MpGenreView(EagerLoadingMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = MpGenre.objects.filter(live=True)
 
     def get_serializer_class(self):
         return {"movies": MovieSerializerSummary}.get(self.action, MpGenreSerializer)
 
+    @cache_response("mpgenre")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(methods=["get"], detail=True)
+    @cache_response("mpgenre", "mpgenre:{pk}")
     def movies(self, request, **kwargs):
         mp_genre = self.get_object()
         movies_qs = mp_genre.movies.order_by(
@@ -2,6 +2,7 @@ from api.models.movie import Movie, TopCreator
 from logging import getLogger
 
 from django.db.models import Count, Q
+from django.utils.functional import cached_property
 from rest_framework import permissions, viewsets, mixins, parsers, response
 from rest_framework.decorators import action
 from api.serializers.movie import (
@@ -17,10 +18,26 @@ from api.serializers.profile import (
     FollowSerializer,
     ProfileSerializer,
     NotificationSerializer,
+    LeaderboardEntrySerializer,
 )
-from api.constants import CREW_MEMBER_REQUEST_STATE, RECOMMENDATION, MOVIE_STATE
-from api.models import Profile, Role, MovieList, CrewMemberRequest
-
+from api.constants import (
+    CREW_MEMBER_REQUEST_STATE,
+    LEADERBOARD,
+    RECOMMENDATION,
+    MOVIE_STATE,
+)
+from api.models import (
+    Profile,
+    Role,
+    MovieList,
+    CrewMember,
+    CrewMemberRequest,
+    LeaderboardSnapshot,
+    LeaderboardEntry,
+)
+from api.cache import cache_response
+from api.pagination import KeysetPagination
+from .utils import EagerLoadingMixin
 
 logger = getLogger(__name__)
 
@@ -51,12 +68,11 @@ class ProfileImageView(mixins.UpdateModelMixin, viewsets.GenericViewSet):
         logger.info("perform_image_update::end")
 
 
-class ProfileView(viewsets.ModelViewSet):
+class ProfileView(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Profile.objects.all()
     permission_classes = [IsCreateSafeOrIsOwner]
     filterset_fields = ["is_celeb"]
     lookup_field = "user__id"
-    search_fields = ["user__first_name", "user__last_name"]
 
     def get_serializer_class(self):
         if self.action in ("filmography", "movie_approvals"):
@@ -82,7 +98,7 @@ class ProfileView(viewsets.ModelViewSet):
         if is_private_view:
             queryset = queryset.filter(
                 Q(state=MOVIE_STATE.PUBLISHED)
-                | (Q(crewmember__role__name="Director") & Q(approved=True))
+                | (Q(id__in=CrewMember.objects.directed_by(profile)) & Q(approved=True))
             )
         else:
             queryset = queryset.filter(state=MOVIE_STATE.PUBLISHED)
@@ -116,9 +132,9 @@ class ProfileView(viewsets.ModelViewSet):
     )
     def movie_approvals(self, pk=None, **kwargs):
         profile = self.get_object()
-        movies = profile.movies.filter(
-            crewmember__role__name="Director", approved__isnull=True
-        ).all()
+        movies = Movie.objects.filter(
+            id__in=CrewMember.objects.directed_by(profile), approved__isnull=True
+        )
         return self._build_paginated_response(movies)
 
     @action(
@@ -129,9 +145,9 @@ class ProfileView(viewsets.ModelViewSet):
     )
     def crew_approvals(self, pk=None, **kwargs):
         profile = self.get_object()
-        my_movies = profile.movies.filter(crewmember__role__name="Director").all()
         crew_requests = CrewMemberRequest.objects.filter(
-            movie__in=my_movies, state=CREW_MEMBER_REQUEST_STATE.SUBMITTED
+            movie_id__in=CrewMember.objects.directed_by(profile),
+            state=CREW_MEMBER_REQUEST_STATE.SUBMITTED,
         ).all()
         return self._build_paginated_response(crew_requests)
 
@@ -176,20 +192,40 @@ class ProfileView(viewsets.ModelViewSet):
         return response.Response(serializer.data)
 
 
-class AudienceLeaderboardView(viewsets.GenericViewSet, mixins.ListModelMixin):
-    queryset = Profile.objects.filter(
-        is_celeb=False, curator_rank__gte=0, onboarded=True
-    )
-    serializer_class = ProfileSerializer
-    ordering = ["curator_rank"]
+class LeaderboardView(viewsets.GenericViewSet, mixins.ListModelMixin):
+    """Serves the latest published snapshot of the board, the ranked profiles
+    themselves until the ranking jobs have published one"""
 
+    pagination_class = KeysetPagination
+    board = None
 
-class FilmmakerLeaderboardView(viewsets.GenericViewSet, mixins.ListModelMixin):
-    queryset = Profile.objects.filter(
-        is_celeb=False, creator_rank__gte=0, onboarded=True
-    )
-    serializer_class = ProfileSerializer
-    ordering = ["creator_rank"]
+    @cached_property
+    def snapshot_id(self):
+        return LeaderboardSnapshot.objects.get_current_id(self.board)
+
+    def get_queryset(self):
+        if self.snapshot_id is None:
+            return LeaderboardSnapshot.objects.get_ranked_profiles(self.board)
+        return LeaderboardEntry.objects.filter(snapshot_id=self.snapshot_id).order_by(
+            "rank"
+        )
+
+    def get_serializer_class(self):
+        if self.snapshot_id is None:
+            return ProfileSerializer
+        return LeaderboardEntrySerializer
+
+    @cache_response("leaderboard")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class AudienceLeaderboardView(LeaderboardView):
+    board = LEADERBOARD.AUDIENCE
+
+
+class FilmmakerLeaderboardView(LeaderboardView):
+    board = LEADERBOARD.FILMMAKER
 
 
 class RoleView(viewsets.ModelViewSet):
@@ -239,7 +275,9 @@ class FollowView(viewsets.GenericViewSet, mixins.UpdateModelMixin):
         serializer.save(user=self.request.user)
 
 
-class MyWatchlistView(viewsets.GenericViewSet, mixins.ListModelMixin):
+class MyWatchlistView(
+    EagerLoadingMixin, viewsets.GenericViewSet, mixins.ListModelMixin
+):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = MovieSerializerSummary
 
@@ -248,7 +286,9 @@ class MyWatchlistView(viewsets.GenericViewSet, mixins.ListModelMixin):
         return user.profile.watchlist.all()
 
 
-class MyRecommendedView(viewsets.GenericViewSet, mixins.ListModelMixin):
+class MyRecommendedView(
+    EagerLoadingMixin, viewsets.GenericViewSet, mixins.ListModelMixin
+):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = MovieSerializerSummary
 
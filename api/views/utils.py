@@ -1,4 +1,42 @@
-from rest_framework import response
+from django.db.models import QuerySet
+from rest_framework import filters, response
+
+
+class EagerLoadingMixin:
+    """Applies `setup_eager_loading` of the serializer class (if defined) to the
+    queryset before it is paginated, so that the related objects consumed by the
+    serializer are fetched in a fixed number of queries for the whole page
+    """
+
+    def eager_load(self, queryset):
+        setup_eager_loading = getattr(
+            self.get_serializer_class(), "setup_eager_loading", None
+        )
+        if setup_eager_loading and isinstance(queryset, QuerySet):
+            queryset = setup_eager_loading(queryset)
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        return super().paginate_queryset(self.eager_load(queryset))
+
+
+class OrderingFilter(filters.OrderingFilter):
+    """Ordering filter which sorts the public ordering keys listed in the
+    `ordering_aliases` of the view (key => field) on the field they name, so
+    that a key keeps its meaning for the clients when the column behind it
+    changes
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        aliases = getattr(view, "ordering_aliases", None)
+        if not ordering or not aliases:
+            return ordering
+        return [
+            ("-" if term.startswith("-") else "")
+            + aliases.get(term.lstrip("-"), term.lstrip("-"))
+            for term in ordering
+        ]
 
 
 def paginated_response(view, queryset):
@@ -3,7 +3,7 @@ from django.core.mail.backends.base import BaseEmailBackend
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from email.utils import parseaddr
-import sendgrid
+import requests
 
 logger = getLogger("api.mail")
 
@@ -12,6 +12,9 @@ class SendgridEmailBackend(BaseEmailBackend):
     # some of the code is borrowed from https://github.com/elbuo8/sendgrid-django,
     # reason to rewrite this is they are not using the newer JSON based sendgrid API
 
+    # most personalizations SendGrid accepts in a single request
+    MAX_PERSONALIZATIONS = 1000
+
     def __init__(self, fail_silently=False, **kwargs):
         super().__init__(fail_silently=fail_silently, **kwargs)
         if "api_key" in kwargs:
@@ -19,62 +22,145 @@ class SendgridEmailBackend(BaseEmailBackend):
         else:
             self.api_key = getattr(settings, "SENDGRID_API_KEY", None)
         if not self.api_key:
-            raise ImproperlyConfigured(
-                """
-                SENDGRID_API_KEY must be declared in settings.py"""
-            )
-        self.sg = sendgrid.SendGridAPIClient(api_key=self.api_key)
+            raise ImproperlyConfigured("""
+                SENDGRID_API_KEY must be declared in settings.py""")
+        self.host = kwargs.get("host") or getattr(
+            settings, "SENDGRID_HOST", "https://api.sendgrid.com"
+        )
+        self.timeout = kwargs.get("timeout") or settings.EMAIL_TIMEOUT or 30
+        # kept alive between the requests while the connection is open
+        self.session = None
         self.dry_run = not getattr(settings, "EMAIL_DISABLED", False)
         logger.info(
             f"sendgrid initialized with key: {bool(self.api_key)} and dry_run: {self.dry_run}"
         )
 
+    def open(self):
+        if self.session is not None:
+            return False
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {self.api_key}"
+        return True
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
     def send_messages(self, emails):
+        """sends the emails sharing the template and sender in a request per
+        MAX_PERSONALIZATIONS of them, the outcome of each email is set on its
+        `sent` and `error` attributes"""
         if not emails:
             return
 
+        new_session = self.open()
         count = 0
-        for email in emails:
-            sg_mail = self._build_sg_mail(email)
-            try:
-                logger.debug(f"sending mail {sg_mail}")
-                if self.dry_run:
-                    logger.debug("mail not sent! it was a dry run")
-                else:
-                    self.sg.client.mail.send.post(request_body=sg_mail)
-                count += 1
-            except Exception as ex:
-                logger.error(
-                    f"Sendgrid error: {getattr(ex, 'body', b'<no-content>').decode()}"
-                )
-                if not self.fail_silently:
-                    raise
+        first_error = None
+        try:
+            for batch in self._group(emails):
+                sent, error = self._send_batch(batch)
+                count += sent
+                first_error = first_error or error
+        finally:
+            if new_session:
+                self.close()
+        if first_error is not None and not self.fail_silently:
+            raise first_error
         return count
 
-    def _build_sg_mail(self, email):
-        personalization = {}
+    def _send_batch(self, batch):
+        """sends the emails of the batch in a single request, returns the number
+        of emails sent and the error if any
+
+        A batch SendGrid rejects (4xx) is split in halves until the rejected
+        emails are on their own, so that they do not fail the others. On the
+        other errors (5xx, network) the whole batch fails and is retried.
+        """
+        sg_mail = self._build_sg_mail(batch)
+        try:
+            logger.debug(f"sending mail {sg_mail}")
+            if self.dry_run:
+                logger.debug("mail not sent! it was a dry run")
+            else:
+                self._post(sg_mail)
+        except Exception as ex:
+            response = getattr(ex, "response", None)
+            if len(batch) > 1 and self._is_rejected(response):
+                logger.warning(f"Sendgrid rejected {len(batch)} emails, splitting")
+                middle = len(batch) // 2
+                sent, error = self._send_batch(batch[:middle])
+                other_sent, other_error = self._send_batch(batch[middle:])
+                return sent + other_sent, error or other_error
+            body = getattr(response, "text", "")
+            logger.error(f"Sendgrid error: {ex} {body or '<no-content>'}")
+            for email in batch:
+                email.sent, email.error = False, f"{ex} {body}".strip()
+            return 0, ex
+        for email in batch:
+            email.sent, email.error = True, None
+        return len(batch), None
+
+    def _is_rejected(self, response):
+        # too many requests is worth retrying as it is
+        status = getattr(response, "status_code", None)
+        return status is not None and 400 <= status < 500 and status != 429
+
+    def _post(self, sg_mail):
+        res = self.session.post(
+            f"{self.host}/v3/mail/send", json=sg_mail, timeout=self.timeout
+        )
+        res.raise_for_status()
+
+    def _group(self, emails):
+        # only the templated emails can share a request, each gets its own
+        # personalization with the recipients and the template data
+        batches = []
+        open_batches = {}
+        for email in emails:
+            template_id = getattr(email, "template_id", None)
+            if template_id is None:
+                batches.append([email])
+                continue
+            key = (email.from_email, template_id, email.subject, tuple(email.reply_to))
+            batch = open_batches.get(key)
+            if batch is None or len(batch) == self.MAX_PERSONALIZATIONS:
+                batch = open_batches[key] = []
+                batches.append(batch)
+            batch.append(email)
+        return batches
+
+    def _build_sg_mail(self, emails):
+        email = emails[0]
         sendgrid_mail = {}
 
         if email.from_email:
             sendgrid_mail["from"] = self._process_email_addr(email.from_email)
         if email.subject:
             sendgrid_mail["subject"] = (email.subject,)
+        if email.reply_to:
+            sendgrid_mail["reply_to"] = self._process_email_addr(email.reply_to)
+        if hasattr(email, "template_id"):
+            sendgrid_mail["template_id"] = email.template_id
+
+        personalizations = [self._build_personalization(email) for email in emails]
+        if any(personalizations):
+            sendgrid_mail["personalizations"] = personalizations
+        return sendgrid_mail
+
+    def _build_personalization(self, email):
+        personalization = {}
         if email.to:
             personalization["to"] = [self._process_email_addr(e) for e in email.to]
         if email.cc:
             personalization["cc"] = [self._process_email_addr(e) for e in email.cc]
         if email.bcc:
             personalization["bcc"] = [self._process_email_addr(e) for e in email.bcc]
-        if email.reply_to:
-            sendgrid_mail["reply_to"] = self._process_email_addr(email.reply_to)
-
-        if hasattr(email, "template_id"):
-            sendgrid_mail["template_id"] = email.template_id
-            if hasattr(email, "template_data"):
-                personalization["dynamic_template_data"] = dict(email.template_data)
-        if personalization:
-            sendgrid_mail["personalizations"] = [personalization]
-        return sendgrid_mail
+        if hasattr(email, "template_id") and hasattr(email, "template_data"):
+            personalization["dynamic_template_data"] = dict(email.template_data)
+        if getattr(email, "custom_args", None):
+            personalization["custom_args"] = dict(email.custom_args)
+        return personalization
 
     def _process_email_addr(self, email_addr):
         from_name, from_email = parseaddr(email_addr)
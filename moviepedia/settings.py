@@ -20,6 +20,12 @@ PRODUCTION = os.getenv("PRODUCTION") == "true"
 
 LOG_PATH = os.getenv("LOG_PATH", "api.moviepediafilms.log")
 LOG_PATH_JOB = os.getenv("LOG_PATH_JOB", "jobs.moviepediafilms.log")
+# progress of the last runrankings run, used to resume failed runs, next to the
+# job logs by default
+RANKINGS_STATE_PATH = os.getenv(
+    "RANKINGS_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(LOG_PATH_JOB)), "rankings.state.json"),
+)
 handlers = ["console", "file"] if DEBUG else ["file"]
 
 LOGGING = {
@@ -187,10 +193,17 @@ STATIC_ROOT = "static"
 MEDIA_ROOT = os.getenv("MEDIA_ROOT", os.path.join(BASE_DIR, "media"))
 
 MEDIA_POSTERS = "posters"
+# widths of the resized copies of the posters, narrower posters are not upscaled
+POSTER_WIDTHS = [640, 320, 160]
 
 MEDIA_PROFILE = "profile"
 # square dimension 1:1 aspect ratio
+PROFILE_IMAGE_SIZE = 400
 THUMB_DIMENS = [150, 80]
+# threads processing the uploaded images, 0 processes them in the request
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# largest file accepted by the streaming uploads, in bytes
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(20 * 1024 * 1024)))
 
 ADMINS = [("Zeeshan", "zkhan1093@gmail.com")]
 
@@ -200,6 +213,10 @@ EMAIL_DISABLED = os.getenv("EMAIL_DISABLED", "true") == "true"
 EMAIL_BACKEND = "backends.sendgrid.SendgridEmailBackend"
 DEFAULT_FROM_EMAIL = "Moviepedia Films <info@moviepediafilms.com>"
 SERVER_EMAIL = "root@moviepediafilms.com"
+# the emails are queued in the outbox and sent by the sendemails command, a
+# failed send is retried after EMAIL_RETRY_DELAY seconds, doubled every attempt
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_DELAY = int(os.getenv("EMAIL_RETRY_DELAY", "60"))
 
 # DRF settings
 
@@ -215,8 +232,8 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
-        "rest_framework.filters.OrderingFilter",
-        "rest_framework.filters.SearchFilter",
+        "api.views.utils.OrderingFilter",
+        "api.search.FullTextSearchFilter",
     ],
     "DEFAULT_RENDERER_CLASSES": [
         "rest_framework.renderers.JSONRenderer",
@@ -226,6 +243,37 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": int(os.getenv("PAGE_SIZE", "25")),
     "TEST_REQUEST_DEFAULT_FORMAT": "json",
 }
+# seconds the total counts of the paginated feeds are cached for, 0 disables it
+PAGINATION_COUNT_TTL = int(os.getenv("PAGINATION_COUNT_TTL", "30"))
+
+# Cache settings
+
+# local memory by default, point CACHE_BACKEND/CACHE_LOCATION to a cache shared
+# by the workers and the cron jobs in production, e.g. memcached or a
+# FileBasedCache directory
+CACHE_BACKEND = os.getenv(
+    "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+)
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+# backends whose entries are seen by their own process only
+PROCESS_CACHE_BACKENDS = [
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+]
+# seconds the responses of the public read endpoints are cached for (see
+# `api.cache`), 0 disables it. Disabled by default unless the cache is shared,
+# a worker would not see the invalidations of the other workers and the jobs.
+RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv(
+        "RESPONSE_CACHE_TIMEOUT",
+        "0" if CACHE_BACKEND in PROCESS_CACHE_BACKENDS else "300",
+    )
+)
 
 # Security and CORS settings
 
@@ -261,5 +309,6 @@ RAZORPAY_API_SECRET = os.getenv("RAZORPAY_API_SECRET")
 
 # Sendgrid secrets
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+SENDGRID_HOST = os.getenv("SENDGRID_HOST", "https://api.sendgrid.com")
 SENDGRID_NAME = "Moviepedia Films"
 SENDGRID_REPLY_TO = "moviepedia14@gmail.com"